@@ -0,0 +1,176 @@
+"""
+基准测试数据生成器
+
+相同的行数和随机种子总是生成完全相同的数据，基线和新一轮测试使用的输入一致。
+
+    purchase_requests(rows)   采购申请表（ExcelProcessor / sap.desktop 使用的列）
+    ocr_documents(rows)       data_processor.process_ocr_data 的 OCR 文档
+    receiving_documents(rows) shipping_receiving_demo.step2 的 OCR 识别结果
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEED = 20241021
+
+SUPPLIERS = [
+    "上海电力设备有限公司", "广东安普迪康电气技术有限公司", "湖北鄂电协力科创电器有限责任公司",
+    "北京四方继保工程技术有限公司", "河北万方线缆集团有限公司", "湖南高阳电瓷电器有限公司",
+    "江苏华鹏变压器有限公司", "浙江正泰电器股份有限公司",
+]
+CATEGORIES = ["新住配完善", "配网改造", "业扩配套", "技改大修"]
+MATERIALS = [
+    ("变压器配件", "110KV级", "套", 12500.00),
+    ("绝缘子", "XWP-70", "个", 85.50),
+    ("电缆终端头", "10KV", "个", 320.00),
+    ("高压开关", "ZW32-12", "台", 8500.00),
+    ("避雷器", "HY5WS-17/50", "只", 260.00),
+    ("电力电缆", "YJV22-3*240", "米", 410.00),
+    ("熔断器", "HRW12-12", "只", 95.00),
+    ("接地线", "TJ-50", "米", 18.60),
+]
+LINES_PER_REQUEST = 8
+ITEMS_PER_DOCUMENT = 10
+
+
+def parse_size(text):
+    """把 '1k' / '100k' / '1m' / '5000' 解析为行数"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def format_size(rows):
+    """parse_size 的逆运算，用于结果中的名称"""
+    if rows % 1000000 == 0:
+        return f"{rows // 1000000}m"
+    if rows % 1000 == 0:
+        return f"{rows // 1000}k"
+    return str(rows)
+
+
+def purchase_requests(rows, seed=DEFAULT_SEED):
+    """
+    生成采购申请表，每个采购申请平均 LINES_PER_REQUEST 行、1~3 个供应商。
+
+    Returns:
+        pandas.DataFrame: 列与现场使用的 Excel 一致，采购订单号和信息列为空。
+    """
+    rng = np.random.default_rng(seed)
+    request_count = max(rows // LINES_PER_REQUEST, 1)
+    request_index = np.sort(rng.integers(0, request_count, rows))
+    starts = np.flatnonzero(np.r_[True, request_index[1:] != request_index[:-1]])
+    # 每个申请内部的行号从 10 开始，步长 10（与 SAP 的行项目编号一致）
+    group_sizes = np.diff(np.r_[starts, rows])
+    line_numbers = (np.arange(rows) - np.repeat(starts, group_sizes) + 1) * 10
+
+    supplier_offset = rng.integers(0, len(SUPPLIERS), request_count)
+    supplier_index = (supplier_offset[request_index] + rng.integers(0, 3, rows)) % len(SUPPLIERS)
+    material_index = rng.integers(0, len(MATERIALS), rows)
+    prices = np.array([material[3] for material in MATERIALS])[material_index]
+    price_jitter = np.round(rng.uniform(0.9, 1.1, rows), 2)
+
+    tax_included = np.round(prices * price_jitter, 2)
+    return pd.DataFrame({
+        "采购申请号": 1000300000 + request_index,
+        "采购申请号行号": line_numbers,
+        "供应商": np.array(SUPPLIERS, dtype=object)[supplier_index],
+        "单体工程名称": [f"工程{n % 5000:04d}" for n in request_index],
+        "类别": np.array(CATEGORIES, dtype=object)[request_index % len(CATEGORIES)],
+        "物料编码": 500000000 + material_index * 1000 + request_index % 1000,
+        "物料描述": np.array([material[0] for material in MATERIALS], dtype=object)[material_index],
+        "数量": rng.integers(1, 200, rows),
+        "单位": np.array([material[2] for material in MATERIALS], dtype=object)[material_index],
+        "含税单价": tax_included,
+        "不含税单价": np.round(tax_included / 1.13, 2),
+        "采购订单号": pd.Series([None] * rows, dtype=object),
+        "信息": pd.Series([None] * rows, dtype=object),
+    })
+
+
+def write_workbook(rows, directory, fmt='csv', seed=DEFAULT_SEED):
+    """
+    把采购申请表写入 directory，文件已存在时直接复用（生成 xlsx 很慢）。
+
+    Returns:
+        str: 文件路径。
+    """
+    path = os.path.join(directory, f"purchase_requests_{format_size(rows)}_{seed}.{fmt}")
+    if not os.path.exists(path):
+        df = purchase_requests(rows, seed)
+        temp_path = os.path.join(directory, f".tmp_{os.path.basename(path)}")
+        if fmt == 'xlsx':
+            with pd.ExcelWriter(temp_path, engine='openpyxl') as writer:
+                df.to_excel(writer, index=False)
+        else:
+            df.to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
+    return path
+
+
+def _document_items(rng, count):
+    material_index = rng.integers(0, len(MATERIALS), count)
+    quantities = rng.integers(1, 200, count)
+    return material_index, quantities
+
+
+def ocr_documents(rows, seed=DEFAULT_SEED):
+    """
+    生成 data_processor 格式的 OCR 文档，每个文档 ITEMS_PER_DOCUMENT 个物料，合计 rows 个物料行。
+
+    Returns:
+        list: 文档字典列表。
+    """
+    rng = np.random.default_rng(seed)
+    material_index, quantities = _document_items(rng, rows)
+    documents = []
+    for start in range(0, rows, ITEMS_PER_DOCUMENT):
+        sequence = start // ITEMS_PER_DOCUMENT
+        documents.append({
+            "documentType": "收货单",
+            "documentNumber": f"SH{20240000000 + sequence}",
+            "date": "2024-10-31",
+            "supplier": SUPPLIERS[sequence % len(SUPPLIERS)],
+            "items": [
+                {"name": MATERIALS[m][0], "quantity": int(q), "unit": MATERIALS[m][2], "price": MATERIALS[m][3]}
+                for m, q in zip(material_index[start:start + ITEMS_PER_DOCUMENT].tolist(),
+                                quantities[start:start + ITEMS_PER_DOCUMENT].tolist())
+            ],
+        })
+    return documents
+
+
+def receiving_documents(rows, seed=DEFAULT_SEED):
+    """
+    生成 shipping_receiving_demo 步骤1 格式的 OCR 识别结果，合计 rows 个物料行。
+
+    Returns:
+        list: 识别结果字典列表。
+    """
+    rng = np.random.default_rng(seed)
+    material_index, quantities = _document_items(rng, rows)
+    documents = []
+    for start in range(0, rows, ITEMS_PER_DOCUMENT):
+        sequence = start // ITEMS_PER_DOCUMENT
+        items = [
+            {"name": MATERIALS[m][0], "specification": MATERIALS[m][1], "quantity": int(q),
+             "unit": MATERIALS[m][2], "unitPrice": MATERIALS[m][3], "totalPrice": round(MATERIALS[m][3] * q, 2)}
+            for m, q in zip(material_index[start:start + ITEMS_PER_DOCUMENT].tolist(),
+                            quantities[start:start + ITEMS_PER_DOCUMENT].tolist())
+        ]
+        documents.append({
+            "documentType": "收货单",
+            "documentNumber": f"SH{20240000000 + sequence}",
+            "date": "2024-10-21",
+            "supplier": SUPPLIERS[sequence % len(SUPPLIERS)],
+            "supplierCode": f"SP{1000 + sequence % len(SUPPLIERS):06d}",
+            "warehouse": "主仓库",
+            "warehouseCode": "WH001",
+            "items": items,
+            "totalAmount": round(sum(item["totalPrice"] for item in items), 2),
+            "operator": "张三",
+            "remarks": "",
+        })
+    return documents
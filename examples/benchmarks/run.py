@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Python 数据处理路径的基准测试
+
+覆盖 ExcelProcessor（读取、分组、changeData）、data_processor.process_ocr_data、
+shipping_receiving_demo.step2_clean_and_structure_data 和 receiving.reconcile，
+输入由 generators 按固定种子生成。每个操作记录耗时（多次运行取最小值）和峰值内存（tracemalloc，单独运行一次，
+不影响计时）。不依赖图形界面，可以在 Linux 服务器或 CI 上运行。
+
+用法（在 examples/ 目录下）:
+    python -m benchmarks.run                                   # 默认 1k 行，输出结果表
+    python -m benchmarks.run --sizes 1k,100k,1m -o result.json # 指定规模并保存结果
+    python -m benchmarks.run --baseline baseline.json --update-baseline   # 记录基线
+    python -m benchmarks.run --baseline baseline.json          # 与基线比较，超过阈值时退出码为 1
+
+基线与机器相关，应在同一台机器（或同规格的 CI 节点）上记录和比较。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+_EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.abspath(_EXAMPLES_DIR))
+sys.path.insert(0, os.path.abspath(os.path.join(_EXAMPLES_DIR, os.pardir, 'test_scripts')))
+
+import pandas as pd
+
+from benchmarks import generators
+from common.log import configure
+
+# xlsx 的生成和读写都很慢，超过该规模时只测 CSV
+XLSX_MAX_ROWS = 100000
+
+
+class Benchmark:
+    """
+    单个基准操作。
+
+    Args:
+        name (str): 操作名称，结果键为 "名称[规模]"。
+        setup: setup(rows, workdir) -> state，准备输入，不计入耗时；每次运行前调用。
+        run: run(state)，被测操作。
+        max_rows (int): 超过该规模时跳过（操作本身的复杂度过高）。
+    """
+
+    def __init__(self, name, setup, run, max_rows=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_rows = max_rows
+
+
+def _excel_processor():
+    from desktop.excel.ExcelProcessor import ExcelProcessor
+    return ExcelProcessor
+
+
+def _loaded_processor(rows, workdir, fmt='csv'):
+    processor = _excel_processor()(generators.write_workbook(rows, workdir, fmt))
+    processor.read_data()
+    return processor
+
+
+def _read_setup(fmt):
+    def setup(rows, workdir):
+        return _excel_processor()(generators.write_workbook(rows, workdir, fmt))
+    return setup
+
+
+def _read(processor):
+    if processor.read_data() is None:
+        raise RuntimeError(f"读取失败: {processor.file_path}")
+
+
+def _group(processor):
+    for _, po_df in processor.group_by_column('采购申请号').items():
+        processor.group_data_by_column(po_df, '供应商')
+
+
+def _change_data_setup(rows, workdir):
+    # changeData 会回写整个文件，每次运行都在副本上操作
+    source = generators.write_workbook(rows, workdir, 'xlsx')
+    target = os.path.join(workdir, 'change_data.xlsx')
+    shutil.copyfile(source, target)
+    processor = _excel_processor()(target)
+    processor.read_data()
+    po_num, po_df = next(iter(processor.group_by_column('采购申请号').items()))
+    gys_data = next(iter(processor.group_data_by_column(po_df, '供应商').values()))
+    return processor, po_num, gys_data
+
+
+def _change_data(state):
+    processor, po_num, gys_data = state
+    processor.changeData(po_num, gys_data, 4500012345)
+
+
+def _process_ocr(documents):
+    from data_processor import process_ocr_data
+    for document in documents:
+        process_ocr_data(document, verbose=False)
+
+
+def _step2(documents):
+    from shipping_receiving_demo import step2_clean_and_structure_data
+    for document in documents:
+        step2_clean_and_structure_data(document)
+
+
+def _reconcile_setup(rows, workdir):
+    from data_processor import process_ocr_data
+    from receiving.reconcile import receipt_lines
+    # 未清订单行随规模增长，收货单固定为一天的量（约 1 万行）
+    orders = generators.purchase_requests(rows)
+    documents = [process_ocr_data(document, verbose=False) for document in generators.ocr_documents(10000)]
+    return orders, receipt_lines(documents)
+
+
+def _reconcile(state):
+    from receiving.reconcile import OpenLines, reconcile
+    orders, lines = state
+    reconcile(OpenLines(orders), lines)
+
+
+def _cached(factory):
+    """同一规模的输入只生成一次（生成 1m 行的文档需要数秒）"""
+    cache = {}
+
+    def setup(rows, workdir):
+        if rows not in cache:
+            cache.clear()
+            cache[rows] = factory(rows)
+        return cache[rows]
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark('excel.read_xlsx', _read_setup('xlsx'), _read, max_rows=XLSX_MAX_ROWS),
+    Benchmark('excel.read_csv', _read_setup('csv'), _read),
+    Benchmark('excel.group', _loaded_processor, _group),
+    Benchmark('excel.change_data', _change_data_setup, _change_data, max_rows=XLSX_MAX_ROWS),
+    Benchmark('ocr.process_ocr_data', _cached(generators.ocr_documents), _process_ocr),
+    Benchmark('demo.step2', _cached(generators.receiving_documents), _step2),
+    Benchmark('receiving.reconcile', _reconcile_setup, _reconcile),
+]
+
+
+def measure(benchmark, rows, workdir, repeat=3):
+    """
+    运行一个基准操作。
+
+    Returns:
+        dict: seconds（最小耗时）、mean_seconds、peak_mb（峰值内存）和 runs。
+    """
+    timings = []
+    for _ in range(repeat):
+        state = benchmark.setup(rows, workdir)
+        start = time.perf_counter()
+        benchmark.run(state)
+        timings.append(time.perf_counter() - start)
+
+    # 峰值内存单独测一次：tracemalloc 会显著拖慢执行，不能和计时混在一起
+    state = benchmark.setup(rows, workdir)
+    tracemalloc.start()
+    try:
+        benchmark.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(min(timings), 6),
+        "mean_seconds": round(sum(timings) / len(timings), 6),
+        "peak_mb": round(peak / (1024 * 1024), 3),
+        "runs": repeat,
+    }
+
+
+def run_suite(sizes, workdir, repeat=3, only=None):
+    """
+    Returns:
+        dict: {"meta": 运行环境, "results": {"操作[规模]": 指标}}。
+    """
+    results = {}
+    for rows in sizes:
+        for benchmark in BENCHMARKS:
+            if only and benchmark.name not in only:
+                continue
+            key = f"{benchmark.name}[{generators.format_size(rows)}]"
+            if benchmark.max_rows is not None and rows > benchmark.max_rows:
+                print(f"[INFO] {key}: 跳过（超过 {generators.format_size(benchmark.max_rows)} 行）",
+                      file=sys.stderr)
+                continue
+            print(f"[INFO] {key} ...", file=sys.stderr)
+            results[key] = measure(benchmark, rows, workdir, repeat)
+            print(f"[INFO] {key}: {results[key]['seconds']:.4f} 秒，峰值 {results[key]['peak_mb']:.1f} MB",
+                  file=sys.stderr)
+    return {
+        "meta": {
+            "createdAt": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.25, memory_threshold=0.25, min_seconds=0.005, min_mb=1.0):
+    """
+    与基线比较。耗时或峰值内存超过基线的 (1 + 阈值) 倍视为退化；
+    耗时差距小于 min_seconds、内存差距小于 min_mb 的不计（避免小操作的测量噪声）。
+
+    Returns:
+        list: 每个共同操作一条 (键, 基线耗时, 当前耗时, 基线内存, 当前内存, 退化原因列表)。
+    """
+    rows = []
+    for key, now in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        reasons = []
+        if (now["seconds"] > before["seconds"] * (1 + threshold)
+                and now["seconds"] - before["seconds"] > min_seconds):
+            reasons.append(f"耗时 +{now['seconds'] / before['seconds'] - 1:.0%}")
+        if (now["peak_mb"] > before["peak_mb"] * (1 + memory_threshold)
+                and now["peak_mb"] - before["peak_mb"] > min_mb):
+            reasons.append(f"内存 +{now['peak_mb'] / before['peak_mb'] - 1:.0%}")
+        rows.append((key, before["seconds"], now["seconds"], before["peak_mb"], now["peak_mb"], reasons))
+    return rows
+
+
+def print_results(report):
+    print(f"{'操作':<32}{'耗时(秒)':>12}{'平均(秒)':>12}{'峰值(MB)':>12}")
+    for key, result in report["results"].items():
+        print(f"{key:<32}{result['seconds']:>12.4f}{result['mean_seconds']:>12.4f}{result['peak_mb']:>12.2f}")
+
+
+def print_comparison(rows):
+    print(f"\n{'操作':<32}{'基线(秒)':>10}{'当前(秒)':>10}{'基线(MB)':>10}{'当前(MB)':>10}  结论")
+    for key, base_seconds, seconds, base_mb, mb, reasons in rows:
+        verdict = "退化: " + "，".join(reasons) if reasons else "正常"
+        print(f"{key:<32}{base_seconds:>10.4f}{seconds:>10.4f}{base_mb:>10.2f}{mb:>10.2f}  {verdict}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Python 数据处理路径的基准测试")
+    parser.add_argument('--sizes', default='1k', help="逗号分隔的规模，如 1k,100k,1m")
+    parser.add_argument('--only', help="只运行指定的操作（逗号分隔），如 excel.group,demo.step2")
+    parser.add_argument('--repeat', type=int, default=3, help="计时运行次数，取最小值")
+    parser.add_argument('--workdir', help="生成数据的缓存目录，默认使用临时目录")
+    parser.add_argument('-o', '--output', help="结果 JSON 输出文件")
+    parser.add_argument('--baseline', help="基线 JSON 文件")
+    parser.add_argument('--update-baseline', action='store_true', help="把本次结果写入基线文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="耗时退化阈值（比例）")
+    parser.add_argument('--memory-threshold', type=float, default=0.25, help="峰值内存退化阈值（比例）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 被测函数的过程日志不输出，避免终端 I/O 计入耗时
+    configure(human='off')
+
+    sizes = [generators.parse_size(size) for size in args.sizes.split(',')]
+    only = set(args.only.split(',')) if args.only else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix='rpa-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        report = run_suite(sizes, workdir, args.repeat, only)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        merged = {"meta": report["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                merged["results"].update(json.load(f)["results"])
+        merged["results"].update(report["results"])
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f"\n[SUCCESS] 基线已更新: {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.threshold, args.memory_threshold)
+    print_comparison(rows)
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} 项操作相对基线退化", file=sys.stderr)
+        return 1
+    print(f"\n[SUCCESS] 无退化（比较 {len(rows)} 项）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+阶段之间、脚本与宿主程序之间的数据交接
+
+原来的结果数据通过 json.dumps(..., indent=2) 打印到标准输出，宿主程序再从日志文本中截取，
+大单据的格式化、解码和截取占了大部分时间。交接通道把结果作为独立的记录输出，
+每条记录带一个类型（如 structured、report、record），内容是紧凑的 UTF-8 JSON:
+
+    frames  二进制帧流，流头为 MAGIC，之后每帧:
+                长度(4 字节，大端，不含帧头) + 编码(1 字节) + 类型长度(1 字节) + 类型 + 内容
+            编码 J: 内容即 JSON
+            编码 M: 内容超过 spill 字节时写入单独的文件，帧中只有 {"path", "size"}，
+                    读取方通过 mmap 读取，管道中不再传输大块数据
+    jsonl   每行一条 {"kind": 类型, "data": 内容}，适合直接用文本工具查看
+
+读取方 read_records 根据流头自动识别两种格式。
+
+通过环境变量配置（也可调用 configure）:
+    RPA_HANDOFF        交接通道: 未设置时关闭；'stdout'、'fd:<n>' 或文件路径
+    RPA_HANDOFF_FORMAT 'frames'（默认）或 'jsonl'；文件路径以 .jsonl 结尾时默认 jsonl
+    RPA_HANDOFF_SPILL  超过该字节数的内容写入单独文件以 mmap 交接，默认 1048576，0 表示不拆分
+    RPA_HANDOFF_DIR    拆分文件的目录，默认与交接文件同目录，否则为系统临时目录
+
+交接通道开启后，log.result 的结果数据改由交接通道输出，文本通道只输出标题行（见 RPA_RESULTS）。
+
+用法:
+    from common import handoff
+    handoff.emit('structured', structured_data)     # 通道未开启时不做任何事
+
+    for record in handoff.read_records('out.bin'):
+        print(record.kind, record.data)
+"""
+
+import atexit
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from itertools import chain, count
+
+MAGIC = b'RPAH\x01'
+FRAME_HEADER = struct.Struct('>IBB')
+JSON_FRAME = ord('J')
+SPILLED_FRAME = ord('M')
+DEFAULT_SPILL = 1048576
+
+# 读取到的一条记录
+Record = namedtuple('Record', ['kind', 'data'])
+
+
+def dumps(payload):
+    """紧凑的 UTF-8 JSON"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class FrameWriter:
+    """
+    二进制帧输出。
+
+    Args:
+        stream: 二进制可写流。
+        spill (int): 内容超过该字节数时写入单独文件，0 表示不拆分。
+        spill_dir (str): 拆分文件的目录。
+    """
+
+    format = 'frames'
+
+    def __init__(self, stream, spill=DEFAULT_SPILL, spill_dir=None):
+        self._stream = stream
+        self._spill = spill
+        self._spill_dir = spill_dir or tempfile.gettempdir()
+        self._lock = threading.Lock()
+        self._sequence = count(1)
+        self._stream.write(MAGIC)
+        self._stream.flush()
+
+    def write(self, kind, payload):
+        """
+        写出一条记录。
+
+        Returns:
+            int: 记录序号（从 1 开始）。
+        """
+        return self.write_encoded(kind, dumps(payload))
+
+    def write_encoded(self, kind, data):
+        """写出已序列化的紧凑 JSON（bytes），不再重复序列化"""
+        tag = kind.encode('utf-8')
+        encoding = JSON_FRAME
+        with self._lock:
+            sequence = next(self._sequence)
+            if self._spill and len(data) > self._spill:
+                data, encoding = self._spill_file(sequence, data), SPILLED_FRAME
+            self._stream.write(FRAME_HEADER.pack(len(data), encoding, len(tag)) + tag + data)
+            self._stream.flush()
+        return sequence
+
+    def _spill_file(self, sequence, data):
+        fd, path = tempfile.mkstemp(prefix=f'handoff_{os.getpid()}_{sequence}_', suffix='.json', dir=self._spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return dumps({"path": path, "size": len(data)})
+
+    def flush(self):
+        with self._lock:
+            self._stream.flush()
+
+    close = flush
+
+
+class JsonLinesWriter:
+    """JSON-lines 输出，接口同 FrameWriter（不拆分大内容）"""
+
+    format = 'jsonl'
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._sequence = count(1)
+
+    def write(self, kind, payload):
+        return self.write_encoded(kind, dumps(payload))
+
+    def write_encoded(self, kind, data):
+        line = b'{"kind":' + dumps(kind) + b',"data":' + data + b'}\n'
+        with self._lock:
+            sequence = next(self._sequence)
+            self._stream.write(line)
+            self._stream.flush()
+        return sequence
+
+    def flush(self):
+        with self._lock:
+            self._stream.flush()
+
+    close = flush
+
+
+def open_writer(stream, format='frames', spill=DEFAULT_SPILL, spill_dir=None):
+    """按格式创建写入器"""
+    if format == 'jsonl':
+        return JsonLinesWriter(stream)
+    if format == 'frames':
+        return FrameWriter(stream, spill, spill_dir)
+    raise ValueError(f"未知的交接格式: {format}")
+
+
+def _load_spilled(reference, cleanup):
+    with open(reference["path"], 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            payload = json.loads(view[:reference["size"]])
+    if cleanup:
+        os.remove(reference["path"])
+    return payload
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("交接流在帧中间结束")
+        data += chunk
+    return data
+
+
+def _iter_frames(stream, cleanup):
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            header += _read_exactly(stream, FRAME_HEADER.size - len(header))
+        length, encoding, tag_length = FRAME_HEADER.unpack(header)
+        body = _read_exactly(stream, tag_length + length)
+        kind = body[:tag_length].decode('utf-8')
+        payload = json.loads(body[tag_length:])
+        if encoding == SPILLED_FRAME:
+            payload = _load_spilled(payload, cleanup)
+        elif encoding != JSON_FRAME:
+            raise ValueError(f"未知的帧编码: {encoding}")
+        yield Record(kind, payload)
+
+
+def _iter_lines(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict) and item.keys() == {"kind", "data"}:
+            yield Record(item["kind"], item["data"])
+        else:
+            # 普通 JSON-lines（如 data_processor --batch 的输出），没有类型
+            yield Record(None, item)
+
+
+def read_records(source, cleanup=True):
+    """
+    读取交接记录，自动识别帧流和 JSON-lines。
+
+    Args:
+        source: 文件路径或二进制可读流。
+        cleanup (bool): 读取后删除拆分出的文件。
+
+    Yields:
+        Record: (类型, 内容)。
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as stream:
+            yield from read_records(stream, cleanup)
+        return
+    head = source.read(len(MAGIC))
+    if head == MAGIC:
+        yield from _iter_frames(source, cleanup)
+    else:
+        # 已读取的开头可能跨行，补齐到行尾后再逐行读取
+        yield from _iter_lines(chain((head + source.readline()).splitlines(), source))
+
+
+def _open_binary(target):
+    if target == 'stdout':
+        return sys.stdout.buffer
+    if target == 'stderr':
+        return sys.stderr.buffer
+    if target.startswith('fd:'):
+        return os.fdopen(int(target[3:]), 'wb', buffering=0, closefd=False)
+    return open(target, 'wb')
+
+
+class _Runtime:
+    """进程内的交接通道配置"""
+
+    def __init__(self):
+        self.writer = None
+        self.target = None
+        self._stream = None
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self, target=None, format=None, spill=None, spill_dir=None):
+        with self._lock:
+            self._close_locked()
+            target = target if target is not None else os.environ.get('RPA_HANDOFF', '')
+            self._configured = True
+            if not target:
+                return
+            format = format or os.environ.get('RPA_HANDOFF_FORMAT') or (
+                'jsonl' if target.lower().endswith('.jsonl') else 'frames')
+            if spill is None:
+                spill = int(os.environ.get('RPA_HANDOFF_SPILL') or DEFAULT_SPILL)
+            if spill_dir is None:
+                spill_dir = os.environ.get('RPA_HANDOFF_DIR') or (
+                    os.path.dirname(os.path.abspath(target)) if target not in ('stdout', 'stderr')
+                    and not target.startswith('fd:') else None)
+            self._stream = _open_binary(target)
+            self.writer = open_writer(self._stream, format, spill, spill_dir)
+            self.target = target
+
+    def ensure_configured(self):
+        if not self._configured:
+            self.configure()
+
+    def _close_locked(self):
+        if self.writer is not None:
+            self.writer.close()
+            if self._stream not in (sys.stdout.buffer, sys.stderr.buffer):
+                self._stream.close()
+        self.writer = None
+        self.target = None
+        self._stream = None
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+
+_runtime = _Runtime()
+
+
+def configure(target=None, format=None, spill=None, spill_dir=None):
+    """
+    显式配置交接通道，参数含义同对应的环境变量；未指定的参数取环境变量的值。
+    target 为空字符串时关闭通道。
+    """
+    _runtime.configure(target, format, spill, spill_dir)
+
+
+def enabled():
+    """交接通道是否开启"""
+    _runtime.ensure_configured()
+    return _runtime.writer is not None
+
+
+def emit(kind, payload):
+    """
+    把结果写到交接通道。
+
+    Returns:
+        int: 记录序号；通道未开启时为 None。
+    """
+    _runtime.ensure_configured()
+    writer = _runtime.writer
+    if writer is None:
+        return None
+    return writer.write(kind, payload)
+
+
+def emit_encoded(kind, data):
+    """写出已序列化的紧凑 JSON（bytes）；通道未开启时返回 None"""
+    _runtime.ensure_configured()
+    writer = _runtime.writer
+    if writer is None:
+        return None
+    return writer.write_encoded(kind, data)
+
+
+def close():
+    _runtime.close()
+
+
+atexit.register(_runtime.close)
@@ -0,0 +1,416 @@
+"""
+执行历史存储
+
+把每次运行（收发货流程的执行报告、采购订单批次）以及其中每个订单/单据的结果写入本地 SQLite，
+供仪表盘直接查询，不再需要从日志文本中解析。
+
+写入通过 HistoryWriter 批量进行：记录先放入内存队列，由后台线程按条数或时间间隔
+在一个事务中批量写入。明细表在日期、供应商、状态、采购申请号上建有索引；
+同一事务中还会更新按天和按月汇总的统计表（次数、耗时直方图）。
+HistoryStore 的聚合查询只读汇总表：整月部分读月表，首尾不足一个月的部分读日表，
+查询一年的数据也只需扫描少量汇总记录。
+
+后台线程写入失败时记录错误并丢弃该批记录，close() 重新抛出第一个错误，历史丢失不会被忽略。
+"""
+
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from common.log import get_logger
+
+log = get_logger('history')
+
+DEFAULT_DB = 'execution_history.db'
+
+SUCCESS = 'SUCCESS'
+FAILED = 'FAILED'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    day TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms INTEGER,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_day ON runs (day);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    source TEXT NOT NULL,
+    day TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    apply_no TEXT,
+    supplier TEXT,
+    status TEXT NOT NULL,
+    error_type TEXT,
+    order_number TEXT,
+    duration_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_outcomes_day ON outcomes (day);
+CREATE INDEX IF NOT EXISTS idx_outcomes_supplier_day ON outcomes (supplier, day);
+CREATE INDEX IF NOT EXISTS idx_outcomes_status_day ON outcomes (status, day);
+CREATE INDEX IF NOT EXISTS idx_outcomes_apply_no ON outcomes (apply_no);
+
+CREATE TABLE IF NOT EXISTS outcome_daily (
+    period TEXT NOT NULL,
+    source TEXT NOT NULL,
+    supplier TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period, source, supplier, status, error_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS duration_daily (
+    supplier TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (supplier, period, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS outcome_monthly (
+    period TEXT NOT NULL,
+    source TEXT NOT NULL,
+    supplier TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period, source, supplier, status, error_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS duration_monthly (
+    supplier TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (supplier, period, bucket)
+) WITHOUT ROWID;
+"""
+
+# 耗时直方图的桶宽约为 5%（对数刻度）
+_BUCKETS_PER_E = 20
+
+# 耗时直方图中表示"全部供应商"的汇总行
+ALL_SUPPLIERS = '*'
+
+
+def duration_bucket(duration_ms):
+    return int(math.log1p(max(0, duration_ms)) * _BUCKETS_PER_E)
+
+
+def bucket_upper_bound(bucket):
+    return int(math.expm1((bucket + 1) / _BUCKETS_PER_E))
+
+
+def split_periods(start_day, end_day):
+    """
+    把日期范围拆成整月部分和首尾不足一个月的部分。
+
+    Returns:
+        tuple: (按天的区间列表, 按月的区间或 None)，区间均含首尾。
+    """
+    start = date.fromisoformat(start_day)
+    end = date.fromisoformat(end_day)
+    first_month = start if start.day == 1 else (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    after_end = end + timedelta(days=1)
+    # 最后一个整月之后的第一天
+    months_end = after_end if after_end.day == 1 else end.replace(day=1)
+    if first_month >= months_end:
+        return [(start_day, end_day)], None
+    days = []
+    if start < first_month:
+        days.append((start_day, (first_month - timedelta(days=1)).isoformat()))
+    if months_end <= end:
+        days.append((months_end.isoformat(), end_day))
+    return days, (first_month.strftime('%Y-%m'), (months_end - timedelta(days=1)).strftime('%Y-%m'))
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def default_path():
+    """数据库路径，取自环境变量 RPA_HISTORY_DB，默认为当前目录下的 execution_history.db"""
+    return os.environ.get('RPA_HISTORY_DB') or DEFAULT_DB
+
+
+def new_run_id():
+    return f"RUN_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class HistoryWriter:
+    """
+    批量写入执行历史。
+
+    Args:
+        path (str): 数据库路径。
+        batch_size (int): 累积多少条记录后写入一次。
+        flush_interval (float): 最长写入间隔（秒）。
+
+    Attributes:
+        error (Exception): 后台线程第一次打开或写入数据库失败的异常，close() 时重新抛出。
+        dropped (int): 因写入失败而丢弃的记录数。
+    """
+
+    def __init__(self, path=None, batch_size=200, flush_interval=2.0):
+        self.path = path or default_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.error = None
+        self.dropped = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+
+    def record_run(self, run_id, source, status, duration_ms=None, payload=None, started_at=None):
+        """
+        记录一次运行。
+
+        Args:
+            run_id (str): 运行标识。
+            source (str): 来源脚本，如 'shipping_receiving'、'sap_purchase_order'。
+            status (str): SUCCESS / FAILED 或其它状态。
+            duration_ms (int): 耗时（毫秒）。
+            payload (dict): 完整的执行报告，以JSON保存。
+            started_at (datetime): 开始时间，默认为当前时间。
+        """
+        started_at = started_at or datetime.now()
+        self._queue.put(('run', (
+            run_id, source, started_at.strftime('%Y-%m-%d'), started_at.isoformat(), status, duration_ms,
+            json.dumps(payload, ensure_ascii=False, default=str) if payload is not None else None)))
+
+    def record_outcome(self, source, status, run_id=None, apply_no=None, supplier=None,
+                       error_type=None, order_number=None, duration_ms=None, recorded_at=None):
+        """
+        记录单个订单/单据的结果。
+
+        Args:
+            source (str): 来源脚本。
+            status (str): SUCCESS 或 FAILED。
+            run_id (str): 所属运行。
+            apply_no (str): 采购申请号（收发货流程为来源单据编号）。
+            supplier (str): 供应商名称。
+            error_type (str): 失败类型。
+            order_number (str): 生成的订单号/收货单号。
+            duration_ms (int): 耗时（毫秒）。
+            recorded_at (datetime): 记录时间，默认为当前时间。
+        """
+        recorded_at = recorded_at or datetime.now()
+        self._queue.put(('outcome', (
+            run_id, source, recorded_at.strftime('%Y-%m-%d'), recorded_at.isoformat(),
+            None if apply_no is None else str(apply_no), supplier, status, error_type,
+            None if order_number is None else str(order_number), duration_ms)))
+
+    def _write(self, conn, batch):
+        runs = [row for kind, row in batch if kind == 'run']
+        outcomes = [row for kind, row in batch if kind == 'outcome']
+        outcome_counts = Counter()
+        duration_counts = Counter()
+        for run_id, source, day, recorded_at, apply_no, supplier, status, error_type, order_number, duration_ms \
+                in outcomes:
+            supplier = supplier or ''
+            for period in (day, day[:7]):
+                outcome_counts[(len(period), period, source, supplier, status, error_type or '')] += 1
+                if duration_ms is not None:
+                    bucket = duration_bucket(duration_ms)
+                    duration_counts[(len(period), supplier, period, bucket)] += 1
+                    duration_counts[(len(period), ALL_SUPPLIERS, period, bucket)] += 1
+        with conn:
+            if runs:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO runs (run_id, source, day, started_at, status, duration_ms, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", runs)
+            if outcomes:
+                conn.executemany(
+                    "INSERT INTO outcomes (run_id, source, day, recorded_at, apply_no, supplier, status, "
+                    "error_type, order_number, duration_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", outcomes)
+                for granularity, length in (('daily', 10), ('monthly', 7)):
+                    conn.executemany(
+                        f"INSERT INTO outcome_{granularity} (period, source, supplier, status, error_type, count) "
+                        f"VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (period, source, supplier, status, error_type) "
+                        f"DO UPDATE SET count = count + excluded.count",
+                        [key[1:] + (count,) for key, count in outcome_counts.items() if key[0] == length])
+                    conn.executemany(
+                        f"INSERT INTO duration_{granularity} (supplier, period, bucket, count) VALUES (?, ?, ?, ?) "
+                        f"ON CONFLICT (supplier, period, bucket) DO UPDATE SET count = count + excluded.count",
+                        [key[1:] + (count,) for key, count in duration_counts.items() if key[0] == length])
+
+    def _failed(self, error, batch):
+        """记录写入失败，丢弃该批记录"""
+        if self.error is None:
+            self.error = error
+        self.dropped += len(batch)
+        log.error(f"执行历史写入失败，丢弃 {len(batch)} 条记录: {error}", error_type=type(error).__name__,
+                  path=self.path, dropped=self.dropped)
+
+    def _run(self):
+        try:
+            conn = _connect(self.path)
+        except Exception as e:
+            # 数据库无法打开：此后的记录只从队列中取出丢弃，队列不会无限增长
+            conn = None
+            self._failed(e, [])
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        closing = False
+        while not closing:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    closing = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            if batch and (closing or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                if conn is None:
+                    self.dropped += len(batch)
+                else:
+                    try:
+                        self._write(conn, batch)
+                    except Exception as e:
+                        # 数据库锁定、磁盘错误等：丢弃本批，之后的批次继续尝试写入
+                        self._failed(e, batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        """
+        写入剩余记录并结束后台线程。
+
+        Raises:
+            Exception: 后台线程打开或写入数据库失败时，重新抛出第一个错误。
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoryStore:
+    """
+    执行历史查询接口，日期参数均为 'YYYY-MM-DD' 字符串（含首尾）。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        self._conn = _connect(self.path)
+
+    def close(self):
+        self._conn.close()
+
+    def _rollup(self, table, columns, start_day, end_day, where='', params=()):
+        """
+        在日表和月表上执行同一个查询，返回各部分结果拼接后的子查询及参数。
+        """
+        days, months = split_periods(start_day, end_day)
+        parts = []
+        all_params = []
+        for granularity, ranges in (('daily', days), ('monthly', [months] if months else [])):
+            for low, high in ranges:
+                parts.append(f"SELECT {columns} FROM {table}_{granularity} WHERE period BETWEEN ? AND ?{where}")
+                all_params += [low, high, *params]
+        return ' UNION ALL '.join(parts), all_params
+
+    def success_rate_by_supplier(self, start_day, end_day, source=None):
+        """
+        各供应商的成功率。
+
+        Returns:
+            list: (供应商, 总数, 成功数, 成功率) 元组，按总数降序。
+        """
+        subquery, params = self._rollup(
+            'outcome', 'supplier, status, count', start_day, end_day,
+            " AND source = ?" if source else "", [source] if source else [])
+        sql = (f"SELECT supplier, SUM(count), SUM(CASE WHEN status = ? THEN count ELSE 0 END) "
+               f"FROM ({subquery}) GROUP BY supplier ORDER BY SUM(count) DESC")
+        return [(supplier, total, success, success / total)
+                for supplier, total, success in self._conn.execute(sql, [SUCCESS] + params)]
+
+    def duration_percentile(self, start_day, end_day, percentile=0.95, supplier=None, exact=False):
+        """
+        耗时的百分位数（毫秒），如 p95。没有数据时返回 None。
+
+        默认由汇总的对数直方图计算，返回所在桶的上界（误差约 5%）；
+        exact=True 时对明细表排序求精确值，适合较短的日期范围。
+        """
+        if exact:
+            where = "day BETWEEN ? AND ? AND duration_ms IS NOT NULL" + (" AND supplier = ?" if supplier else "")
+            params = [start_day, end_day] + ([supplier] if supplier else [])
+            count = self._conn.execute(f"SELECT COUNT(*) FROM outcomes WHERE {where}", params).fetchone()[0]
+            if count == 0:
+                return None
+            offset = min(count - 1, int(percentile * count))
+            return self._conn.execute(
+                f"SELECT duration_ms FROM outcomes WHERE {where} ORDER BY duration_ms LIMIT 1 OFFSET ?",
+                params + [offset]).fetchone()[0]
+
+        subquery, params = self._rollup(
+            'duration', 'bucket, count', start_day, end_day, " AND supplier = ?", [supplier or ALL_SUPPLIERS])
+        histogram = self._conn.execute(
+            f"SELECT bucket, SUM(count) FROM ({subquery}) GROUP BY bucket ORDER BY bucket", params).fetchall()
+        total = sum(count for _, count in histogram)
+        if total == 0:
+            return None
+        target = min(total, int(percentile * total) + 1)
+        seen = 0
+        for bucket, count in histogram:
+            seen += count
+            if seen >= target:
+                return bucket_upper_bound(bucket)
+
+    def error_counts_by_type(self, start_day, end_day):
+        """
+        各失败类型的次数。
+
+        Returns:
+            list: (失败类型, 次数) 元组，按次数降序。
+        """
+        subquery, params = self._rollup(
+            'outcome', 'error_type, count', start_day, end_day, " AND status = ?", [FAILED])
+        return self._conn.execute(
+            f"SELECT error_type, SUM(count) FROM ({subquery}) GROUP BY error_type ORDER BY SUM(count) DESC",
+            params).fetchall()
+
+    def daily_counts(self, start_day, end_day):
+        """
+        每日的成功/失败数。
+
+        Returns:
+            list: (日期, 总数, 成功数) 元组，按日期升序。
+        """
+        return self._conn.execute(
+            "SELECT period, SUM(count), SUM(CASE WHEN status = ? THEN count ELSE 0 END) FROM outcome_daily "
+            "WHERE period BETWEEN ? AND ? GROUP BY period ORDER BY period", (SUCCESS, start_day, end_day)).fetchall()
+
+    def outcomes_for_apply_no(self, apply_no):
+        """某个采购申请号的全部处理记录"""
+        return self._conn.execute(
+            "SELECT recorded_at, supplier, status, error_type, order_number, duration_ms FROM outcomes "
+            "WHERE apply_no = ? ORDER BY recorded_at", (str(apply_no),)).fetchall()
@@ -0,0 +1,277 @@
+"""
+脚本日志运行时
+
+脚本的输出分为两个通道:
+    事件通道  机器可读的 UTF-8 JSON-lines，每行一个事件（级别、步骤、进度、数据），
+              写入内存缓冲区，按大小或时间间隔批量刷出，宿主程序逐行解析即可。
+    文本通道  给人看的日志行（"[INFO] ..."），与原来的 print 输出一致。
+
+通过环境变量配置（也可在脚本中调用 configure）:
+    RPA_EVENTS        事件通道: 未设置时关闭；'stdout'、'stderr'、'fd:<n>' 或文件路径
+    RPA_HUMAN         文本通道: 'stdout'、'stderr' 或 'off'；
+                      默认 stdout，事件通道或交接通道占用 stdout 时默认改为 stderr
+    RPA_EVENT_BUFFER  事件缓冲区大小（字节），默认 65536
+    RPA_EVENT_FLUSH   事件最长刷出间隔（秒），默认 0.5
+    RPA_RESULTS       文本通道中结果数据的格式: 'pretty'（缩进 JSON）、'compact'（单行）或 'off'（只输出标题）；
+                      默认 pretty，交接通道（common.handoff，RPA_HANDOFF）开启时默认 off
+
+用法:
+    from common.log import get_logger
+    log = get_logger('shipping_receiving')
+    log.set_step('scan')
+    log.info("正在扫描第 1 页", progress=(1, 3), page=1)
+    log.debug("OCR 识别原始数据:", data=ocr_result)   # 文本通道关闭时不会格式化 data
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+from common import handoff
+
+_current_step = contextvars.ContextVar('rpa_step', default=None)
+
+
+class EventChannel:
+    """
+    缓冲的 JSON-lines 事件输出。
+
+    Args:
+        stream: 二进制可写流。
+        buffer_size (int): 缓冲区达到该字节数时立即刷出。
+        flush_interval (float): 缓冲区中的数据最长保留时间（秒），由后台线程定时刷出。
+    """
+
+    def __init__(self, stream, buffer_size=65536, flush_interval=0.5):
+        self._stream = stream
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name='rpa-event-flush', daemon=True)
+        self._flusher.start()
+
+    def write(self, event):
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+        with self._lock:
+            self._buffer += line
+            if len(self._buffer) >= self._buffer_size:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._stream.write(self._buffer)
+            self._stream.flush()
+            self._buffer.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self._flush_interval):
+            try:
+                self.flush()
+            except (OSError, ValueError):
+                return
+
+    def close(self):
+        self._closed.set()
+        try:
+            self.flush()
+        except (OSError, ValueError):
+            pass
+
+
+class Logger:
+    """
+    具名日志器，同时写文本通道和事件通道。
+
+    info / success / warning / error / debug 输出 "[级别] 消息" 文本行并发出事件；
+    result 输出结果数据（交接通道开启时写入交接通道，文本通道按 RPA_RESULTS 格式化）；text 只输出文本（横幅、分隔线等）；
+    event 只发出事件。
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def set_step(self, step):
+        """设置当前步骤（按线程/上下文隔离），之后的事件都带上该步骤"""
+        _current_step.set(step)
+
+    @property
+    def step(self):
+        return _current_step.get()
+
+    def text(self, message=''):
+        human = _runtime.human
+        if human is not None:
+            print(message, file=human)
+
+    def event(self, level, message=None, step=None, progress=None, **data):
+        """
+        只发出事件。
+
+        Args:
+            level (str): 级别，如 INFO、PROGRESS、RESULT。
+            message (str): 消息文本。
+            step (str): 步骤，默认为 set_step 设置的当前步骤。
+            progress: 进度，(已完成, 总数) 元组或 0~1 的小数。
+            **data: 附加数据。
+        """
+        channel = _runtime.events
+        if channel is None:
+            return
+        event = {"ts": round(time.time(), 3), "level": level, "logger": self.name,
+                 "step": step or _current_step.get()}
+        if message is not None:
+            event["msg"] = message
+        if progress is not None:
+            if isinstance(progress, tuple):
+                done, total = progress
+                event["progress"] = {"done": done, "total": total}
+            else:
+                event["progress"] = progress
+        if data:
+            event["data"] = data
+        channel.write(event)
+
+    def _log(self, level, message, step, progress, data):
+        human = _runtime.human
+        if human is not None:
+            print(f"[{level}] {message}", file=human)
+            # 附带的大块数据只在文本通道开启时才格式化输出
+            if 'data' in data:
+                _print_data(data['data'], human)
+        self.event(level, message, step, progress, **data)
+
+    def debug(self, message, step=None, progress=None, **data):
+        self._log('DEBUG', message, step, progress, data)
+
+    def info(self, message, step=None, progress=None, **data):
+        self._log('INFO', message, step, progress, data)
+
+    def success(self, message, step=None, progress=None, **data):
+        self._log('SUCCESS', message, step, progress, data)
+
+    def warning(self, message, step=None, progress=None, **data):
+        self._log('WARNING', message, step, progress, data)
+
+    def error(self, message, step=None, progress=None, **data):
+        self._log('ERROR', message, step, progress, data)
+
+    def result(self, message, payload, step=None, kind=None):
+        """
+        输出结果数据，事件级别为 RESULT。
+
+        交接通道开启时结果写入交接通道，事件中只带交接记录的序号，结果不再重复序列化。
+
+        Args:
+            message (str): 文本通道中结果前的标题行。
+            payload: 可 JSON 序列化的结果。
+            kind (str): 交接记录的类型，默认为步骤名或日志器名称。
+        """
+        sequence = handoff.emit(kind or step or _current_step.get() or self.name, payload)
+        human = _runtime.human
+        if human is not None:
+            print(message, file=human)
+            _print_data(payload, human)
+        if sequence is None:
+            self.event('RESULT', message.strip(), step, None, result=payload)
+        else:
+            self.event('RESULT', message.strip(), step, None, handoff=sequence)
+
+    def flush(self):
+        if _runtime.events is not None:
+            _runtime.events.flush()
+        if _runtime.human is not None:
+            _runtime.human.flush()
+
+
+def _print_data(payload, human):
+    """按 RPA_RESULTS 在文本通道中输出结果数据"""
+    mode = _runtime.results or ('off' if handoff.enabled() else 'pretty')
+    if mode == 'pretty':
+        print(json.dumps(payload, ensure_ascii=False, indent=2, default=str), file=human)
+    elif mode == 'compact':
+        print(json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str), file=human)
+
+
+def _open_binary(target):
+    if target == 'stdout':
+        return sys.stdout.buffer
+    if target == 'stderr':
+        return sys.stderr.buffer
+    if target.startswith('fd:'):
+        return os.fdopen(int(target[3:]), 'wb', buffering=0, closefd=False)
+    return open(target, 'ab')
+
+
+class _Runtime:
+    """进程内的通道配置"""
+
+    def __init__(self):
+        self.events = None
+        self.human = sys.stdout
+        self.events_target = None
+        self.results = None
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self, events=None, human=None, buffer_size=None, flush_interval=None, results=None):
+        with self._lock:
+            if self.events is not None:
+                self.events.close()
+            events = events if events is not None else os.environ.get('RPA_EVENTS', '')
+            human = human if human is not None else os.environ.get('RPA_HUMAN', '')
+            buffer_size = buffer_size or int(os.environ.get('RPA_EVENT_BUFFER') or 65536)
+            flush_interval = flush_interval or float(os.environ.get('RPA_EVENT_FLUSH') or 0.5)
+            self.results = results or os.environ.get('RPA_RESULTS') or None
+
+            self.events_target = events or None
+            self.events = EventChannel(_open_binary(events), buffer_size, flush_interval) if events else None
+            if not human:
+                human = 'stderr' if 'stdout' in (events, os.environ.get('RPA_HANDOFF')) else 'stdout'
+            self.human = {'stdout': sys.stdout, 'stderr': sys.stderr, 'off': None}[human]
+            self._configured = True
+
+    def ensure_configured(self):
+        if not self._configured:
+            self.configure()
+
+    def close(self):
+        if self.events is not None:
+            self.events.close()
+
+
+_runtime = _Runtime()
+_loggers = {}
+
+
+def configure(events=None, human=None, buffer_size=None, flush_interval=None, results=None):
+    """
+    显式配置通道，参数含义同对应的环境变量；未指定的参数取环境变量的值。
+    """
+    _runtime.configure(events, human, buffer_size, flush_interval, results)
+
+
+def get_logger(name):
+    """获取具名日志器，首次调用时按环境变量配置通道"""
+    _runtime.ensure_configured()
+    if name not in _loggers:
+        _loggers[name] = Logger(name)
+    return _loggers[name]
+
+
+def events_target():
+    """事件通道的目标（文件路径等），未开启时为 None"""
+    _runtime.ensure_configured()
+    return _runtime.events_target
+
+
+atexit.register(_runtime.close)
@@ -0,0 +1,242 @@
+"""
+可选的运行剖析
+
+通过环境变量开启，不需要修改被剖析的脚本:
+    RPA_PROFILE           剖析方式，逗号分隔，可组合:
+                              cprofile  确定性剖析（只覆盖主线程，结果为 .prof，可用 snakeviz 等查看）
+                              sample    采样剖析（覆盖所有线程，结果为折叠栈 .folded，可生成火焰图）
+                              memory    tracemalloc 内存快照
+                          未设置或为 off 时不做任何事情，没有额外开销
+    RPA_PROFILE_DIR       输出目录；默认与事件日志（RPA_EVENTS 指向的文件）同目录，否则为 ./profiles
+    RPA_PROFILE_INTERVAL  采样间隔（秒），默认 0.005
+    RPA_PROFILE_TOP       摘要中列出的热点函数和内存分配位置数，默认 20
+
+每次运行写出 <名称>-<时间>.prof / .folded / .summary.txt，摘要包含热点函数和内存分配最多的位置。
+
+用法:
+    sys.exit(profiling.run('shipping_receiving', main))   # 包装入口函数
+
+    profiling.start('sap_purchase_order')                  # 没有入口函数的脚本，进程退出时写出结果
+"""
+
+import atexit
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from common.log import events_target, get_logger
+
+MODES = ('cprofile', 'sample', 'memory')
+
+
+def enabled_modes(value=None):
+    """
+    解析剖析方式。
+
+    Returns:
+        tuple: 开启的方式，关闭时为空元组。
+    """
+    value = os.environ.get('RPA_PROFILE', '') if value is None else value
+    modes = tuple(mode.strip().lower() for mode in value.split(',') if mode.strip())
+    if not modes or modes == ('off',):
+        return ()
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ValueError(f"未知的剖析方式: {', '.join(unknown)}（可选 {', '.join(MODES)}）")
+    return modes
+
+
+def output_dir():
+    """剖析结果的输出目录"""
+    directory = os.environ.get('RPA_PROFILE_DIR')
+    if not directory:
+        target = events_target()
+        if target and target not in ('stdout', 'stderr') and not target.startswith('fd:'):
+            directory = os.path.dirname(os.path.abspath(target))
+        else:
+            directory = os.path.join(os.getcwd(), 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+class Sampler:
+    """
+    采样剖析器：后台线程定时抓取所有线程的调用栈并计数。
+
+    Args:
+        interval (float): 采样间隔（秒）。
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='rpa-profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        """以折叠栈格式写出（每行 "帧;帧;帧 次数"，flamegraph.pl / speedscope 可直接读取）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def top(self, limit):
+        """
+        Returns:
+            tuple: (按自身样本数排序的 [(函数, 次数)], 按包含样本数排序的 [(函数, 次数)])。
+        """
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+        return own.most_common(limit), inclusive.most_common(limit)
+
+
+class Session:
+    """
+    一次剖析。
+
+    Args:
+        name (str): 运行名称，用作输出文件名前缀。
+        modes (tuple): 剖析方式，见 MODES。
+    """
+
+    def __init__(self, name, modes):
+        self.name = name
+        self.modes = modes
+        self.top = int(os.environ.get('RPA_PROFILE_TOP') or 20)
+        self.files = []
+        self._profiler = None
+        self._sampler = None
+        self._started = None
+        self._stopped = False
+
+    def start(self):
+        self._started = time.perf_counter()
+        if 'memory' in self.modes:
+            import tracemalloc
+            tracemalloc.start(25)
+        if 'sample' in self.modes:
+            self._sampler = Sampler(float(os.environ.get('RPA_PROFILE_INTERVAL') or 0.005))
+            self._sampler.start()
+        if 'cprofile' in self.modes:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self):
+        """停止剖析并写出结果文件，重复调用无副作用"""
+        if self._stopped:
+            return self.files
+        self._stopped = True
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        snapshot = None
+        if 'memory' in self.modes:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        elapsed = time.perf_counter() - self._started
+
+        prefix = os.path.join(output_dir(), f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        summary = io.StringIO()
+        summary.write(f"运行: {self.name}\n耗时: {elapsed:.3f} 秒\n剖析方式: {', '.join(self.modes)}\n")
+
+        if self._profiler is not None:
+            import pstats
+            self._profiler.dump_stats(prefix + '.prof')
+            self.files.append(prefix + '.prof')
+            summary.write(f"\n== 热点函数（cProfile，按累计耗时，前 {self.top} 个） ==\n")
+            stats = pstats.Stats(self._profiler, stream=summary)
+            stats.sort_stats('cumulative').print_stats(self.top)
+            summary.write(f"\n== 热点函数（cProfile，按自身耗时，前 {self.top} 个） ==\n")
+            stats.sort_stats('tottime').print_stats(self.top)
+
+        if self._sampler is not None:
+            self._sampler.write_folded(prefix + '.folded')
+            self.files.append(prefix + '.folded')
+            own, inclusive = self._sampler.top(self.top)
+            total = sum(self._sampler.stacks.values()) or 1
+            summary.write(f"\n== 热点函数（采样 {self._sampler.samples} 次，按自身样本数） ==\n")
+            for frame, count in own:
+                summary.write(f"{count / total:7.1%}  {count:8d}  {frame}\n")
+            summary.write(f"\n== 热点函数（按包含样本数） ==\n")
+            for frame, count in inclusive:
+                summary.write(f"{count / total:7.1%}  {count:8d}  {frame}\n")
+
+        if snapshot is not None:
+            summary.write(f"\n== 内存分配（tracemalloc，峰值 {peak / (1024 * 1024):.1f} MB，当前存活前 {self.top} 处） ==\n")
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                summary.write(f"{stat.size / 1024:10.1f} KB  {stat.count:8d} 块  {stat.traceback}\n")
+
+        with open(prefix + '.summary.txt', 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        self.files.append(prefix + '.summary.txt')
+        get_logger('profiling').info(f"剖析结果已写入: {prefix}.summary.txt", step='profile', files=self.files)
+        return self.files
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def start(name, modes=None):
+    """
+    按环境变量开始剖析，进程退出时自动写出结果。
+
+    Returns:
+        Session: 剖析会话；未开启时为 None。
+    """
+    modes = enabled_modes() if modes is None else modes
+    if not modes:
+        return None
+    session = Session(name, modes).start()
+    atexit.register(session.stop)
+    return session
+
+
+def run(name, func, *args, **kwargs):
+    """
+    调用 func(*args, **kwargs)，按环境变量决定是否剖析。未开启时直接调用。
+
+    Returns:
+        func 的返回值。
+    """
+    modes = enabled_modes()
+    if not modes:
+        return func(*args, **kwargs)
+    with Session(name, modes):
+        return func(*args, **kwargs)
@@ -0,0 +1,174 @@
+"""
+批量进度事件
+
+长批次中逐条输出日志会让界面日志区被成千上万行淹没。Progress 把逐条的处理
+合并为节流后的 PROGRESS 事件（已完成/总数、速率、预计剩余时间、当前分组），
+错误和里程碑仍然立即输出。
+
+节流通过环境变量配置:
+    RPA_PROGRESS_RATE  每秒最多发出的 PROGRESS 事件数（进程内所有 Progress 共享），默认 2
+    RPA_PROGRESS_TEXT  文本通道进度行的最小间隔（秒），默认 10；0 表示不输出进度文本
+
+用法:
+    progress = Progress(log, total=len(orders), step='order')
+    for order in orders:
+        progress.set_group(order.supplier)
+        try:
+            handle(order)
+        except Exception as e:
+            progress.error(f"订单 {order.no} 失败: {e}")
+        progress.advance()
+    progress.finish("全部订单处理完成")
+"""
+
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    令牌桶限流，允许短时突发 burst 个事件，长期速率不超过 rate 个/秒。
+
+    Args:
+        rate (float): 每秒允许的事件数，<= 0 表示不限制。
+        burst (int): 桶容量。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+_limiter = RateLimiter(float(os.environ.get('RPA_PROGRESS_RATE') or 2))
+
+
+def format_duration(seconds):
+    """把秒数格式化为 '1小时02分' / '3分05秒' / '12秒'"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60:02d}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
+    return f"{seconds}秒"
+
+
+class Progress:
+    """
+    批量处理进度。
+
+    Args:
+        logger (Logger): common.log 的日志器。
+        total (int): 总数，未知时为 None（不计算预计剩余时间）。
+        step (str): 事件中的步骤名，默认为日志器的当前步骤。
+        group (str): 当前分组，如供应商或采购申请号。
+        text_interval (float): 文本通道进度行的最小间隔（秒），默认取 RPA_PROGRESS_TEXT。
+        limiter (RateLimiter): 事件限流器，默认与进程内其他 Progress 共享。
+    """
+
+    def __init__(self, logger, total=None, step=None, group=None, text_interval=None, limiter=None):
+        self.logger = logger
+        self.total = total
+        self.step = step
+        self.group = group
+        self.done = 0
+        self.failed = 0
+        if text_interval is None:
+            text_interval = float(os.environ.get('RPA_PROGRESS_TEXT') or 10)
+        self.text_interval = text_interval
+        self._limiter = limiter or _limiter
+        self._start = time.monotonic()
+        self._last_text = self._start
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: done、total、failed、rate（个/秒）、eta（秒）、group 和 elapsed。
+        """
+        elapsed = time.monotonic() - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.done, 0) / rate
+        return {"done": self.done, "total": self.total, "failed": self.failed, "rate": round(rate, 3),
+                "eta": None if eta is None else round(eta, 1), "group": self.group,
+                "elapsed": round(elapsed, 3)}
+
+    def _describe(self, state):
+        text = f"进度 {state['done']}" + (f"/{state['total']}" if state['total'] is not None else "")
+        text += f"，{state['rate']:.2f} 个/秒"
+        if state['eta'] is not None:
+            text += f"，预计剩余 {format_duration(state['eta'])}"
+        if state['group'] is not None:
+            text += f"，当前: {state['group']}"
+        return text
+
+    def _emit(self, force=False):
+        # 调用方持有 self._lock
+        if not force and not self._limiter.allow():
+            return
+        state = self.snapshot()
+        self.logger.event('PROGRESS', step=self.step, progress=(state['done'], state['total']),
+                          rate=state['rate'], eta=state['eta'], group=state['group'], failed=state['failed'])
+        now = time.monotonic()
+        if force or (self.text_interval > 0 and now - self._last_text >= self.text_interval):
+            self._last_text = now
+            self.logger.text(f"[PROGRESS] {self._describe(state)}")
+
+    def set_group(self, group):
+        """切换当前分组，不单独发出事件"""
+        with self._lock:
+            self.group = group
+
+    def advance(self, count=1, group=None, failed=0):
+        """
+        完成 count 个条目（其中 failed 个失败），按限流决定是否发出 PROGRESS 事件。
+        """
+        with self._lock:
+            self.done += count
+            self.failed += failed
+            if group is not None:
+                self.group = group
+            self._emit()
+
+    def error(self, message, **data):
+        """立即输出错误，并计入失败数"""
+        with self._lock:
+            self.failed += 1
+        self.logger.error(message, step=self.step, progress=(self.done, self.total), **{"group": self.group, **data})
+
+    def milestone(self, message, **data):
+        """立即输出里程碑和当前进度"""
+        self.logger.success(message, step=self.step, progress=(self.done, self.total), **{"group": self.group, **data})
+        with self._lock:
+            self._emit(force=True)
+
+    def finish(self, message=None, **data):
+        """输出最终进度（不受限流），可附带完成消息"""
+        with self._lock:
+            self._emit(force=True)
+        if message is not None:
+            # 调用方附带的字段覆盖快照中的同名字段，避免重复关键字参数
+            self.logger.success(message, step=self.step, **{**self.snapshot(), **data})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish()
@@ -0,0 +1,233 @@
+"""
+收件箱守护进程
+
+持续监视收件箱目录中的采购申请工作簿（.xlsx / .csv），文件新增或修改后：
+    1. 等待文件大小和修改时间在 settle 秒内不再变化（仍在复制或保存中的文件不处理）；
+    2. 按行指纹找出从未处理过的行（见 excel.ingest），只把这些行按 采购申请号 -> 供应商 拆成任务；
+    3. 按供应商排序后逐个创建采购订单，订单号在批次结束时一次写回工作簿，处理过的行登记到指纹库；
+       失败的行登记为 FAILED，文件下次变化或守护进程重启时重新处理。
+
+用法:
+    python daemon.py D:\\rpa\\inbox                  # 启动 SAP 并登录后持续处理
+    python daemon.py D:\\rpa\\inbox --no-login       # SAP 已登录
+    python daemon.py D:\\rpa\\inbox --dry-run        # 只列出待处理的任务，不操作 SAP、不登记
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 共享模块位于上一级 examples/ 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import pandas as pd
+
+import sap.schedule as schedule
+from sap.supplier_cache import SupplierCache
+from utils.deadline import CircuitBreaker
+from excel.ExcelProcessor import ExcelProcessor
+from excel.ingest import SeenRows, new_rows
+from excel.report import ResultReport
+from common.history import HistoryWriter, new_run_id, SUCCESS, FAILED
+from common.log import get_logger
+from common.progress import Progress
+
+log = get_logger('sap_inbox')
+
+EXTENSIONS = ('.xlsx', '.csv')
+
+
+class InboxWatcher:
+    """
+    轮询收件箱目录，返回已经写完（settle 秒内未变化）且内容有变化的文件。
+
+    Args:
+        inbox (str): 收件箱目录。
+        settle (float): 文件大小和修改时间保持不变的最短时间（秒）。
+    """
+
+    def __init__(self, inbox, settle=5.0):
+        self.inbox = inbox
+        self.settle = settle
+        self._pending = {}
+        self._done = {}
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _readable(path):
+        # Excel 正在保存时文件被独占锁定
+        try:
+            with open(path, 'rb') as f:
+                f.read(1)
+            return True
+        except OSError:
+            return False
+
+    def poll(self):
+        """
+        Returns:
+            list: 可以处理的文件路径。
+        """
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        for entry in os.scandir(self.inbox):
+            name = entry.name
+            if not entry.is_file() or name.startswith(('~$', '.')) or not name.lower().endswith(EXTENSIONS):
+                continue
+            path = entry.path
+            seen.add(path)
+            try:
+                signature = self._signature(path)
+            except OSError:
+                continue
+            if self._done.get(path) == signature:
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.settle and self._readable(path):
+                ready.append(path)
+        # 被删除的文件不再跟踪
+        for path in list(self._pending):
+            if path not in seen:
+                del self._pending[path]
+        return ready
+
+    def mark_done(self, path):
+        """记录文件处理完成时的状态（包括订单号回写后的修改），之后未变化就不再处理"""
+        self._pending.pop(path, None)
+        try:
+            self._done[path] = self._signature(path)
+        except OSError:
+            self._done.pop(path, None)
+
+
+def ingest_file(path, seen, handler, mark=True):
+    """
+    处理工作簿中未处理过的行。
+
+    Args:
+        path (str): 工作簿路径。
+        seen (SeenRows): 行指纹库。
+        handler: handler(processor, plan) -> [(WorkItem, 是否成功, 订单号, 错误分类)]。
+        mark (bool): 是否把处理过的行登记到指纹库。
+
+    Returns:
+        int: 新行数。
+    """
+    processor = ExcelProcessor(path)
+    df = processor.read_data()
+    if df is None:
+        return 0
+    fresh, hashes = new_rows(df, seen)
+    if fresh.empty:
+        log.info(f"{os.path.basename(path)}: 没有新行（共 {len(df)} 行）", step='ingest')
+        return 0
+
+    grouped = {po_num: group for po_num, group in fresh.groupby('采购申请号')}
+    items = schedule.build_work_items(processor, grouped)
+    plan = schedule.schedule(items)
+    log.info(f"{os.path.basename(path)}: 新行 {len(fresh)} / {len(df)}，{len(plan)} 个订单任务",
+             step='ingest', file=path, new_rows=len(fresh), total_rows=len(df), tasks=len(plan))
+
+    results = handler(processor, plan)
+    if mark:
+        hash_by_row = pd.Series(hashes, index=fresh.index)
+        for item, success, order_number, error_type in results:
+            seen.mark(hash_by_row.loc[item.data.index].to_numpy(), path, str(item.apply_no),
+                      SUCCESS if success else FAILED)
+    return len(fresh)
+
+
+def dry_run_handler(processor, plan):
+    """只列出任务，不操作 SAP"""
+    for item in plan:
+        log.info(f"待处理: 采购申请号 {item.apply_no}，供应商 {item.supplier}，{len(item.data)} 行", step='ingest')
+    return [(item, True, None, None) for item in plan]
+
+
+def sap_handler(history, state, breaker=None):
+    """创建采购订单的处理函数，各文件共享执行历史、SAP 会话状态和熔断计数"""
+    import sap.orders as orders
+
+    def handle(processor, plan):
+        run_id = new_run_id()
+        start = time.time()
+        progress = Progress(log, total=len(plan), step='order')
+        # 每批新行一份结果报告，写到收件箱下的 results 目录（不在监视范围内）
+        directory = os.path.join(os.path.dirname(processor.file_path), 'results')
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.splitext(os.path.basename(processor.file_path))[0]
+        report_path = os.path.join(directory, f'{name}_结果_{run_id}.xlsx')
+        with ResultReport(report_path) as report:
+            results = orders.process_tasks(processor, plan, history, run_id, state, progress, report,
+                                           breaker=breaker)
+        failed = sum(1 for _, success, _, _ in results if not success)
+        history.record_run(run_id, orders.HISTORY_SOURCE, SUCCESS if not failed else FAILED,
+                           duration_ms=int((time.time() - start) * 1000),
+                           payload={"file": processor.file_path, "tasks": len(plan), "failed": failed})
+        progress.finish(f"{os.path.basename(processor.file_path)} 处理完成，结果报告: {report_path}")
+        return results
+    return handle
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="监视收件箱目录，增量处理采购申请工作簿")
+    parser.add_argument('inbox', help="收件箱目录")
+    parser.add_argument('--db', default=None, help="行指纹库路径，默认取 INGEST_DB 或 ingest.db")
+    parser.add_argument('--poll', type=float, default=2.0, help="轮询间隔（秒）")
+    parser.add_argument('--settle', type=float, default=5.0, help="文件保持不变多久后才处理（秒）")
+    parser.add_argument('--dry-run', action='store_true', help="只列出待处理的任务")
+    parser.add_argument('--no-login', action='store_true', help="不启动 SAP Logon（已登录）")
+    parser.add_argument('--once', action='store_true', help="处理一轮后退出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    seen = SeenRows(args.db) if args.db else SeenRows.from_env()
+    watcher = InboxWatcher(args.inbox, args.settle)
+    history = HistoryWriter()
+    app = None
+    state = None
+    if args.dry_run:
+        handler = dry_run_handler
+    else:
+        if not args.no_login:
+            import sap.orders as orders
+            app = orders.start_and_login()
+        state = schedule.SessionState(SupplierCache.from_env())
+        handler = sap_handler(history, state, CircuitBreaker.from_env())
+
+    log.info(f"开始监视 {args.inbox}（已登记 {len(seen)} 行）", step='watch')
+    try:
+        while True:
+            for path in watcher.poll():
+                try:
+                    ingest_file(path, seen, handler, mark=not args.dry_run)
+                except Exception as e:
+                    log.error(f"{os.path.basename(path)} 处理失败: {e}", step='ingest', file=path)
+                watcher.mark_done(path)
+            if args.once and not watcher._pending:
+                break
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        log.info("停止监视", step='watch')
+    finally:
+        history.close()
+        seen.close()
+        if state is not None:
+            state.supplier_cache.close()
+        if app is not None:
+            app.kill_()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
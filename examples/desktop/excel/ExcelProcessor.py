@@ -14,21 +14,49 @@ class ExcelProcessor:
         """
         self.file_path = file_path
         self.df = None  # 用于存储读取到的DataFrame
+        self._dirty = False  # changeData 的结果是否还未写回文件
 
     """
         sq_number:申请订单号
         sc_numder：生成的采购订单号
     """
-    def changeData(self,sq_number,gys_data,sc_numder):
-        for index,row in self.df.iterrows():
-            if row['采购申请号'] == sq_number:
-                row['采购订单号'] = sc_numder
-                for index1,row1 in gys_data.iterrows():
-                    if row['采购申请号行号'] == row1['采购申请号行号']:
-                        # self.df.loc[index,'采购订单号'] = sc_numder
-                        self.df.loc[index, '信息'] = sc_numder
-        with pd.ExcelWriter(self.file_path) as writer:
-            self.df.to_excel(writer,index= True)
+    def changeData(self,sq_number,gys_data,sc_numder,save=True):
+        """
+        把采购订单号（或错误信息）写入该任务各行的"信息"列。
+
+        Args:
+            sq_number: 采购申请号。
+            gys_data (DataFrame): 该任务的行，取自 self.df（group_by_column 等的结果，索引与 self.df 一致）。
+            sc_numder: 采购订单号或错误信息。
+            save (bool): 是否立即写回文件；批量处理时传 False，所有任务结束后调用一次 save。
+        """
+        rows = gys_data.index[gys_data['采购申请号'] == sq_number]
+        # 信息列可能是空的浮点列或字符串列，订单号和错误信息混写前统一为 object
+        if '信息' not in self.df.columns:
+            self.df['信息'] = pd.Series(None, index=self.df.index, dtype=object)
+        elif self.df['信息'].dtype != object:
+            self.df['信息'] = self.df['信息'].astype(object)
+        self.df.loc[rows, '信息'] = sc_numder
+        self._dirty = True
+        if save:
+            self.save()
+
+    def save(self):
+        """
+        把 changeData 记录的结果写回文件，没有未保存的修改时不写。
+
+        Returns:
+            bool: 是否写了文件。
+        """
+        if not self._dirty:
+            return False
+        if self.file_path.lower().endswith('.csv'):
+            self.df.to_csv(self.file_path, index=True)
+        else:
+            with pd.ExcelWriter(self.file_path) as writer:
+                self.df.to_excel(writer,index= True)
+        self._dirty = False
+        return True
 
     def read_data(self):
         """
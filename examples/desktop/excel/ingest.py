@@ -0,0 +1,132 @@
+"""
+采购申请行指纹与增量处理
+
+每一行按业务列计算 64 位哈希（pd.util.hash_pandas_object，向量化），已处理过的行指纹
+保存在 SQLite 中。工作簿被追加或修改后重新读取时，只有指纹未出现过的行进入处理队列：
+向 5 万行的工作簿追加 20 行，只产生 20 行的工作量。
+
+回写列（信息、采购订单号）以及 changeData 回写时产生的索引列不参与哈希，
+处理结果写回工作簿不会让已处理的行变成"新行"。
+
+登记为 FAILED 的行不算已处理：文件下次变化（或守护进程重启）时与新行一起重新处理，
+成功后状态改为 SUCCESS。
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from common.history import FAILED
+
+# 处理结果回写的列，不属于行的业务内容
+OUTPUT_COLUMNS = ('信息', '采购订单号')
+
+DEFAULT_DB = 'ingest.db'
+
+
+def fingerprint_columns(df):
+    """参与指纹计算的列：去掉回写列和 to_excel(index=True) 产生的 Unnamed 索引列，按列名排序"""
+    return sorted(
+        column for column in df.columns
+        if column not in OUTPUT_COLUMNS and not str(column).startswith('Unnamed')
+    )
+
+
+def row_hashes(df):
+    """
+    每行一个 64 位指纹，与列顺序和行位置无关。
+
+    Returns:
+        numpy.ndarray: int64 数组（SQLite 整数列可直接保存）。
+    """
+    columns = fingerprint_columns(df)
+    # 同一列在追加了含空值的行后可能从 int 变成 float，数值列统一按 float64 转成字符串再哈希
+    normalized = pd.DataFrame({
+        column: (df[column].astype('float64') if pd.api.types.is_numeric_dtype(df[column]) else df[column]).astype(str)
+        for column in columns
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy().view(np.int64)
+
+
+class SeenRows:
+    """
+    已处理行的指纹库，启动时把全部指纹载入内存，查询不访问数据库。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_rows (
+                row_hash INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                apply_no TEXT,
+                status TEXT NOT NULL,
+                processed_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        # 失败的行不载入，下次读取时仍是未处理的行
+        self._known = np.fromiter(
+            (row[0] for row in self._conn.execute("SELECT row_hash FROM seen_rows WHERE status != ?", (FAILED,))),
+            dtype=np.int64)
+        self._added = []
+
+    @classmethod
+    def from_env(cls, variable='INGEST_DB'):
+        """按环境变量中的数据库路径打开，未配置时使用当前目录下的 ingest.db"""
+        return cls(os.environ.get(variable) or DEFAULT_DB)
+
+    def __len__(self):
+        return len(self._known) + sum(len(hashes) for hashes in self._added)
+
+    def _compact(self):
+        if self._added:
+            self._known = np.unique(np.concatenate([self._known] + self._added))
+            self._added = []
+
+    def unseen(self, hashes):
+        """
+        Returns:
+            numpy.ndarray: 布尔掩码，True 表示该行未处理过。
+        """
+        with self._lock:
+            self._compact()
+            return ~np.isin(hashes, self._known)
+
+    def mark(self, hashes, source, apply_no=None, status='DONE'):
+        """登记已处理的行；status 为 FAILED 时只记录，之后仍作为未处理的行返回"""
+        hashes = np.asarray(hashes, dtype=np.int64)
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seen_rows (row_hash, source, apply_no, status, processed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((int(value), source, apply_no, status, now) for value in hashes))
+            self._conn.commit()
+            if status != FAILED:
+                self._added.append(hashes)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def new_rows(df, seen):
+    """
+    Returns:
+        tuple: (未处理的行 DataFrame, 对应的指纹数组)。
+    """
+    hashes = row_hashes(df)
+    mask = seen.unseen(hashes)
+    return df[mask], hashes[mask]
@@ -0,0 +1,293 @@
+"""
+多工作簿并行读取
+
+月底各项目部会发来几十个采购申请工作簿。xlsx 解析是纯 Python 的 CPU 密集工作，受 GIL 限制
+多线程没有加速，这里按 (文件, 工作表) 拆成任务交给进程池，吞吐量随 CPU 核数增长。
+
+为减少进程间传输，子进程只保留下单需要的列，并把每列编码成紧凑数组
+（文本列为 pd.factorize 的整数编码 + 去重后的取值），主进程再还原成 DataFrame；
+供应商、类别等重复值很多的列传输量远小于直接 pickle 整个 DataFrame。
+
+各工作表的表头和列类型在合并前校验：缺少必需列、或数值列（采购申请号、行号、单价）中有非数值内容的
+工作表不参与合并，在结果中报告；否则同一采购申请号会因为文本和数字两种写法被拆成两组。
+
+MultiWorkbook 把合并结果包装成与 ExcelProcessor 相同的接口，交给 sap.orders.process_tasks 处理，
+订单号按来源文件、工作表和行号写回各自的工作簿（test.py 在命令行给出多个工作簿时使用）。
+
+用法:
+    result = load_workbooks(paths)
+    for problem in result.errors: ...
+    grouped = group_work(result.frame)      # 采购申请号 -> DataFrame，可直接交给 sap.schedule
+
+    processor = MultiWorkbook(paths)
+    processor.read_data()
+    ...
+    processor.save()                        # 写回各来源工作簿
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from excel.ExcelProcessor import ExcelProcessor
+
+# 创建采购订单需要的列
+REQUIRED_COLUMNS = ('采购申请号', '采购申请号行号', '供应商', '单体工程名称', '类别',
+                    '物料编码', '含税单价', '不含税单价')
+# 存在时一起读取的列
+OPTIONAL_COLUMNS = ('物料描述', '数量', '单位', '采购订单号', '信息')
+# 必须是数值的列（存在时校验）
+NUMERIC_COLUMNS = ('采购申请号', '采购申请号行号', '含税单价', '不含税单价', '数量')
+# 写回结果的列
+RESULT_COLUMN = '信息'
+
+# 合并结果中标记来源的列，订单号按这些列写回原文件
+SOURCE_COLUMN = '来源文件'
+SHEET_COLUMN = '来源工作表'
+ROW_COLUMN = '来源行号'
+
+LoadResult = namedtuple('LoadResult', ['frame', 'errors', 'sheets'])
+
+
+def list_sheets(path):
+    """
+    列出要解析的工作表。只读模式打开工作簿只解析目录，不读取单元格。
+
+    Returns:
+        list: 工作表名称；csv 为 [None]。
+    """
+    if path.lower().endswith('.csv'):
+        return [None]
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _encode(frame):
+    """把 DataFrame 编码成 {列名: (kind, 数据)}，文本列只传整数编码和去重取值"""
+    columns = {}
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_numeric_dtype(series):
+            columns[column] = ('values', series.to_numpy())
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            columns[column] = ('codes', (codes.astype(np.int32), np.asarray(uniques, dtype=object)))
+    return columns
+
+
+def _decode(columns, length):
+    frame = {}
+    for column, (kind, data) in columns.items():
+        if kind == 'values':
+            frame[column] = data
+        else:
+            codes, uniques = data
+            values = np.empty(length, dtype=object)
+            valid = codes >= 0
+            values[valid] = uniques[codes[valid]]
+            values[~valid] = np.nan
+            frame[column] = values
+    return pd.DataFrame(frame)
+
+
+def read_sheet(path, sheet):
+    """按 (文件, 工作表) 读取完整的表，csv 的工作表为 None；行号与 parse_sheet 的来源行号一致"""
+    if sheet is None:
+        return pd.read_csv(path)
+    return pd.read_excel(path, sheet_name=sheet)
+
+
+def parse_sheet(path, sheet, required=REQUIRED_COLUMNS, optional=OPTIONAL_COLUMNS):
+    """
+    在子进程中解析一个工作表。
+
+    Returns:
+        dict: path、sheet、header（完整表头）、missing（缺少的必需列）、
+              mistyped（含非数值内容的数值列）、rows（行数）、columns（编码后的列，校验不通过时为 None）。
+    """
+    wanted = set(required) | set(optional)
+    if sheet is None:
+        frame = pd.read_csv(path, usecols=lambda column: column in wanted)
+        header = list(pd.read_csv(path, nrows=0).columns)
+    else:
+        frame = read_sheet(path, sheet)
+        header = list(frame.columns)
+        frame = frame[[column for column in frame.columns if column in wanted]]
+    missing = [column for column in required if column not in frame.columns]
+    mistyped = [column for column in NUMERIC_COLUMNS
+                if column in frame.columns and not pd.api.types.is_numeric_dtype(frame[column])]
+    return {
+        "path": path,
+        "sheet": sheet,
+        "header": header,
+        "missing": missing,
+        "mistyped": mistyped,
+        "rows": len(frame),
+        "columns": None if missing or mistyped else _encode(frame),
+    }
+
+
+def _parse_sheet(task):
+    try:
+        return parse_sheet(*task)
+    except Exception as e:
+        return {"path": task[0], "sheet": task[1], "error": f"{type(e).__name__}: {e}"}
+
+
+def load_workbooks(paths, workers=None, required=REQUIRED_COLUMNS, optional=OPTIONAL_COLUMNS):
+    """
+    并行读取多个工作簿的全部工作表并合并。
+
+    Args:
+        paths (list): 工作簿（.xlsx / .csv）路径。
+        workers (int): 进程数，默认 CPU 核数；为 1 时在当前进程中依次读取。
+        required (tuple): 必需列，任一缺失的工作表不参与合并。
+        optional (tuple): 存在时一起读取的列。
+
+    Returns:
+        LoadResult: frame（合并后的 DataFrame，带来源文件、工作表和行号列）、
+                    errors（[(路径, 工作表, 说明)]）、sheets（成功合并的工作表数）。
+    """
+    errors = []
+    tasks = []
+    for path in paths:
+        try:
+            tasks.extend((path, sheet, tuple(required), tuple(optional)) for sheet in list_sheets(path))
+        except Exception as e:
+            errors.append((path, None, f"无法打开: {e}"))
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) or 1
+    if workers == 1:
+        results = [_parse_sheet(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [future.result() for future in as_completed(pool.submit(_parse_sheet, task) for task in tasks)]
+    # 按文件和工作表的原顺序合并，结果与并行度无关
+    order = {(task[0], task[1]): position for position, task in enumerate(tasks)}
+    results.sort(key=lambda result: order[(result["path"], result["sheet"])])
+
+    frames = []
+    for result in results:
+        path, sheet = result["path"], result["sheet"]
+        if "error" in result:
+            errors.append((path, sheet, result["error"]))
+        elif result["missing"]:
+            if result["rows"] or any(not str(column).startswith('Unnamed') for column in result["header"]):
+                errors.append((path, sheet, f"缺少列: {', '.join(result['missing'])}"))
+        elif result["mistyped"]:
+            errors.append((path, sheet, f"列中有非数值内容: {', '.join(result['mistyped'])}"))
+        elif result["rows"]:
+            frame = _decode(result["columns"], result["rows"])
+            frame[SOURCE_COLUMN] = path
+            frame[SHEET_COLUMN] = sheet
+            frame[ROW_COLUMN] = np.arange(len(frame))
+            frames.append(frame)
+
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(required))
+    return LoadResult(frame, errors, len(frames))
+
+
+def group_work(frame, column='采购申请号'):
+    """
+    合并后的数据按采购申请号分组。同一采购申请号出现在多个文件中时合并为一组。
+
+    Returns:
+        dict: 采购申请号 -> DataFrame，与 ExcelProcessor.group_by_column 的结果形式相同。
+    """
+    return {value: group for value, group in frame.groupby(column, sort=False)}
+
+
+def write_back(path, sheets, column=RESULT_COLUMN):
+    """
+    把结果写入一个来源工作簿，每个文件只读写一次。
+
+    Args:
+        path (str): 工作簿路径。
+        sheets (dict): 工作表名称（csv 为 None）-> {来源行号: 值}。
+        column (str): 写入的列，不存在时追加在末尾。
+
+    Raises:
+        ValueError: 工作表的行数比记录的来源行号少（文件在读取之后被改动）。
+    """
+    frames = {}
+    for sheet, values in sheets.items():
+        frame = read_sheet(path, sheet)
+        if values and max(values) >= len(frame):
+            raise ValueError(f"{os.path.basename(path)} {sheet or ''} 只有 {len(frame)} 行，无法写回第 {max(values)} 行")
+        if column not in frame.columns:
+            frame[column] = pd.Series(None, index=frame.index, dtype=object)
+        elif frame[column].dtype != object:
+            frame[column] = frame[column].astype(object)
+        frame.loc[list(values), column] = list(values.values())
+        frames[sheet] = frame
+
+    if None in frames:
+        frames[None].to_csv(path, index=False)
+        return
+    # 只替换有结果的工作表，其他工作表保持原样
+    with pd.ExcelWriter(path, mode='a', engine='openpyxl', if_sheet_exists='replace') as writer:
+        for sheet, frame in frames.items():
+            frame.to_excel(writer, sheet_name=sheet, index=False)
+
+
+class MultiWorkbook(ExcelProcessor):
+    """
+    多个工作簿合并后的处理器，接口与 ExcelProcessor 相同，可直接交给 sap.schedule 和 sap.orders。
+
+    changeData 在合并结果中记录订单号，save 按来源列把结果写回各自的工作簿和工作表。
+
+    Args:
+        paths (list): 工作簿（.xlsx / .csv）路径。
+        workers (int): 读取进程数，见 load_workbooks。
+    """
+
+    def __init__(self, paths, workers=None):
+        super().__init__(paths[0] if paths else None)
+        self.paths = list(paths)
+        self.workers = workers
+        self.errors = []
+        self._changed = set()
+
+    def read_data(self):
+        """
+        并行读取全部工作簿并合并。
+
+        Returns:
+            pandas.DataFrame or None: 合并结果（带来源列）；没有可用的工作表时返回 None，原因见 self.errors。
+        """
+        result = load_workbooks(self.paths, self.workers)
+        self.errors = result.errors
+        self.df = result.frame if result.sheets else None
+        return self.df
+
+    def changeData(self, sq_number, gys_data, sc_numder, save=True):
+        self._changed.update(gys_data.index[gys_data['采购申请号'] == sq_number])
+        super().changeData(sq_number, gys_data, sc_numder, save)
+
+    def save(self):
+        """
+        把记录的结果写回来源工作簿。
+
+        Returns:
+            bool: 是否写了文件。
+        """
+        if not self._dirty:
+            return False
+        changed = self.df.loc[sorted(self._changed)]
+        by_path = {}
+        for path, sheet, row, value in zip(changed[SOURCE_COLUMN], changed[SHEET_COLUMN],
+                                           changed[ROW_COLUMN], changed[RESULT_COLUMN]):
+            sheet = None if pd.isna(sheet) else sheet
+            by_path.setdefault(path, {}).setdefault(sheet, {})[int(row)] = value
+        for path, sheets in by_path.items():
+            write_back(path, sheets)
+        self._changed.clear()
+        self._dirty = False
+        return True
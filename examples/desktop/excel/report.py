@@ -0,0 +1,104 @@
+"""
+采购订单结果报告
+
+每个任务完成后立即追加一行（openpyxl write-only 模式，行写入临时文件而不保留在内存中），
+10 万行的报告内存占用也保持不变。汇总表在追加时增量累计（按供应商、按错误分类计数和耗时），
+关闭时写出，不需要回读明细。
+
+用法:
+    with ResultReport('result.xlsx') as report:
+        report.add(apply_no, supplier, success, order_number, error_type, duration_ms, rows)
+"""
+
+import os
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from openpyxl import Workbook
+
+DETAIL_HEADER = ('采购申请号', '供应商', '状态', '采购订单号', '错误分类', '耗时(秒)', '行数', '完成时间')
+SUPPLIER_HEADER = ('供应商', '任务数', '成功', '失败', '成功率', '总耗时(秒)', '平均耗时(秒)')
+ERROR_HEADER = ('错误分类', '次数')
+
+
+class ResultReport:
+    """
+    流式写出的结果报告。
+
+    Args:
+        path (str): 报告路径（.xlsx）。先写入同目录下的临时文件，关闭时改名，运行中断不会留下半个文件。
+        summary (bool): 是否写出汇总表。
+    """
+
+    def __init__(self, path, summary=True):
+        self.path = path
+        self._temp_path = os.path.join(os.path.dirname(os.path.abspath(path)), '.tmp_' + os.path.basename(path))
+        self._workbook = Workbook(write_only=True)
+        # 汇总表放在第一个，内容在关闭时写出
+        self._summary_sheet = self._workbook.create_sheet('汇总') if summary else None
+        self._detail_sheet = self._workbook.create_sheet('明细')
+        self._detail_sheet.append(DETAIL_HEADER)
+        self._suppliers = OrderedDict()
+        self._errors = Counter()
+        self.rows = 0
+        self._closed = False
+
+    def add(self, apply_no, supplier, success, order_number=None, error_type=None, duration_ms=None, rows=None):
+        """
+        追加一个任务的结果。
+
+        Args:
+            apply_no: 采购申请号。
+            supplier (str): 供应商。
+            success (bool): 是否生成订单。
+            order_number (str): 采购订单号。
+            error_type (str): 错误分类（common.history 的分类）。
+            duration_ms (int): 任务耗时（毫秒）。
+            rows (int): 任务包含的采购申请行数。
+        """
+        seconds = round(duration_ms / 1000, 3) if duration_ms is not None else None
+        self._detail_sheet.append((
+            str(apply_no), supplier, '成功' if success else '失败', order_number, error_type,
+            seconds, rows, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        ))
+        self.rows += 1
+
+        stats = self._suppliers.setdefault(supplier, [0, 0, 0.0])
+        stats[0 if success else 1] += 1
+        stats[2] += seconds or 0.0
+        if not success:
+            self._errors[error_type or '未分类'] += 1
+
+    def _write_summary(self):
+        sheet = self._summary_sheet
+        sheet.append(SUPPLIER_HEADER)
+        total = [0, 0, 0.0]
+        for supplier, (succeeded, failed, seconds) in self._suppliers.items():
+            count = succeeded + failed
+            sheet.append((supplier, count, succeeded, failed, round(succeeded / count, 4),
+                          round(seconds, 3), round(seconds / count, 3)))
+            total = [total[0] + succeeded, total[1] + failed, total[2] + seconds]
+        count = total[0] + total[1]
+        if count:
+            sheet.append(('合计', count, total[0], total[1], round(total[0] / count, 4),
+                          round(total[2], 3), round(total[2] / count, 3)))
+        sheet.append(())
+        sheet.append(ERROR_HEADER)
+        for error_type, times in self._errors.most_common():
+            sheet.append((error_type, times))
+
+    def close(self):
+        """写出汇总表并保存，重复调用无副作用"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._summary_sheet is not None:
+            self._write_summary()
+        self._workbook.save(self._temp_path)
+        os.replace(self._temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
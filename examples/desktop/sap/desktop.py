@@ -1,94 +1,155 @@
 #-Includes--------------------------------------------------------------
 import sys, win32com.client,re,pyautogui,time
-from time import sleep
 import utils.guiutils as ut
+import utils.deadline as deadline
+from common.log import get_logger
+from sap.schedule import NO_POPUP
+from sap.supplier_cache import MISSING
+import sap.screen as sap_screen
+import sap.table as sap_table
 
+log = get_logger('sap_desktop')
 
-#-Sub Main--------------------------------------------------------------
-def Main(excelData,cg_order):
-    try:
-        sleep(5)
-        SapGuiAuto = win32com.client.GetObject("SAPGUI")
-        if not type(SapGuiAuto) == win32com.client.CDispatch:
-            return
 
-        application = SapGuiAuto.GetScriptingEngine
-        if not type(application) == win32com.client.CDispatch:
-            SapGuiAuto = None
-            return
-
-        application.HistoryEnabled = False
+#-Sub Main--------------------------------------------------------------
+def connect_session():
+    """
+    连接 SAP GUI 脚本引擎的第一个会话。
+
+    Returns:
+        tuple: (application, session)；SAP 未运行、连接不可用或会话忙时返回 None。
+    """
+    SapGuiAuto = win32com.client.GetObject("SAPGUI")
+    if not type(SapGuiAuto) == win32com.client.CDispatch:
+        return
+
+    application = SapGuiAuto.GetScriptingEngine
+    if not type(application) == win32com.client.CDispatch:
+        SapGuiAuto = None
+        return
 
-        connection = application.Children(0)
-        if not type(connection) == win32com.client.CDispatch:
-            application = None
-            SapGuiAuto = None
-            return
+    connection = application.Children(0)
+    if not type(connection) == win32com.client.CDispatch:
+        application = None
+        SapGuiAuto = None
+        return
 
-        if connection.DisabledByServer == True:
-            connection = None
-            application = None
-            SapGuiAuto = None
-            return
+    if connection.DisabledByServer == True:
+        connection = None
+        application = None
+        SapGuiAuto = None
+        return
 
-        session = connection.Children(0)
+    session = connection.Children(0)
 	
-        if not type(session) == win32com.client.CDispatch:
-            connection = None
-            application = None
-            SapGuiAuto = None
-            return
-
-        if session.Busy == True:
-            session = None
-            connection = None
-            application = None
-            SapGuiAuto = None
-            return
-
-        if session.Info.IsLowSpeedConnection == True:
-            session = None
-            connection = None
-            application = None
-            SapGuiAuto = None
-            return
+    if not type(session) == win32com.client.CDispatch:
+        connection = None
+        application = None
+        SapGuiAuto = None
+        return
 
+    if session.Busy == True:
+        session = None
+        connection = None
+        application = None
+        SapGuiAuto = None
+        return
+
+    if session.Info.IsLowSpeedConnection == True:
+        session = None
+        connection = None
+        application = None
+        SapGuiAuto = None
+        return
+
+    return application, session
+
+def Main(excelData,cg_order,state=None):
+    """
+    在 SAP 中按采购申请创建一张采购订单。
+
+    Args:
+        excelData (DataFrame): 同一采购申请、同一供应商的行。
+        cg_order (str): 采购申请号。
+        state (SessionState): 任务之间共享的会话状态（见 sap.schedule），
+                              提供时复用脚本会话和供应商查找结果，跳过重复的导航步骤；
+                              其中的 supplier_cache 提供时，已知没有主记录的供应商在操作界面之前直接失败，
+                              已确认的供应商直接输入编码，不弹出选择窗口。
+
+    调用方激活了时间预算（utils.deadline）时按阶段计时，会话的 findById、图像等待和 sleep
+    都受剩余预算限制，预算用完时抛出 DeadlineExceeded。
+    """
+    application = None
+    try:
         for index,row in excelData.iterrows():
             company = row['供应商']
             projectName = row['单体工程名称']
             projectType = row['类别']
             break
 
-        session.findById("wnd[0]/usr/cntlIMAGE_CONTAINER/shellcont/shell/shellcont[0]/shell").doubleClickNode("F00080")
-        try:
-            session.findById("wnd[0]/tbar[1]/btn[8]").press()
-        except:
-            print("凭证概览已打开")
+        supplier_name = str(company).strip()
+        cache = state.supplier_cache if state is not None else None
+        cached = cache.lookup(supplier_name) if cache is not None else None
+        if cached is not None and cached.status == MISSING:
+            state.skip('supplier_missing')
+            log.info(f"供应商{supplier_name}没有主记录（缓存），跳过", step='supplier', supplier=supplier_name)
+            return "公司信息不正确"
+        cached_code = cached.vendor_code if cached is not None else None
+
+        deadline.enter('connect')
+        if state is not None and state.alive():
+            # 会话仍可用，不需要等待 SAP 界面就绪
+            application, session = state.application, state.session
+            state.skip('connect')
+        else:
+            deadline.sleep(5)
+            connected = connect_session()
+            if connected is None:
+                return
+            application, session = connected
+            if state is not None:
+                state.attach(application, session)
+        session = deadline.guard(session)
+
+        application.HistoryEnabled = False
+
+        deadline.enter('query')
+        if state is not None and find_name(session) is not None:
+            # 仍停留在采购订单界面，不需要再从收藏夹打开
+            state.skip('open_transaction')
+        else:
+            session.findById("wnd[0]/usr/cntlIMAGE_CONTAINER/shellcont/shell/shellcont[0]/shell").doubleClickNode("F00080")
+            try:
+                session.findById("wnd[0]/tbar[1]/btn[8]").press()
+            except Exception:
+                log.info("凭证概览已打开")
         ut.click(r'D:\code\desktop\desktop\image\create_order.png')
         ut.click(r'D:\code\desktop\desktop\image\cg_order.png')
         # try:
         #     ut.click(r'D:\code\desktop\desktop\image\title_open.png')
         # except:
         #     print('标题已打开')
-        sleep(1.5)
+        deadline.sleep(1.5)
         session.findById("wnd[0]/usr/ctxtSP$00026-LOW").text = str(int(float(cg_order)))
         session.findById("wnd[0]/usr/ctxtSP$00026-LOW").caretPosition = 3
         session.findById("wnd[0]").sendVKey(0)
 
         ut.click(r'D:\code\desktop\desktop\image\open.png')
         ut.click(r'D:\code\desktop\desktop\image\accept.png')
+        title = sap_screen.probe(session).title
         ut.click(r'D:\code\desktop\desktop\image\execute.png')
 
-        try:
-            sleep(1)
-            session.findById("wnd[1]/tbar[0]/btn[0]").press();
+        # 出现查询结果（主窗口标题变化）或弹出提示后立即判断，不再固定等待
+        screen = sap_screen.wait(session, timeout=1.0, until=lambda state: state.title != title)
+        if screen.popup is not None:
+            session.findById("wnd[1]/tbar[0]/btn[0]").press()
             return '没有满足选择标准的数据存在'
-        except:
-            print("数据正常")
+        log.info("数据正常")
 
+        deadline.enter('lines')
         ut.doubleclick(r'D:\code\desktop\desktop\image\open_order_info.png')
 
-        time.sleep(1)
+        deadline.sleep(1)
 
         tree = session.findById("wnd[0]/shellcont/shell/shellcont[1]/shell[1]")
         cghh_list  = []
@@ -105,21 +166,22 @@ def Main(excelData,cg_order):
         if len(cghh_list) > 0:
             return ('行号信息不完整')
 
-        time.sleep(1)
+        deadline.sleep(1)
         ut.click(r'D:\code\desktop\desktop\image\cy.PNG')
 
+        deadline.enter('header')
         try:
-            sleep(1)
+            deadline.sleep(1)
             ut.click(r'D:\code\desktop\desktop\image\title_open.png')
-        except:
-            print('标签栏已打开')
+        except Exception:
+            log.info('标签栏已打开')
 
-        sleep(1)
+        deadline.sleep(1)
         name = find_name(session)
         try:
             session.findById(f"wnd[0]/usr/sub{name}/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1102/tabsHEADER_DETAIL/tabpTABHDT9").select()
-        except:
-            print("不用重新选择")
+        except Exception:
+            log.info("不用重新选择")
         name = find_name(session)
         session.findById(f"wnd[0]/usr/sub{name}/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1102/tabsHEADER_DETAIL/tabpTABHDT9/ssubTABSTRIPCONTROL2SUB:SAPLMEGUI:1221/ctxtMEPO1222-EKORG").text = "15A0"
         session.findById(f"wnd[0]/usr/sub{name}/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1102/tabsHEADER_DETAIL/tabpTABHDT9/ssubTABSTRIPCONTROL2SUB:SAPLMEGUI:1221/ctxtMEPO1222-EKORG").setFocus()
@@ -147,39 +209,90 @@ def Main(excelData,cg_order):
                        "河北万方线缆集团有限公司": "1000002551",
                        "湖南高阳电瓷电器有限公司": "1000046273"
                        }
+        deadline.enter('supplier')
         company = company.strip()
         if company in company_list:
             company = company_map[company]
+        if cached_code is not None:
+            # SAP 确认过的编码，输入后直接带出供应商
+            company = cached_code
 
         session.findById(f"wnd[0]/usr/sub{name}/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:1105/ctxtMEPO_TOPLINE-SUPERFIELD").text = company
         session.findById(f"wnd[0]/usr/sub{name}/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:1105/ctxtMEPO_TOPLINE-SUPERFIELD").setFocus()
         session.findById(f"wnd[0]/usr/sub{name}/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:1105/ctxtMEPO_TOPLINE-SUPERFIELD").caretPosition = 42
         session.findById(f"wnd[0]").sendVKey(0)
         ## 选择公司
+        # 逐行比对只计数，结束后合并为一条事件，避免每个订单几十行日志
         i = 3
-        while i < 70:
+        matched_row = None
+        missing_rows = 0
+        known_row = state.supplier_rows.get(company) if state is not None else None
+        if cached_code is not None:
+            known_row = NO_POPUP
+        # 缓存只决定从哪一行开始找，是否弹窗以当前界面为准
+        if sap_screen.probe(session).popup is None:
+            # 输入后没有弹出选择窗口，不需要逐行查找
+            known_row = NO_POPUP
+        elif known_row == NO_POPUP:
+            # 缓存记录为不弹窗，这次却弹出了选择窗口（如主记录有变化），按行重新查找
+            known_row = None
+            if state is not None:
+                state.supplier_rows.pop(company, None)
+        if known_row == NO_POPUP:
+            if state is not None:
+                state.skip('supplier_lookup')
+        elif known_row is not None:
+            try:
+                cmElement = session.findById(f"wnd[1]/usr/lbl[1,{known_row}]")
+                if cmElement.text.strip() == company.strip():
+                    matched_row = known_row
+                    cmElement.setFocus()
+                    session.findById("wnd[1]").sendVKey(2)
+                    state.skip('supplier_lookup')
+            except Exception:
+                pass
+        while matched_row is None and known_row != NO_POPUP and i < 70:
             try:
                 cmElement = session.findById(f"wnd[1]/usr/lbl[1,{i}]")
-                print(cmElement.text)
-                print(cmElement.text.strip() == company.strip())
                 if cmElement.text.strip() == company.strip():
+                    matched_row = i
                     cmElement.setFocus()
                     session.findById("wnd[1]").sendVKey(2)
                     break
-            except:
-                print(f"公司名字未找到{i}")
+            except Exception:
+                missing_rows += 1
             finally:
                 i = i+1
-
-        company_errro = session.findById("wnd[0]/sbar").text
-        if company_errro == f'供应商{company}不存在主记录':
+        log.event('DEBUG', "选择公司", company=company, matched_row=matched_row,
+                  rows_scanned=i - 3, missing_rows=missing_rows)
+
+        screen = sap_screen.probe(session)
+        if screen.signature is not None and screen.signature.name == 'no_master_record':
+            if state is not None:
+                state.supplier_rows.pop(company, None)
+            if cache is not None:
+                # 缓存的编码失效时下次重新按名称查找，否则登记为没有主记录
+                if cached_code is not None:
+                    cache.invalidate(supplier_name)
+                else:
+                    cache.missing(supplier_name)
             return "公司信息不正确"
 
         name = find_name(session)
         company_name = session.findById(f"wnd[0]/usr/sub{name}/subSUB0:SAPLMEGUI:0030/subSUB1:SAPLMEGUI:1105/ctxtMEPO_TOPLINE-SUPERFIELD").text
         if company_name == '':
+            if state is not None:
+                state.supplier_rows.pop(company, None)
+            if cached_code is not None:
+                cache.invalidate(supplier_name)
             return "公司信息不正确"
+        vendor_code = re.match(r'\s*(\d+)', company_name)
+        if cache is not None and cached_code is None and vendor_code:
+            cache.found(supplier_name, vendor_code.group(1))
+        if state is not None:
+            state.supplier_rows[company] = matched_row if matched_row is not None else NO_POPUP
 
+        deadline.enter('texts')
         name = find_name(session)
         session.findById(f"wnd[0]/usr/sub{name}/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1102/tabsHEADER_DETAIL/tabpTABHDT3").select()
         session.findById(f"wnd[0]/usr/sub{name}/subSUB1:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1102/tabsHEADER_DETAIL/tabpTABHDT3/ssubTABSTRIPCONTROL2SUB:SAPLMEGUI:1230/subTEXTS:SAPLMMTE:0100/subEDITOR:SAPLMMTE:0101/cntlTEXT_EDITOR_0101/shellcont/shell").text = projectName
@@ -191,40 +304,37 @@ def Main(excelData,cg_order):
         ## 收起标题栏
         try:
             ut.click(r'D:\code\desktop\desktop\image\title.png')
-        except:
-            print('标题已经收起')
-        sleep(1)
+        except Exception:
+            log.info('标题已经收起')
+        deadline.sleep(1)
 
 
 
 
+        deadline.enter('items')
+        # 订单行表格按页访问：物料编码列一次读出，价格、币种、价格单位按页写入后各回车一次
+        items = sap_table.Table(session, lambda: f"wnd[0]/usr/sub{find_name(session)}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211")
+        material_rows = {}
+        for i, wlbm in enumerate(items.column(4, stop=len(excelData), until_empty=True)):
+            material_rows.setdefault(wlbm.strip(), []).append(i)
+        prices = {}
         for index,row in excelData.iterrows():
             if projectType == "新住配完善":
                 wlPrice = row['含税单价']
             else:
                 wlPrice = row['不含税单价']
             bm = row['物料编码']
-            i = 0
-            for i in range(len(excelData)):
-                name = find_name(session)
-                wlbm = session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/ctxtMEPO1211-EMATN[4,{i}]").text
-                if str(bm) == str(wlbm):
-                    name = find_name(session)
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-NETPR[10,{i}]").text = wlPrice
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-NETPR[10,{i}]").setFocus()
-                    session.findById(f"wnd[0]").sendVKey(0)
-                    try:
-                        name = find_name(session)
-                        session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-WAERS[11,{i}]").text = 'RMB'
-                        session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-WAERS[11,{i}]").setFocus()
-                        session.findById(f"wnd[0]").sendVKey(0)
-                    except Exception as e:
-                        print('rmb字段不需要填入')
-                    name = find_name(session)
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-PEINH[12,{i}]").text = 1
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB2:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1211/tblSAPLMEGUITC_1211/txtMEPO1211-PEINH[12,{i}]").setFocus()
-                    session.findById(f"wnd[0]").sendVKey(0)
-                    i = i + 1
+            for i in material_rows.get(str(bm).strip(), []):
+                prices[i] = wlPrice
+        enter = lambda: session.findById(f"wnd[0]").sendVKey(0)
+        items.fill(10, prices, enter)
+        # 币种字段只在部分订单行可编辑：不可写的行记下来，合并输出一条日志
+        readonly = {}
+        items.fill(11, {i: 'RMB' for i in prices}, enter,
+                   on_error=lambda i, e: readonly.setdefault(i, f"{type(e).__name__}: {e}"))
+        if readonly:
+            log.info('rmb字段不需要填入', rows=sorted(readonly), errors=sorted(set(readonly.values())))
+        items.fill(12, {i: 1 for i in prices}, enter)
 
         tax = None
         taxCode = None
@@ -235,19 +345,19 @@ def Main(excelData,cg_order):
             tax = 13
             taxCode = 'U2'
 
+        deadline.enter('conditions')
+        # 条件表格按页查找"进项税率"，不受可见行数限制
+        conditions = sap_table.Table(session, lambda: f"wnd[0]/usr/sub{find_name(session)}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN")
+
         for index,row in excelData.iterrows():
             name = find_name(session)
             session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8").select()
-            index = 0
-            while index<10:
-                name = find_name(session)
-                taxText = session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtT685T-VTEXT[2,{index}]").text
-                if taxText == '进项税率':
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtKOMV-KBETR[3,{index}]").text = tax
-                    session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtKOMV-KBETR[3,{index}]").setFocus()
-                    session.findById(f"wnd[0]").sendVKey(0)
-                    break
-                index = index + 1
+            tax_row = conditions.find(2, '进项税率')
+            if tax_row is not None:
+                tax_cell = conditions.cell(tax_row, 3)
+                tax_cell.text = tax
+                tax_cell.setFocus()
+                session.findById(f"wnd[0]").sendVKey(0)
             name = find_name(session)
             session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT7").select()
             name = find_name(session)
@@ -262,19 +372,13 @@ def Main(excelData,cg_order):
             name = find_name(session)
             session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8").select()
             session.findById(f"wnd[0]").sendVKey(0)
-            index = 0
-            while index < 10:
-                name = find_name(session)
-                taxText = session.findById(
-                    f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtT685T-VTEXT[2,{index}]").text
-                if taxText == '进项税率':
-                    session.findById(
-                        f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtKOMV-KBETR[3,{index}]").text = tax
-                    session.findById(
-                        f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT8/ssubTABSTRIPCONTROL1SUB:SAPLMEGUI:1333/ssubSUB0:SAPLV69A:6201/tblSAPLV69ATCTRL_KONDITIONEN/txtKOMV-KBETR[3,{index}]").setFocus()
-                    session.findById(f"wnd[0]").sendVKey(0)
-                    break
-                index = index + 1
+            tax_row = conditions.find(2, '进项税率')
+            if tax_row is not None:
+                tax_cell = conditions.cell(tax_row, 3)
+                tax_cell.text = tax
+                tax_cell.setFocus()
+                session.findById(f"wnd[0]").sendVKey(0)
+            name = find_name(session)
             session.findById(f"wnd[0]/usr/sub{name}/subSUB3:SAPLMEVIEWS:1100/subSUB2:SAPLMEVIEWS:1200/subSUB1:SAPLMEGUI:1301/subSUB2:SAPLMEGUI:1303/tabsITEM_DETAIL/tabpTABIDT7").select()
             session.findById(f"wnd[0]").sendVKey(0)
             name = find_name(session)
@@ -289,36 +393,30 @@ def Main(excelData,cg_order):
         #     ut.click(r'D:\code\desktop\desktop\image\title_open.png')
         # except:
         #     print('标题已打开')
-        sleep(1)
+        deadline.sleep(1)
 
+        deadline.enter('save')
+        before = sap_screen.probe(session)
         ut.click(r'D:\code\desktop\desktop\image\save.png')
-        try:
-            time.sleep(1)
-            error_message = session.findById("wnd[1]/usr/lbl[7,5]").text
-            session.findById("wnd[1]/tbar[0]/btn[0]").press()
-            if '超出预算' in error_message:
-                error_message = '超预算'
-            return error_message
-        except:
-            print("无错误信息")
-
-        try:
-            error_message = session.findById("wnd[1]/usr/txtSPOP-TEXTLINE1").text
-            if '凭证仍有错' in error_message:
-                error_message='凭证仍有错'
-                session.findById("wnd[1]/usr/btnCANCEL").press()
-                return error_message
-            elif '系统消息已发出' in error_message:
-                print("继续保存")
-        except:
-            print("无错误")
-        sleep(1)
+        # 保存后的弹窗一次探测归类：超预算、保存错误、凭证仍有错直接返回，系统消息继续保存；
+        # 没有弹窗时状态栏或标题一变化就返回，不等满超时
+        screen = sap_screen.wait(session, timeout=1.0,
+                                 until=lambda state: state.status != before.status or state.title != before.title)
+        if screen.popup is not None and screen.kind in (sap_screen.BUDGET, sap_screen.ERROR):
+            sap_screen.dismiss(session, screen)
+            return screen.message
+        if screen.kind == sap_screen.CONFIRM:
+            log.info("继续保存")
+        else:
+            log.info("无错误信息")
         ut.click(r'D:\code\desktop\desktop\image\save1.png')
         session.findById("wnd[0]/sbar").doubleClick()
         result = session.findById("wnd[1]/usr/lbl[1,2]").text
         order_num = re.findall(r'\d+',result)
         session.findById("wnd[1]/tbar[0]/btn[0]").press()
-        session.findById("wnd[0]/tbar[0]/btn[3]").press()
+        if state is None:
+            session.findById("wnd[0]/tbar[0]/btn[3]").press()
+        # 复用会话状态时留在采购订单界面，下一个任务跳过打开事务（见 process_tasks）
         return int(order_num[0])
 
         # name = find_name(session)
@@ -340,11 +438,14 @@ def Main(excelData,cg_order):
         #     return '订单金额不正确'
 
 
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"操作时错误：{e}")
+        log.error(f"操作时错误：{e}", error_type=type(e).__name__)
         raise
     finally:
-        application.HistoryEnabled = True
+        if application is not None:
+            application.HistoryEnabled = True
         session = None
         connection = None
         application = None
@@ -357,3 +458,30 @@ def find_name(session):
         if 'SUB0:SAPLMEGUI' in name:
             return name
     return None
+
+# 订单超出时间预算（utils.deadline）时 process_tasks 记录的结果
+DEADLINE_EXCEEDED = '处理超时'
+
+# Main 返回的已知错误信息 -> 错误分类
+KNOWN_ERRORS = {
+    DEADLINE_EXCEEDED: '处理超时',
+    '没有满足选择标准的数据存在': '无可用数据',
+    '行号信息不完整': '行号信息不完整',
+    '公司信息不正确': '公司信息不正确',
+    '超预算': '超预算',
+    '凭证仍有错': '凭证仍有错',
+}
+
+def classify_result(result):
+    """
+    将 Main 的返回值归类。
+
+    Returns:
+        tuple: (是否成功, 订单号, 错误分类)。成功时错误分类为 None；
+               空返回值表示写入过程抛出异常；其它保存弹窗信息归为"保存错误"。
+    """
+    if isinstance(result, int):
+        return True, result, None
+    if not result:
+        return False, None, '写入订单异常'
+    return False, None, KNOWN_ERRORS.get(result, '保存错误')
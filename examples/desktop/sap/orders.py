@@ -0,0 +1,162 @@
+"""
+SAP 采购订单批处理
+
+登录 SAP 和逐个任务创建采购订单的流程，供 test.py（整表处理）和 daemon.py（收件箱增量处理）共用。
+"""
+
+import time
+
+import pyautogui
+
+import utils.guiutils as ut
+import utils.deadline as deadline
+import sap.desktop as dt
+import sap.screen as sap_screen
+from common.history import SUCCESS, FAILED
+from common.log import get_logger
+
+HISTORY_SOURCE = 'sap_purchase_order'
+log = get_logger(HISTORY_SOURCE)
+
+# 计入熔断的失败：会话异常或超时；供应商、行号、预算等采购申请本身的问题不计入
+BREAKER_ERRORS = ('写入订单异常', dt.DEADLINE_EXCEEDED)
+
+
+def start_and_login():
+    """
+    启动 SAP Logon 并登录，打开新会话。
+
+    Returns:
+        pywinauto.Application: SAP Logon 进程，结束时调用 kill_()。
+    """
+    from pywinauto import Application
+
+    # subprocess.Popen(r"C:\Program Files (x86)\SAP\FrontEnd\SAPgui\saplogon.exe")
+    app = Application().start(r"C:\Program Files (x86)\SAP\FrontEnd\SAPgui\saplogon.exe")
+
+    login = ut.wait_and_locate_image(r'D:\code\desktop\desktop\image\login.png',0.8,10)
+
+    if login:
+        pyautogui.click(login)
+    else:
+        log.error("未找到登录按钮", step='login')
+
+    time.sleep(2)
+    pyautogui.write('AIDJ')
+    pyautogui.press('tab')
+    time.sleep(0.3)
+    pyautogui.write('Aa-82526363')
+    time.sleep(0.3)
+    pyautogui.press('enter')
+
+    ut.click(r'D:\code\desktop\desktop\image\continue_login.png')
+
+    ut.click(r'D:\code\desktop\desktop\image\confirm_login.png')
+
+    # time.sleep(1)
+    # pyautogui.hotkey('win','up')
+
+    ut.doubleclick(r'D:\code\desktop\desktop\image\new.png')
+    return app
+
+
+def _screen_summary(session):
+    """超时时的界面状态，用于定位卡在哪个界面"""
+    try:
+        screen = sap_screen.probe(session)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"kind": screen.kind, "title": screen.title, "status": screen.status[1],
+            "popup": screen.popup['title'] if screen.popup is not None else None,
+            "message": screen.message}
+
+
+def process_tasks(processor, plan, history, run_id, state, progress=None, report=None,
+                  budget=deadline.Budget.from_env, breaker=None):
+    """
+    逐个任务创建采购订单，并把订单号写回 Excel。
+
+    每个任务在自己的时间预算内执行，超出预算时立即中止并记录所在阶段、已用时间和界面状态；
+    连续失败达到熔断阈值时暂停批次（或停止，见 utils.deadline）。
+
+    Args:
+        processor (ExcelProcessor): 任务所属工作簿的处理器（changeData 记录结果，批次结束时 save 写回一次）。
+        plan (list): sap.schedule.WorkItem 列表，按处理顺序排列。
+        history (HistoryWriter): 执行历史。
+        run_id (str): 本次运行标识。
+        state (SessionState): 任务之间共享的会话状态。
+        progress (Progress): 进度，未提供时不报告进度。
+        report (ResultReport): 结果报告，每个任务完成后追加一行。
+        budget: 无参函数，为每个任务创建 utils.deadline.Budget；None 表示不限制时间。
+        breaker (CircuitBreaker): 连续失败熔断，未提供时不熔断。
+
+    Returns:
+        list: 每个已执行任务一条 (WorkItem, 是否成功, 订单号, 错误分类)；熔断停止批次时不含未执行的任务。
+    """
+    results = []
+    # 有进度时错误经由进度输出（立即输出并计入失败数）
+    report_error = progress.error if progress is not None else log.error
+    try:
+        for item in plan:
+            po_num, gys, gys_data = item.apply_no, item.supplier, item.data
+            order= str(po_num)
+            if progress is not None:
+                progress.set_group(f'{order} {gys}')
+            success, order_number, error_type = False, None, None
+            detail = {}
+            order_start = time.time()
+            try:
+                order_num = ''
+                try:
+                    with (budget() if budget is not None else deadline.Budget()).active():
+                        order_num = dt.Main(gys_data,order,state)
+                except deadline.DeadlineExceeded as e:
+                    # 关闭界面等收尾操作在预算之外执行
+                    order_num = dt.DEADLINE_EXCEEDED
+                    detail = {"phase": e.phase, "elapsed": round(e.elapsed, 1), "limit": e.limit,
+                              "phases": e.timings, "screen": _screen_summary(state.session) if state.alive() else None}
+                except Exception:
+                    report_error('写入订单异常', apply_no=order, supplier=gys)
+                finally:
+                    if state.alive() and dt.find_name(state.session) is None:
+                        # 已退出采购订单界面，不需要再关闭
+                        state.skip('close_transaction')
+                    elif isinstance(order_num, int) and state.alive():
+                        # 订单已保存，留在采购订单界面给下一个任务复用
+                        state.skip('close_transaction')
+                    else:
+                        # 未保存的凭证：关闭界面并放弃修改
+                        ut.click(r'D:\code\desktop\desktop\image\close.png')
+                        ut.click(r'D:\code\desktop\desktop\image\no.png')
+                success, order_number, error_type = dt.classify_result(order_num)
+                history.record_outcome(HISTORY_SOURCE, SUCCESS if success else FAILED, run_id=run_id,
+                                       apply_no=order, supplier=gys, error_type=error_type,
+                                       order_number=order_number,
+                                       duration_ms=int((time.time() - order_start) * 1000))
+                if not success:
+                    reason = f"{order_num}（阶段 {detail['phase']}，已用 {detail['elapsed']} 秒）" if detail else order_num
+                    report_error(f'采购申请号：{po_num} 未生成订单：{reason}', apply_no=order,
+                                 supplier=gys, error_type=error_type, **detail)
+                processor.changeData(po_num,gys_data,order_num,save=False)
+            except Exception as e:
+                report_error(f'制作订单出错{e}', apply_no=order, supplier=gys)
+                error_type = error_type or type(e).__name__
+            results.append((item, success, order_number, error_type))
+            if report is not None:
+                report.add(order, gys, success, order_number, error_type,
+                           int((time.time() - order_start) * 1000), len(gys_data))
+            if progress is not None:
+                progress.advance()
+            remaining = len(plan) - len(results)
+            if breaker is not None and breaker.record(success or error_type not in BREAKER_ERRORS) and remaining:
+                if breaker.stops:
+                    log.error(f'连续 {breaker.failures} 个订单失败，停止批次，剩余 {remaining} 个任务未执行',
+                              failures=breaker.failures, remaining=remaining)
+                    break
+                log.warning(f'连续 {breaker.failures} 个订单失败，暂停 {breaker.pause:g} 秒后继续',
+                            failures=breaker.failures, remaining=remaining, trips=breaker.trips)
+                breaker.cool_down()
+    finally:
+        # 各任务的结果先记在内存中，整个工作簿只写回一次（含中途停止或中断的批次）
+        processor.save()
+    return results
@@ -0,0 +1,122 @@
+"""
+采购订单任务排序与会话状态复用
+
+按 采购申请号 -> 供应商 拆出的每个任务都要在 SAP 中创建一张采购订单。
+原来按 groupby 的键顺序处理，相邻任务的供应商和类别来回切换，
+每个任务都要重新连接脚本会话、重新在供应商弹窗中逐行查找。
+
+schedule 按 供应商 -> 类别 重新排列任务（组内保持原顺序），让相同供应商和类别的任务相邻；
+SessionState 在任务之间保留热状态（脚本会话、供应商弹窗中的行号、是否已在订单界面），
+Main 据此跳过重复的导航步骤，最后报告节省的切换次数。
+"""
+
+from collections import Counter, OrderedDict, namedtuple
+
+WorkItem = namedtuple('WorkItem', ['apply_no', 'supplier', 'category', 'data'])
+
+# 供应商输入编码后 SAP 直接带出，不弹出选择窗口
+NO_POPUP = -1
+
+
+def build_work_items(processor, grouped_orders):
+    """
+    把采购申请按供应商拆成任务，顺序与原来的处理顺序一致。
+
+    Args:
+        processor (ExcelProcessor): 已读取数据的处理器。
+        grouped_orders (dict): 采购申请号 -> DataFrame。
+
+    Returns:
+        list: WorkItem 列表。
+    """
+    items = []
+    for po_num, po_df in grouped_orders.items():
+        for gys, gys_data in processor.group_data_by_column(po_df, '供应商').items():
+            category = gys_data['类别'].iloc[0] if '类别' in gys_data.columns else None
+            items.append(WorkItem(po_num, gys, category, gys_data))
+    return items
+
+
+def schedule(items):
+    """
+    按 供应商 -> 类别 排列任务；供应商和类别按首次出现的顺序，同组内保持原顺序。
+
+    Returns:
+        list: 重新排列后的 WorkItem 列表。
+    """
+    groups = OrderedDict()
+    for item in items:
+        groups.setdefault(item.supplier, OrderedDict()).setdefault(item.category, []).append(item)
+    return [item for categories in groups.values() for bucket in categories.values() for item in bucket]
+
+
+def count_transitions(items):
+    """
+    相邻任务之间的切换次数。
+
+    Returns:
+        dict: supplier（供应商切换）、category（类别切换）。
+    """
+    counts = {"supplier": 0, "category": 0}
+    for previous, current in zip(items, items[1:]):
+        if previous.supplier != current.supplier:
+            counts["supplier"] += 1
+        if previous.category != current.category:
+            counts["category"] += 1
+    return counts
+
+
+class SessionState:
+    """
+    任务之间保留的 SAP 会话热状态。
+
+    Attributes:
+        application / session: 已连接的脚本引擎和会话，仍可用时直接复用。
+        supplier_rows (dict): 供应商 -> 选择弹窗中的行号（NO_POPUP 表示不弹窗）。
+        skipped (Counter): 各导航步骤被跳过的次数。
+        supplier_cache (SupplierCache): 跨运行保存的供应商校验结果，可为 None。
+    """
+
+    def __init__(self, supplier_cache=None):
+        self.supplier_cache = supplier_cache
+        self.application = None
+        self.session = None
+        self.supplier_rows = {}
+        self.skipped = Counter()
+
+    def alive(self):
+        """缓存的会话是否仍可用（SAP 关闭或会话断开时访问会抛异常）"""
+        if self.session is None:
+            return False
+        try:
+            return not self.session.Busy
+        except Exception:
+            self.application = None
+            self.session = None
+            return False
+
+    def attach(self, application, session):
+        self.application = application
+        self.session = session
+
+    def skip(self, step):
+        """记录一次跳过的导航步骤"""
+        self.skipped[step] += 1
+
+
+def report(original, scheduled, state=None):
+    """
+    排序前后的切换次数以及运行中跳过的导航步骤。
+
+    Returns:
+        dict: before / after / saved 切换次数和 skipped 明细。
+    """
+    before = count_transitions(original)
+    after = count_transitions(scheduled)
+    return {
+        "tasks": len(scheduled),
+        "before": before,
+        "after": after,
+        "saved": {key: before[key] - after[key] for key in before},
+        "skipped": dict(state.skipped) if state is not None else {},
+    }
@@ -0,0 +1,172 @@
+"""
+SAP 界面状态探测
+
+原来判断弹窗的方式是先 sleep(1)，再在 try/except 中 findById("wnd[1]/...")，
+无论弹窗是否存在，每次检查都要花一秒左右。
+
+probe 一次读取会话中打开的窗口、弹窗中的文本元素和状态栏，
+按 SIGNATURES 中登记的已知特征归类为：没有弹窗、错误、需要确认、超预算、无数据等。
+wait 在会话空闲后立即探测，出现弹窗（或满足指定条件）就返回，超时前不做固定等待。
+
+用法:
+    screen = sap_screen.wait(session, timeout=1.0)
+    if screen.kind == sap_screen.ERROR:
+        sap_screen.dismiss(session, screen)
+        return screen.message
+"""
+
+import re
+import time
+from collections import namedtuple
+
+import utils.deadline as deadline
+
+# 界面状态分类
+NO_POPUP = 'NO_POPUP'   # 没有弹窗
+NO_DATA = 'NO_DATA'     # 没有满足选择标准的数据
+ERROR = 'ERROR'         # 错误弹窗或错误状态栏
+BUDGET = 'BUDGET'       # 超出预算
+CONFIRM = 'CONFIRM'     # 需要确认后继续
+POPUP = 'POPUP'         # 未登记的弹窗
+
+# 已知的界面特征
+#   element  匹配的元素：弹窗内元素 Id 的结尾（如 usr/lbl[7,5]），'sbar' 表示状态栏，None 表示弹窗内任一元素
+#   pattern  文本正则（re.search）
+#   message  返回给调用方的错误信息，None 表示使用匹配到的文本
+#   dismiss  关闭弹窗的按钮 Id，None 表示不需要关闭
+Signature = namedtuple('Signature', ['name', 'kind', 'element', 'pattern', 'message', 'dismiss'])
+
+# 按顺序匹配，先匹配到的生效
+SIGNATURES = (
+    Signature('no_data', NO_DATA, None, '没有满足选择标准的数据存在', '没有满足选择标准的数据存在', 'wnd[1]/tbar[0]/btn[0]'),
+    Signature('budget', BUDGET, 'usr/lbl[7,5]', '超出预算', '超预算', 'wnd[1]/tbar[0]/btn[0]'),
+    Signature('save_error', ERROR, 'usr/lbl[7,5]', '.', None, 'wnd[1]/tbar[0]/btn[0]'),
+    Signature('document_error', ERROR, 'usr/txtSPOP-TEXTLINE1', '凭证仍有错', '凭证仍有错', 'wnd[1]/usr/btnCANCEL'),
+    Signature('system_message', CONFIRM, 'usr/txtSPOP-TEXTLINE1', '系统消息已发出', None, None),
+    Signature('no_master_record', ERROR, 'sbar', '供应商.*不存在主记录', '公司信息不正确', None),
+)
+
+# 一次探测的结果
+#   windows    打开的窗口 Id，如 ['wnd[0]', 'wnd[1]']
+#   title      主窗口标题
+#   popup      最上层弹窗 {'id', 'title', 'texts': {元素 Id: 文本}}，没有弹窗时为 None
+#   status     状态栏 (消息类型, 文本)
+#   signature  匹配到的 Signature，没有匹配时为 None
+#   message    错误信息（特征的 message 或匹配到的文本）
+ScreenState = namedtuple('ScreenState', ['kind', 'windows', 'title', 'popup', 'status', 'signature', 'message'])
+
+
+def _short_id(element_id):
+    """/app/con[0]/ses[0]/wnd[1]/usr/lbl[7,5] -> wnd[1]/usr/lbl[7,5]"""
+    position = element_id.find('/wnd[')
+    return element_id[position + 1:] if position >= 0 else element_id
+
+
+def _texts(container, texts):
+    """收集容器下各元素的文本（含子容器）"""
+    children = container.Children
+    for index in range(children.Count):
+        child = children(index)
+        try:
+            text = child.Text
+        except Exception:
+            text = None
+        if text:
+            texts[_short_id(child.Id)] = text
+        try:
+            if child.ContainerType:
+                _texts(child, texts)
+        except Exception:
+            pass
+
+
+def _read(session):
+    windows = []
+    children = session.Children
+    for index in range(children.Count):
+        windows.append(_short_id(children(index).Id))
+
+    main = session.findById('wnd[0]')
+    title = main.Text
+    sbar = session.findById('wnd[0]/sbar')
+    status = (sbar.MessageType, sbar.Text)
+
+    popup = None
+    if len(windows) > 1:
+        top = session.findById(windows[-1])
+        texts = {}
+        _texts(session.findById(f'{windows[-1]}/usr'), texts)
+        popup = {'id': windows[-1], 'title': top.Text, 'texts': texts}
+    return windows, title, popup, status
+
+
+def classify(popup, status, signatures=SIGNATURES):
+    """
+    按特征表归类。
+
+    Returns:
+        tuple: (kind, Signature, message)。
+    """
+    for signature in signatures:
+        if signature.element == 'sbar':
+            candidates = [status[1]] if status and status[1] else []
+        elif popup is None:
+            continue
+        elif signature.element is None:
+            candidates = list(popup['texts'].values())
+        else:
+            candidates = [text for element_id, text in popup['texts'].items() if element_id.endswith(signature.element)]
+        for text in candidates:
+            if re.search(signature.pattern, text):
+                return signature.kind, signature, signature.message or text.strip()
+    return (POPUP if popup is not None else NO_POPUP), None, None
+
+
+def probe(session, signatures=SIGNATURES):
+    """
+    读取并归类当前界面状态，不等待。
+
+    Returns:
+        ScreenState: 探测结果。
+    """
+    windows, title, popup, status = _read(session)
+    kind, signature, message = classify(popup, status, signatures)
+    return ScreenState(kind, windows, title, popup, status, signature, message)
+
+
+def _busy(session):
+    try:
+        return session.Busy
+    except Exception:
+        return False
+
+
+def wait(session, timeout=1.0, interval=0.05, until=None, signatures=SIGNATURES):
+    """
+    等待界面稳定后探测：出现弹窗或 until(state) 为真时立即返回，否则在超时后返回最后一次探测结果。
+
+    Args:
+        session: SAP GUI 脚本会话。
+        timeout (float): 最长等待时间（秒），应对图像点击等异步操作；不超过当前订单的剩余预算。
+        interval (float): 探测间隔（秒）。
+        until: 可选，until(ScreenState) 为真时提前返回（例如主窗口标题已变化）。
+
+    Returns:
+        ScreenState: 探测结果。
+    """
+    expires = time.monotonic() + deadline.clamp(timeout)
+    state = None
+    while True:
+        if not _busy(session):
+            state = probe(session, signatures)
+            if state.popup is not None or (until is not None and until(state)):
+                return state
+        if time.monotonic() >= expires:
+            return state if state is not None else probe(session, signatures)
+        time.sleep(interval)
+
+
+def dismiss(session, state):
+    """按匹配到的特征关闭弹窗；特征没有登记关闭按钮时不做任何事"""
+    if state.signature is not None and state.signature.dismiss:
+        session.findById(state.signature.dismiss).press()
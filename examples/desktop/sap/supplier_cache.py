@@ -0,0 +1,146 @@
+"""
+供应商主记录校验缓存
+
+每张订单都要在 SAP 中输入供应商（MEPO_TOPLINE-SUPERFIELD）、在弹窗中逐行查找，
+再检查状态栏的 "供应商XX不存在主记录"。同一批几百个供应商会被反复校验上千次。
+
+缓存保存两类结果:
+    FOUND    供应商名称 -> SAP 确认过的供应商编码，下次直接输入编码，不弹出选择窗口
+    MISSING  供应商名称 -> 没有主记录，下次在任何界面操作之前直接失败
+
+两类结果分别设置有效期（新建主记录后，MISSING 应尽快失效，默认 1 天；FOUND 默认 30 天）。
+条目数超过上限时按最近使用时间淘汰（LRU）。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+FOUND = 'FOUND'
+MISSING = 'MISSING'
+
+Entry = namedtuple('Entry', ['status', 'vendor_code', 'checked_at'])
+
+DEFAULT_DB = 'supplier_cache.db'
+DAY = 24 * 3600
+
+
+class SupplierCache:
+    """
+    供应商校验结果缓存，可在多个线程间共享。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+        found_ttl (float): FOUND 条目有效期（秒）。
+        missing_ttl (float): MISSING 条目有效期（秒）。
+        max_entries (int): 条目数上限，超过时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, path=DEFAULT_DB, found_ttl=30 * DAY, missing_ttl=DAY, max_entries=5000):
+        self.path = path
+        self.ttl = {FOUND: found_ttl, MISSING: missing_ttl}
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS suppliers (
+                name TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                vendor_code TEXT,
+                checked_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS suppliers_last_used ON suppliers (last_used)")
+        self._conn.commit()
+        self.purge_expired()
+
+    @classmethod
+    def from_env(cls, variable='SUPPLIER_CACHE_DB'):
+        """
+        按环境变量中的数据库路径打开，未配置时使用当前目录下的 supplier_cache.db。
+        SUPPLIER_CACHE_TTL_DAYS / SUPPLIER_CACHE_MISSING_TTL_HOURS 可覆盖两类条目的有效期。
+        """
+        found_days = float(os.environ.get('SUPPLIER_CACHE_TTL_DAYS') or 30)
+        missing_hours = float(os.environ.get('SUPPLIER_CACHE_MISSING_TTL_HOURS') or 24)
+        return cls(os.environ.get(variable) or DEFAULT_DB,
+                   found_ttl=found_days * DAY, missing_ttl=missing_hours * 3600)
+
+    @staticmethod
+    def _key(name):
+        return str(name).strip()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM suppliers").fetchone()[0]
+
+    def lookup(self, name):
+        """
+        查询供应商，命中时刷新最近使用时间。
+
+        Returns:
+            Entry: 未过期的缓存条目；没有或已过期时为 None。
+        """
+        key = self._key(name)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, vendor_code, checked_at FROM suppliers WHERE name = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = Entry(*row)
+            if now - entry.checked_at > self.ttl[entry.status]:
+                self._conn.execute("DELETE FROM suppliers WHERE name = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE suppliers SET last_used = ? WHERE name = ?", (now, key))
+            self._conn.commit()
+            return entry
+
+    def _store(self, name, status, vendor_code):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO suppliers (name, status, vendor_code, checked_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)", (self._key(name), status, vendor_code, now, now))
+            self._conn.execute(
+                "DELETE FROM suppliers WHERE name IN ("
+                "SELECT name FROM suppliers ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._conn.commit()
+
+    def found(self, name, vendor_code):
+        """登记 SAP 确认过的供应商编码"""
+        self._store(name, FOUND, str(vendor_code))
+
+    def missing(self, name):
+        """登记没有主记录的供应商"""
+        self._store(name, MISSING, None)
+
+    def invalidate(self, name):
+        """删除供应商的缓存条目（例如缓存的编码在 SAP 中已不可用）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM suppliers WHERE name = ?", (self._key(name),))
+            self._conn.commit()
+
+    def purge_expired(self):
+        """
+        删除已过期的条目。
+
+        Returns:
+            int: 删除的条目数。
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM suppliers WHERE (status = ? AND checked_at < ?) OR (status = ? AND checked_at < ?)",
+                (FOUND, now - self.ttl[FOUND], MISSING, now - self.ttl[MISSING]))
+            self._conn.commit()
+            return cursor.rowcount
@@ -0,0 +1,139 @@
+"""
+SAP 表格控件分页访问
+
+原来按可见行号直接访问 tblSAPLMEGUITC_1211[列,i]、tblSAPLV69ATCTRL_KONDITIONEN[列,i]，
+订单行数超过一屏时访问不到后面的行；按行逐个查找物料编码还要读 n² 次单元格。
+
+Table 读取 RowCount / VisibleRowCount，通过 verticalScrollbar.position 一页一页滚动：
+每页一次读取整列，逻辑行号换算为当前页的可见行号；写入时按页分组，
+同一页的单元格全部填完后再回车确认，几百行的订单只需要少数几次翻页。
+
+滚动和回车都会让 SAP 重新绘制界面，之前取得的控件引用失效，
+所以表格路径以函数提供（sub 区域名称会变化），每次翻页后重新查找。
+"""
+
+
+class Table:
+    """
+    分页访问的表格控件。
+
+    Args:
+        session: SAP GUI 脚本会话。
+        locate: 无参函数，返回表格控件的 Id（如 wnd[0]/usr/sub.../tblSAPLMEGUITC_1211）。
+    """
+
+    def __init__(self, session, locate):
+        self.session = session
+        self._locate = locate
+        self.scrolls = 0
+
+    def control(self):
+        """重新查找表格控件"""
+        return self.session.findById(self._locate())
+
+    @property
+    def row_count(self):
+        return self.control().RowCount
+
+    def _page(self, first_row):
+        """
+        把 first_row 滚动到第一个可见行（已在当前页时不滚动）。
+
+        Returns:
+            tuple: (表格控件, 当前页第一行的逻辑行号, 当前页行数)。
+        """
+        table = self.control()
+        position = table.verticalScrollbar.position
+        visible = table.VisibleRowCount
+        if not position <= first_row < position + visible:
+            table.verticalScrollbar.position = first_row
+            self.scrolls += 1
+            table = self.control()
+            position = table.verticalScrollbar.position
+        return table, position, min(visible, table.RowCount - position)
+
+    def column(self, column, start=0, stop=None, until_empty=False):
+        """
+        按页读取一列的文本。
+
+        Args:
+            column (int): 列号。
+            start / stop (int): 逻辑行范围，stop 默认到最后一行。
+            until_empty (bool): 遇到空单元格即停止（订单行表格末尾是空白输入行）。
+
+        Returns:
+            list: 从 start 开始的各行文本。
+        """
+        stop = self.row_count if stop is None else stop
+        texts = []
+        row = start
+        while row < stop:
+            table, position, count = self._page(row)
+            if count <= 0:
+                break
+            for visible_row in range(row - position, count):
+                if position + visible_row >= stop:
+                    break
+                text = table.GetCell(visible_row, column).Text
+                if until_empty and not text.strip():
+                    return texts
+                texts.append(text)
+            row = position + count
+        return texts
+
+    def find(self, column, text, limit=None, until_empty=True):
+        """
+        查找列中文本等于 text 的第一行。
+
+        Args:
+            limit (int): 只查找前 limit 行。
+            until_empty (bool): 遇到空单元格即停止。
+
+        Returns:
+            int: 逻辑行号；没有时为 None。
+        """
+        for row, value in enumerate(self.column(column, stop=limit, until_empty=until_empty)):
+            if value.strip() == text:
+                return row
+        return None
+
+    def cell(self, row, column):
+        """滚动到逻辑行所在的页，返回单元格"""
+        table, position, _ = self._page(row)
+        return table.GetCell(row - position, column)
+
+    def fill(self, column, values, confirm=None, on_error=None):
+        """
+        按页写入一列：同一页的单元格写完后调用一次 confirm（通常是回车）。
+
+        Args:
+            column (int): 列号。
+            values (dict): 逻辑行号 -> 写入的值。
+            confirm: 每页写完后调用的无参函数。
+            on_error: on_error(行号, 异常)，单元格不可写时调用；未提供时抛出异常。
+
+        Returns:
+            int: 写入的单元格数。
+        """
+        written = 0
+        rows = sorted(values)
+        index = 0
+        while index < len(rows):
+            table, position, count = self._page(rows[index])
+            touched = False
+            while index < len(rows) and rows[index] < position + count:
+                row = rows[index]
+                try:
+                    cell = table.GetCell(row - position, column)
+                    cell.text = values[row]
+                    cell.setFocus()
+                    written += 1
+                    touched = True
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(row, e)
+                index += 1
+            if touched and confirm is not None:
+                confirm()
+        return written
@@ -1,10 +1,25 @@
 
 from PIL import Image, ImageDraw, ImageFont
-import pyautogui, time
-import utils.guiutils as ut
-import sap.desktop as dt
-from pywinauto import Application
+import os, sys
+import time
+
+# 共享模块位于上一级 examples/ 目录
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import sap.schedule as schedule
+import sap.orders as orders
+from sap.supplier_cache import SupplierCache
+from utils.deadline import CircuitBreaker
 from excel.ExcelProcessor import ExcelProcessor
+from excel.multi import MultiWorkbook
+from excel.report import ResultReport
+from common.history import HistoryWriter, new_run_id, SUCCESS, FAILED
+from common.log import get_logger
+from common.progress import Progress
+from common import profiling
+
+HISTORY_SOURCE = orders.HISTORY_SOURCE
+log = get_logger(HISTORY_SOURCE)
 
 
 def text_to_image(text, font_path=r'C:\Windows\Fonts\simsun', font_size=18):
@@ -18,81 +33,60 @@ def text_to_image(text, font_path=r'C:\Windows\Fonts\simsun', font_size=18):
     return img
 
 if __name__ == '__main__':
+    # RPA_PROFILE 开启时剖析整个运行，进程退出时写出结果
+    profiling.start(HISTORY_SOURCE)
 
-
-    # subprocess.Popen(r"C:\Program Files (x86)\SAP\FrontEnd\SAPgui\saplogon.exe")
-    app = Application().start(r"C:\Program Files (x86)\SAP\FrontEnd\SAPgui\saplogon.exe")
-
-    timeout = 10
-    start_time = time.time()
-    success = False
-
-
-    login = ut.wait_and_locate_image(r'D:\code\desktop\desktop\image\login.png',0.8,10,0.5)
-
-
-    if login:
-        pyautogui.click(login)
-    else:
-        print("error1")
-
-    time.sleep(2)
-    pyautogui.write('AIDJ')
-    pyautogui.press('tab')
-    time.sleep(0.3)
-    pyautogui.write('Aa-82526363')
-    time.sleep(0.3)
-    pyautogui.press('enter')
-
-    ut.click(r'D:\code\desktop\desktop\image\continue_login.png')
-
-    ut.click(r'D:\code\desktop\desktop\image\confirm_login.png')
-
-
-    # time.sleep(1)
-    # pyautogui.hotkey('win','up')
-
-    ut.doubleclick(r'D:\code\desktop\desktop\image\new.png')
-
-
-
-
+    app = orders.start_and_login()
 
     file_name = 'D:\code\desktop\desktop\测试项目.xlsx'
     # file_name = 'D:\code\desktop\测试项目.xlsx'
 
+    # 命令行给出多个工作簿时并行读取后合并处理，订单号写回各自的来源文件
+    paths = sys.argv[1:] or [file_name]
+    file_name = paths[0]
+
     # 1. 创建 ExcelProcessor 实例
-    processor = ExcelProcessor(file_name)
+    processor = MultiWorkbook(paths) if len(paths) > 1 else ExcelProcessor(file_name)
     # 2. 读取数据
     data_frame = processor.read_data()
+    for path, sheet, problem in getattr(processor, 'errors', []):
+        log.warning(f'{os.path.basename(path)} {sheet or ""} 未参与处理: {problem}', file=path, sheet=sheet)
+    run_id = new_run_id()
+    run_start = time.time()
+    history = HistoryWriter()
     if data_frame is not None:
         # 3. 根据“采购订单号”列进行分组
         grouped_orders = processor.group_by_column('采购申请号')
         if grouped_orders:
-
-            for po_num, po_df in grouped_orders.items():
-                try:
-                    dd = processor.group_data_by_column(po_df,'供应商')
-                    for gys, gys_data in dd.items():
-                        order= str(po_num)
-                        print(f'采购申请号：{po_num}')
-                        # 获取session
-                        order_num = ''
-                        try:
-                            order_num = dt.Main(gys_data,order)
-                        except:
-                            print('写入订单异常')
-                        finally:
-                            ut.click(r'D:\code\desktop\desktop\image\close.png')
-                            ut.click(r'D:\code\desktop\desktop\image\no.png')
-                        processor.changeData(po_num,gys_data,order_num)
-                except Exception as e:
-                    print(f'制作订单出错{e}')
+            log.set_step('order')
+            # 按 供应商 -> 类别 排列任务，相邻任务复用会话和供应商查找结果
+            items = schedule.build_work_items(processor, grouped_orders)
+            plan = schedule.schedule(items)
+            state = schedule.SessionState(SupplierCache.from_env())
+            progress = Progress(log, total=len(plan), step='order')
+            progress.milestone(f'读取到 {len(grouped_orders)} 个采购申请，拆分为 {len(plan)} 个订单任务', files=paths)
+
+            # 结果报告与源文件同目录，逐个任务写入
+            report_path = os.path.join(os.path.dirname(file_name), f'采购订单结果_{run_id}.xlsx')
+            with ResultReport(report_path) as report:
+                orders.process_tasks(processor, plan, history, run_id, state, progress, report,
+                                     breaker=CircuitBreaker.from_env())
+            log.info(f'结果报告已写入: {report_path}', rows=report.rows)
+
+            summary = schedule.report(items, plan, state)
+            log.info(f"任务排序减少供应商切换 {summary['saved']['supplier']} 次、类别切换 {summary['saved']['category']} 次，"
+                     f"跳过导航步骤 {sum(summary['skipped'].values())} 次", **summary)
+            progress.finish('采购申请处理完成')
+            state.supplier_cache.close()
 
         else:
-            print("未获取到分组数据，请检查文件内容或列名。")
+            log.error("未获取到分组数据，请检查文件内容或列名。")
     else:
-        print("数据读取失败，无法进行分组操作。")
+        log.error("数据读取失败，无法进行分组操作。")
+
+    history.record_run(run_id, HISTORY_SOURCE, SUCCESS if data_frame is not None else FAILED,
+                       duration_ms=int((time.time() - run_start) * 1000), payload={"file": file_name, "files": paths})
+    history.close()
 
     app.kill_()
 
@@ -0,0 +1,253 @@
+"""
+订单处理的时间预算与熔断
+
+SAP 卡住或出现意外界面时，Main 会继续执行剩下的每一个 findById（大多包在 try/except 中），
+每次 ut.click 找不到图片都要等满自己的超时，一个出问题的订单可能耗掉几分钟才返回错误。
+
+Budget 给每个订单一个总预算，并可以给各阶段单独设置预算；process_tasks 在订单开始时激活，
+Main 用 enter 切换阶段。激活期间:
+    guiutils 的图像等待、sap.screen.wait 的等待时间不超过剩余预算，超时后不再等待
+    guard 包装的会话在每次 findById 前检查预算
+    sleep 不超过剩余预算
+预算用完时抛出 DeadlineExceeded（带阶段、已用时间和各阶段耗时），订单立即中止。
+DeadlineExceeded 派生自 BaseException：Main 中吞掉界面异常的 except Exception 不会拦住它。
+
+CircuitBreaker 统计连续失败的订单数，达到阈值时暂停整个批次（SAP 整体不可用时不再逐个耗尽预算），
+暂停后再试一个订单，仍失败则再次暂停；暂停时间为 0 时直接停止批次。
+
+环境变量:
+    SAP_ORDER_BUDGET      每个订单的总预算（秒），默认 300，0 表示不限制
+    SAP_PHASE_BUDGETS     各阶段预算，如 "query=30,supplier=20,save=60"
+    SAP_BREAKER_FAILURES  连续失败多少个订单后暂停，默认 5，0 表示不熔断
+    SAP_BREAKER_PAUSE     暂停时间（秒），默认 300，0 表示停止批次
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('sap_budget', default=None)
+
+
+class DeadlineExceeded(BaseException):
+    """
+    订单或阶段的预算已用完。与 KeyboardInterrupt 一样不是 Exception，只有显式捕获才会停下。
+
+    Attributes:
+        phase (str): 超时时所在的阶段。
+        elapsed (float): 订单已用时间（秒）。
+        limit (float): 用完的预算（秒）。
+        timings (dict): 各阶段耗时（秒）。
+    """
+
+    def __init__(self, phase, elapsed, limit, timings):
+        super().__init__(f"阶段 {phase} 超出预算 {limit:g} 秒（订单已用 {elapsed:.1f} 秒）")
+        self.phase = phase
+        self.elapsed = elapsed
+        self.limit = limit
+        self.timings = timings
+
+
+def parse_phases(text):
+    """"query=30,save=60" -> {'query': 30.0, 'save': 60.0}"""
+    phases = {}
+    for part in (text or '').split(','):
+        if part.strip():
+            name, _, seconds = part.partition('=')
+            phases[name.strip()] = float(seconds)
+    return phases
+
+
+class Budget:
+    """
+    一个订单的时间预算。
+
+    Args:
+        total (float): 订单总预算（秒），None 表示不限制。
+        phases (dict): 阶段名 -> 该阶段的预算（秒），未列出的阶段只受总预算限制。
+        clock: 单调时钟。
+    """
+
+    def __init__(self, total=None, phases=None, clock=time.monotonic):
+        self.total = total
+        self.phases = phases or {}
+        self._clock = clock
+        self.started = None
+        self.phase = None
+        self._phase_started = None
+        self.timings = {}
+
+    @classmethod
+    def from_env(cls):
+        total = float(os.environ.get('SAP_ORDER_BUDGET') or 300)
+        return cls(total or None, parse_phases(os.environ.get('SAP_PHASE_BUDGETS')))
+
+    def start(self, phase='start'):
+        self.started = self._clock()
+        self.timings = {}
+        self.phase = None
+        self.enter(phase)
+        return self
+
+    def enter(self, phase):
+        """进入新阶段，记录上一阶段的耗时"""
+        self.timings = self.snapshot()
+        self.phase = phase
+        self._phase_started = self._clock()
+
+    def snapshot(self):
+        """各阶段耗时（含进行中的阶段）"""
+        timings = dict(self.timings)
+        if self.phase is not None:
+            timings[self.phase] = round(timings.get(self.phase, 0) + self._clock() - self._phase_started, 3)
+        return timings
+
+    @property
+    def elapsed(self):
+        return self._clock() - self.started
+
+    def _limit(self):
+        """(剩余时间, 生效的预算)，不限制时剩余时间为 None"""
+        now = self._clock()
+        candidates = []
+        if self.total is not None:
+            candidates.append((self.started + self.total - now, self.total))
+        phase_limit = self.phases.get(self.phase)
+        if phase_limit is not None:
+            candidates.append((self._phase_started + phase_limit - now, phase_limit))
+        return min(candidates) if candidates else (None, None)
+
+    def remaining(self):
+        """剩余时间（秒），不限制时为 None"""
+        return self._limit()[0]
+
+    def check(self):
+        """预算用完时抛出 DeadlineExceeded"""
+        remaining, limit = self._limit()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(self.phase, self.elapsed, limit, self.snapshot())
+
+    def clamp(self, timeout):
+        """等待时间不超过剩余预算；预算已用完时抛出 DeadlineExceeded"""
+        self.check()
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def finish(self):
+        """结束计时，返回各阶段耗时"""
+        self.enter(None)
+        return dict(self.timings)
+
+    @contextmanager
+    def active(self, phase='start'):
+        """在当前上下文中激活预算（开始计时），退出时恢复"""
+        self.start(phase)
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+            self.finish()
+
+
+def current():
+    """当前激活的预算，没有时为 None"""
+    return _current.get()
+
+
+def enter(phase):
+    """切换当前预算的阶段；没有激活的预算时不做任何事"""
+    budget = _current.get()
+    if budget is not None:
+        budget.enter(phase)
+
+
+def check():
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+def clamp(timeout):
+    budget = _current.get()
+    return timeout if budget is None else budget.clamp(timeout)
+
+
+def sleep(seconds):
+    """time.sleep，不超过剩余预算；睡眠后预算用完时抛出 DeadlineExceeded"""
+    time.sleep(max(clamp(seconds), 0))
+    check()
+
+
+class GuardedSession:
+    """
+    SAP 脚本会话的包装，每次 findById 前检查预算，其余属性直接转发。
+    """
+
+    def __init__(self, session, budget):
+        self._session = session
+        self._budget = budget
+
+    def findById(self, id, *args):
+        self._budget.check()
+        return self._session.findById(id, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def guard(session):
+    """有激活的预算时返回包装后的会话，否则原样返回"""
+    budget = _current.get()
+    if budget is None or session is None or isinstance(session, GuardedSession):
+        return session
+    return GuardedSession(session, budget)
+
+
+class CircuitBreaker:
+    """
+    连续失败熔断。
+
+    Args:
+        threshold (int): 连续失败多少次后熔断，None 或 0 表示不熔断。
+        pause (float): 熔断后暂停的秒数，0 表示停止批次。
+    """
+
+    def __init__(self, threshold=5, pause=300.0, sleep=time.sleep):
+        self.threshold = threshold
+        self.pause = pause
+        self._sleep = sleep
+        self.failures = 0
+        self.trips = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get('SAP_BREAKER_FAILURES') or 5),
+                   float(os.environ.get('SAP_BREAKER_PAUSE') or 300))
+
+    def record(self, ok):
+        """
+        记录一个订单的结果。
+
+        Returns:
+            bool: 是否熔断。
+        """
+        if ok:
+            self.failures = 0
+            return False
+        self.failures += 1
+        if not self.threshold or self.failures < self.threshold:
+            return False
+        self.trips += 1
+        return True
+
+    @property
+    def stops(self):
+        """熔断后是否停止批次（不暂停）"""
+        return not self.pause
+
+    def cool_down(self):
+        """暂停后半开：下一个订单成功则恢复，失败则立即再次熔断"""
+        self._sleep(self.pause)
+        self.failures = self.threshold - 1
@@ -0,0 +1,80 @@
+"""
+屏幕分块变化检测
+
+wait_and_locate_image 原来每 0.5 秒在整个屏幕上做一次模板匹配，屏幕没有变化时也重复搜索：
+目标出现后最多要多等一个间隔，空闲时又一直在重复扫描相同的画面。
+
+TileDiff 把截图按步长缩小为灰度小图，与上一帧逐块比较（整块向量化计算最大差值），
+得到变化的块；只在变化块的外接矩形（按模板尺寸外扩，跨块的目标也能找到）中重新做模板匹配。
+画面不变时每帧只有截图和一次小图差分，不做模板匹配。
+"""
+
+import numpy as np
+
+
+class TileDiff:
+    """
+    Args:
+        step (int): 缩小步长，每 step × step 个像素取一个。
+        tile (int): 分块边长（缩小后的像素）。
+        threshold (int): 块内灰度差的最大值超过该值视为变化，过滤压缩噪声和抗锯齿抖动。
+    """
+
+    def __init__(self, step=4, tile=16, threshold=24):
+        self.step = step
+        self.tile = tile
+        self.threshold = threshold
+
+    def reduce(self, image):
+        """
+        截图缩小为灰度小图。
+
+        Args:
+            image: PIL 图像（pyautogui.screenshot 的结果）。
+
+        Returns:
+            ndarray: int16 二维数组。
+        """
+        pixels = np.asarray(image)[::self.step, ::self.step]
+        if pixels.ndim == 2:
+            return pixels.astype(np.int16)
+        # 三个通道直接相加即可比较差异，不需要精确的灰度换算
+        return pixels[..., :3].sum(axis=2, dtype=np.int16) // 3
+
+    def changed(self, previous, current):
+        """
+        逐块比较两帧小图。
+
+        Returns:
+            ndarray: 每块是否变化的布尔数组（行数 × 列数）；尺寸不同（分辨率变化）时全部视为变化。
+        """
+        rows, cols = -(-current.shape[0] // self.tile), -(-current.shape[1] // self.tile)
+        if previous is None or previous.shape != current.shape:
+            return np.ones((rows, cols), dtype=bool)
+        diff = np.abs(current - previous)
+        padded = np.zeros((rows * self.tile, cols * self.tile), dtype=diff.dtype)
+        padded[:diff.shape[0], :diff.shape[1]] = diff
+        return padded.reshape(rows, self.tile, cols, self.tile).max(axis=(1, 3)) > self.threshold
+
+    def region(self, mask, margin, size):
+        """
+        变化块在原始截图中的外接矩形。
+
+        Args:
+            mask (ndarray): changed 的结果。
+            margin (tuple): 向四周外扩的 (宽, 高)，通常为模板尺寸。
+            size (tuple): 截图的 (宽, 高)。
+
+        Returns:
+            tuple: (left, top, width, height)；没有变化块时为 None。
+        """
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if rows.size == 0:
+            return None
+        unit = self.tile * self.step
+        left = max(int(cols[0]) * unit - margin[0], 0)
+        top = max(int(rows[0]) * unit - margin[1], 0)
+        right = min((int(cols[-1]) + 1) * unit + margin[0], size[0])
+        bottom = min((int(rows[-1]) + 1) * unit + margin[1], size[1])
+        return left, top, right - left, bottom - top
@@ -1,17 +1,74 @@
 import time,pyautogui
+from PIL import Image
+from utils import deadline
+from utils.framediff import TileDiff
 
 
-def wait_and_locate_image(image_path: str, confidence: float =0.8, timeout: int = 2 ,interval: float = 0.5):
+# 截图周期（秒）：目标出现后最多再过一个周期即可定位。
+# 每帧是一次整屏截图，周期过短时空闲等待也会持续占用CPU
+FRAME_PERIOD = 0.2
+
+_tiles = TileDiff()
+
+
+def _locate(needle, frame, region, confidence):
+    """在截图（或其中的区域）中查找模板，返回屏幕坐标的 Box"""
+    haystack = frame if region is None else frame.crop(
+        (region[0], region[1], region[0] + region[2], region[1] + region[3]))
+    try:
+        box = pyautogui.locate(needle, haystack, confidence=confidence)
+    except Exception:
+        # 新版本 pyautogui 找不到时抛出 ImageNotFoundException
+        return None
+    if box is None or region is None:
+        return box
+    return box._replace(left=box.left + region[0], top=box.top + region[1])
+
+
+def wait_and_locate_image(image_path: str, confidence: float =0.8, timeout: int = 2 ,interval: float = FRAME_PERIOD):
+    """
+    等待图片出现在屏幕上。
+
+    先在整个屏幕上查找一次，之后每 interval 秒截图一次，与上一帧分块比较（utils.framediff），
+    只在变化区域中重新查找；画面不变时不做模板匹配。变化区域在下一帧再查找一次，
+    避免目标在绘制到一半时被漏掉。
+
+    Returns:
+        Box: 找到的位置；超时为 None。
+    """
+    # 当前订单有时间预算时，等待不超过剩余预算，预算用完时抛出 DeadlineExceeded
+    timeout = deadline.clamp(timeout)
     start_time = time.time()
-    while time.time() - start_time < timeout:
+    needle = None
+    previous = None
+    pending = None
+    while True:
         try:
-            location = pyautogui.locateOnScreen(image_path,confidence=confidence)
+            # 图片不存在或无法读取时与找不到一样，等到超时返回 None
+            if needle is None:
+                needle = Image.open(image_path)
+                needle.load()
+            frame = pyautogui.screenshot()
+            current = _tiles.reduce(frame)
+            if previous is None:
+                location = _locate(needle, frame, None, confidence)
+            else:
+                changed = _tiles.changed(previous, current)
+                search = changed if pending is None else changed | pending
+                pending = changed
+                region = _tiles.region(search, needle.size, frame.size)
+                location = _locate(needle, frame, region, confidence) if region is not None else None
+            previous = current
             if location:
-                return  location
-
-            time.sleep(interval)
-        except:
-            time.sleep(interval)
+                return location
+        except Exception:
+            previous = None
+        remaining = timeout - (time.time() - start_time)
+        if remaining <= 0:
+            break
+        # 最后一次等待不超过剩余时间
+        time.sleep(min(interval, remaining))
+    deadline.check()
     return None
 
 def click(image_path: str,confidence: float =0.8):
@@ -0,0 +1,368 @@
+"""
+收货数据按日增量汇总
+
+每次 process_ocr_data / 步骤2 只汇总自己这张单据，按供应商、物料的管理报表要重新读取全部单据。
+AggregateStore 在每张结构化单据产生时把它计入按日的汇总表:
+
+    daily_supplier   (日期, 供应商)        单据数、行数、数量、金额
+    daily_material   (日期, 供应商, 物料)  单据数、行数、数量、金额
+
+汇总表以日期开头的复合主键聚簇存储（WITHOUT ROWID），一年的报表只按主键范围读取汇总行，
+行数与 天数 × 供应商 × 物料 成正比，与单据数无关，不需要重新扫描单据。
+
+按单据编号幂等：每张单据计入的明细（按物料合并后的数量和金额）和内容哈希保存在 aggregated_documents 中。
+内容哈希只按计入汇总的内容（日期、供应商和合并后的明细）计算，行金额变化也会被识别；
+同一单据再次处理时内容不变则跳过，内容变化时先减去上次计入的数量再计入新内容，不会重复计数。
+数量以千分之一、金额以分为单位的整数累计（与 receiving.items 一致），反复增减没有浮点误差。
+
+物料按物料编码汇总，没有编码时使用物料名称；供应商使用供应商名称。
+默认与幂等索引共用 receiving.db（RECEIVING_DB）。
+
+用法（在 examples/ 目录下）:
+    python -m receiving.aggregate load processed.jsonl            # 计入 data_processor --batch 的输出
+    python -m receiving.aggregate report --by supplier --from 2024-01-01 --to 2024-12-31
+    python -m receiving.aggregate report --by material --supplier 上海电力设备有限公司
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from hashlib import blake2b
+
+from common.handoff import read_records
+from common.log import get_logger
+from receiving.idempotency import DEFAULT_DB
+from receiving.items import MONEY_SCALE, QTY_SCALE, to_scaled
+
+log = get_logger('receiving_aggregate')
+
+ADDED = 'ADDED'
+UNCHANGED = 'UNCHANGED'
+REPLACED = 'REPLACED'
+
+# 一张单据计入汇总的内容
+#   lines  按物料合并后的 [物料, 行数, 数量(千分之一), 金额(分)]
+Contribution = namedtuple('Contribution', ['document_number', 'content_hash', 'day', 'supplier', 'lines'])
+
+GROUPINGS = {
+    'supplier': ('daily_supplier', ['supplier']),
+    'material': ('daily_material', ['material']),
+    'supplier_material': ('daily_material', ['supplier', 'material']),
+    'day': ('daily_supplier', ['day']),
+}
+
+
+def contribution(structured_data):
+    """
+    计算单据计入汇总的内容，可在工作进程中调用（结果可序列化）。
+
+    Returns:
+        Contribution: 单据编号、内容哈希、日期、供应商和按物料合并的明细。
+    """
+    header = structured_data["header"]
+    day = str(header.get("transactionDate") or header.get("processedAt") or '')[:10]
+    merged = {}
+    for item in structured_data["items"]:
+        material = item.get("materialCode") or item.get("materialName") or ''
+        quantity = to_scaled(item.get("quantity") or 0, QTY_SCALE)
+        if item.get("totalPrice") is not None:
+            amount = to_scaled(item["totalPrice"], MONEY_SCALE)
+        else:
+            amount = round(to_scaled(item.get("unitPrice") or 0, MONEY_SCALE) * quantity / QTY_SCALE)
+        entry = merged.setdefault(material, [material, 0, 0, 0])
+        entry[1] += 1
+        entry[2] += quantity
+        entry[3] += amount
+    supplier = header.get("supplierName") or ''
+    lines = list(merged.values())
+    return Contribution(header["documentNumber"], _digest(day, supplier, lines), day, supplier, lines)
+
+
+def _digest(day, supplier, lines):
+    """计入内容的哈希（16 字节）：日期、供应商和按物料合并后的明细"""
+    payload = json.dumps([day, supplier, lines], ensure_ascii=False, separators=(',', ':'))
+    return blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+
+class _Deltas:
+    """一批单据对汇总行的增减：键 -> [单据数, 行数, 数量, 金额]"""
+
+    def __init__(self):
+        self.suppliers = defaultdict(lambda: [0, 0, 0, 0])
+        self.materials = defaultdict(lambda: [0, 0, 0, 0])
+        self.removed = False
+
+    def add(self, day, supplier, lines, sign):
+        if sign < 0:
+            self.removed = True
+        total = self.suppliers[(day, supplier)]
+        total[0] += sign
+        for material, count, quantity, amount in lines:
+            entry = self.materials[(day, supplier, material)]
+            entry[0] += sign
+            entry[1] += sign * count
+            entry[2] += sign * quantity
+            entry[3] += sign * amount
+            total[1] += sign * count
+            total[2] += sign * quantity
+            total[3] += sign * amount
+
+
+class AggregateStore:
+    """
+    按日增量汇总，可在多个线程间共享。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS aggregated_documents (
+                document_number TEXT PRIMARY KEY,
+                content_hash BLOB NOT NULL,
+                day TEXT NOT NULL,
+                supplier TEXT NOT NULL,
+                lines TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS daily_supplier (
+                day TEXT NOT NULL,
+                supplier TEXT NOT NULL,
+                documents INTEGER NOT NULL,
+                lines INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                amount INTEGER NOT NULL,
+                PRIMARY KEY (day, supplier)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS daily_material (
+                day TEXT NOT NULL,
+                supplier TEXT NOT NULL,
+                material TEXT NOT NULL,
+                documents INTEGER NOT NULL,
+                lines INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                amount INTEGER NOT NULL,
+                PRIMARY KEY (day, supplier, material)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, variable='RECEIVING_DB'):
+        """按环境变量中的数据库路径打开，未配置时使用当前目录下的 receiving.db"""
+        return cls(os.environ.get(variable) or DEFAULT_DB)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, structured_data):
+        """
+        计入一张结构化单据。
+
+        Returns:
+            str: ADDED（首次计入）、UNCHANGED（内容未变，跳过）或 REPLACED（替换上次计入的内容）。
+        """
+        return self.apply_many([contribution(structured_data)])[0]
+
+    def upsert_many(self, documents):
+        """批量计入，一个事务提交"""
+        return self.apply_many([contribution(document) for document in documents])
+
+    def apply_many(self, contributions, chunk_size=500):
+        """
+        计入 contribution 的结果（如 data_processor 工作进程中算好的内容），一个事务提交。
+
+        已计入的记录每 chunk_size 个单据编号一次 IN 查询；同一批单据对汇总行的增减先在内存中合并，
+        每张汇总表只执行一次批量 upsert。
+
+        Returns:
+            list: 每张单据的 ADDED / UNCHANGED / REPLACED。
+        """
+        statuses = []
+        deltas = _Deltas()
+        written = {}
+        with self._lock:
+            with self._conn:
+                stored = self._stored([item.document_number for item in contributions], chunk_size)
+                for item in contributions:
+                    row = stored.get(item.document_number)
+                    if row is not None and row[0] == item.content_hash:
+                        statuses.append(UNCHANGED)
+                        continue
+                    if row is not None:
+                        deltas.add(row[1], row[2], row[3], -1)
+                    deltas.add(item.day, item.supplier, item.lines, 1)
+                    stored[item.document_number] = (item.content_hash, item.day, item.supplier, item.lines)
+                    written[item.document_number] = item
+                    statuses.append(ADDED if row is None else REPLACED)
+                self._flush(deltas)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO aggregated_documents (document_number, content_hash, day, supplier, lines) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(item.document_number, item.content_hash, item.day, item.supplier,
+                      json.dumps(item.lines, ensure_ascii=False, separators=(',', ':'))) for item in written.values()])
+        return statuses
+
+    def _stored(self, numbers, chunk_size):
+        """单据编号 -> (内容哈希, 日期, 供应商, 明细)，调用方持有锁"""
+        stored = {}
+        unique = list(dict.fromkeys(numbers))
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            for number, digest, day, supplier, lines in self._conn.execute(
+                    f"SELECT document_number, content_hash, day, supplier, lines FROM aggregated_documents "
+                    f"WHERE document_number IN ({placeholders})", chunk):
+                stored[number] = (digest, day, supplier, json.loads(lines))
+        return stored
+
+    def remove(self, document_number):
+        """
+        从汇总中减去一张单据。
+
+        Returns:
+            bool: 该单据是否计入过。
+        """
+        with self._lock:
+            with self._conn:
+                row = self._stored([document_number], 1).get(document_number)
+                if row is None:
+                    return False
+                deltas = _Deltas()
+                deltas.add(row[1], row[2], row[3], -1)
+                self._flush(deltas)
+                self._conn.execute("DELETE FROM aggregated_documents WHERE document_number = ?", (document_number,))
+        return True
+
+    def _flush(self, deltas):
+        """把合并后的增减写入汇总表，调用方持有锁并处于事务中"""
+        for table, keys, values in (('daily_supplier', ('day', 'supplier'), deltas.suppliers),
+                                    ('daily_material', ('day', 'supplier', 'material'), deltas.materials)):
+            rows = [key + tuple(delta) for key, delta in values.items() if any(delta)]
+            if not rows:
+                continue
+            columns = ', '.join(keys)
+            self._conn.executemany(
+                f"INSERT INTO {table} ({columns}, documents, lines, quantity, amount) "
+                f"VALUES ({', '.join('?' * (len(keys) + 4))}) "
+                f"ON CONFLICT ({columns}) DO UPDATE SET documents = documents + excluded.documents, "
+                f"lines = lines + excluded.lines, quantity = quantity + excluded.quantity, "
+                f"amount = amount + excluded.amount", rows)
+            if deltas.removed:
+                # 减到没有单据的汇总行删除，不留下全零的行
+                conditions = ' AND '.join(f"{key} = ?" for key in keys)
+                self._conn.executemany(f"DELETE FROM {table} WHERE {conditions} AND documents <= 0",
+                                       [row[:len(keys)] for row in rows])
+
+    def report(self, by='supplier', start=None, end=None, supplier=None, material=None):
+        """
+        按日期范围汇总。
+
+        Args:
+            by (str): 汇总维度：supplier、material、supplier_material 或 day。
+            start / end (str): 起止日期（YYYY-MM-DD，含两端），None 表示不限。
+            supplier / material (str): 只统计指定的供应商 / 物料；指定物料时按物料明细表统计。
+
+        Returns:
+            list: 每组一个 dict（维度列、documents、lines、quantity、amount），按数量降序，日期维度按日期升序。
+        """
+        table, columns = GROUPINGS[by]
+        if material is not None:
+            table = 'daily_material'
+        conditions, params = [], []
+        for column, operator, value in (('day', '>=', start), ('day', '<=', end),
+                                        ('supplier', '=', supplier), ('material', '=', material)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        keys = ', '.join(columns)
+        order = 'day' if by == 'day' else 'quantity DESC'
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {keys}, SUM(documents), SUM(lines), SUM(quantity) AS quantity, SUM(amount) "
+                f"FROM {table} {where} GROUP BY {keys} ORDER BY {order}", params).fetchall()
+        width = len(columns)
+        return [{**dict(zip(columns, row[:width])), "documents": row[width], "lines": row[width + 1],
+                 "quantity": row[width + 2] / QTY_SCALE, "amount": row[width + 3] / MONEY_SCALE}
+                for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM aggregated_documents").fetchone()[0]
+
+
+@lru_cache(maxsize=1)
+def default_store():
+    """进程内共享的汇总库"""
+    return AggregateStore.from_env()
+
+
+def load(store, paths, chunk_size=1000):
+    """
+    计入文件中的结构化单据（JSON-lines 或 common.handoff 帧流）。
+
+    Returns:
+        dict: 各状态的单据数。
+    """
+    counts = {ADDED: 0, UNCHANGED: 0, REPLACED: 0}
+    for path in paths:
+        batch = []
+        for record in read_records(path):
+            if record.kind in (None, 'record', 'structured'):
+                batch.append(contribution(record.data))
+            if len(batch) >= chunk_size:
+                for status in store.apply_many(batch):
+                    counts[status] += 1
+                batch = []
+        for status in store.apply_many(batch):
+            counts[status] += 1
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="收货数据按日增量汇总")
+    parser.add_argument('--db', default=None, help="数据库路径，默认取 RECEIVING_DB 或 receiving.db")
+    commands = parser.add_subparsers(dest='command', required=True)
+    loader = commands.add_parser('load', help="计入结构化单据文件")
+    loader.add_argument('files', nargs='+', help="JSON-lines 或交接帧流（data_processor --batch 的输出）")
+    reporter = commands.add_parser('report', help="按日期范围输出汇总")
+    reporter.add_argument('--by', choices=sorted(GROUPINGS), default='supplier')
+    reporter.add_argument('--from', dest='start', help="起始日期 YYYY-MM-DD")
+    reporter.add_argument('--to', dest='end', help="截止日期 YYYY-MM-DD")
+    reporter.add_argument('--supplier')
+    reporter.add_argument('--material')
+    reporter.add_argument('--limit', type=int, default=50, help="最多输出的组数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = AggregateStore(args.db) if args.db else AggregateStore.from_env()
+    try:
+        if args.command == 'load':
+            counts = load(store, args.files)
+            log.info(f"计入 {counts[ADDED]} 张，替换 {counts[REPLACED]} 张，未变化 {counts[UNCHANGED]} 张",
+                     **counts)
+        else:
+            rows = store.report(args.by, args.start, args.end, args.supplier, args.material)
+            log.result(f"按 {args.by} 汇总（{args.start or '-'} ~ {args.end or '-'}，共 {len(rows)} 组）",
+                       rows[:args.limit])
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+收货单幂等索引
+
+记录已填报单据的 单据编号 + 内容哈希 -> 系统收货单号，在填报前查询:
+    NEW        未填报过，正常填报
+    DUPLICATE  编号和内容都一致，直接跳过并返回原收货单号
+    CHANGED    编号相同但内容变化，不自动填报，标记人工复核
+
+数据保存在 SQLite 中，单据编号为主键（WITHOUT ROWID 聚簇表），
+查询只走一次主键索引，历史记录达到数百万条时依然是常数级的几次页读取。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from hashlib import blake2b
+
+NEW = 'NEW'
+DUPLICATE = 'DUPLICATE'
+CHANGED = 'CHANGED'
+
+Decision = namedtuple('Decision', ['status', 'document_number', 'content_hash', 'receipt_number'])
+
+# 参与内容哈希的字段；创建时间、批号等每次运行都会变化的字段不计入
+HEADER_FIELDS = ('documentNumber', 'transactionDate', 'supplierCode', 'supplierName', 'warehouseCode')
+ITEM_FIELDS = ('materialCode', 'materialName', 'specification', 'quantity', 'unit', 'unitPrice')
+
+DEFAULT_DB = 'receiving.db'
+
+
+def content_hash(structured_data):
+    """
+    结构化单据的内容哈希（16 字节），与字段顺序和运行时间无关。
+    """
+    header = structured_data["header"]
+    canonical = [
+        [header.get(field) for field in HEADER_FIELDS],
+        [[item.get(field) for field in ITEM_FIELDS] for item in structured_data["items"]],
+    ]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(',', ':'), default=str)
+    return blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+
+class IdempotencyIndex:
+    """
+    已填报单据索引，可在多个线程间共享。
+
+    Args:
+        path (str): SQLite 数据库文件路径。
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS filed_receipts (
+                document_number TEXT PRIMARY KEY,
+                content_hash BLOB NOT NULL,
+                receipt_number TEXT NOT NULL,
+                filed_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, variable='RECEIVING_DB'):
+        """按环境变量中的数据库路径打开，未配置时使用当前目录下的 receiving.db"""
+        return cls(os.environ.get(variable) or DEFAULT_DB)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def check(self, structured_data):
+        """
+        查询单据是否已填报。
+
+        Returns:
+            Decision: 状态、单据编号、内容哈希以及已有的收货单号。
+        """
+        document_number = structured_data["header"]["documentNumber"]
+        digest = content_hash(structured_data)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, receipt_number FROM filed_receipts WHERE document_number = ?",
+                (document_number,)).fetchone()
+        if row is None:
+            return Decision(NEW, document_number, digest, None)
+        stored_hash, receipt_number = row
+        status = DUPLICATE if stored_hash == digest else CHANGED
+        return Decision(status, document_number, digest, receipt_number)
+
+    def check_many(self, documents, chunk_size=500):
+        """
+        批量查询，每 chunk_size 个单据编号一次 IN 查询。
+
+        Returns:
+            list: 与输入顺序一致的 Decision 列表。
+        """
+        keyed = [(document["header"]["documentNumber"], content_hash(document)) for document in documents]
+        stored = {}
+        with self._lock:
+            for start in range(0, len(keyed), chunk_size):
+                numbers = [number for number, _ in keyed[start:start + chunk_size]]
+                placeholders = ','.join('?' * len(numbers))
+                stored.update(
+                    (number, (digest, receipt)) for number, digest, receipt in self._conn.execute(
+                        f"SELECT document_number, content_hash, receipt_number FROM filed_receipts "
+                        f"WHERE document_number IN ({placeholders})", numbers))
+        decisions = []
+        for number, digest in keyed:
+            if number not in stored:
+                decisions.append(Decision(NEW, number, digest, None))
+            else:
+                stored_hash, receipt = stored[number]
+                decisions.append(Decision(DUPLICATE if stored_hash == digest else CHANGED, number, digest, receipt))
+        return decisions
+
+    def record(self, decision, receipt_number):
+        """
+        登记已填报的单据。CHANGED 的单据经人工复核重新填报后，同样调用本方法覆盖旧记录。
+
+        Args:
+            decision (Decision): check 返回的结果。
+            receipt_number (str): 系统返回的收货单号。
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO filed_receipts (document_number, content_hash, receipt_number, filed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (decision.document_number, decision.content_hash, str(receipt_number), datetime.now().isoformat()))
+            self._conn.commit()
+
+
+@lru_cache(maxsize=1)
+def default_index():
+    """进程内共享的幂等索引"""
+    return IdempotencyIndex.from_env()
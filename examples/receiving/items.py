@@ -0,0 +1,156 @@
+"""
+收货单物料明细的列式存储
+
+物料明细按列保存在 NumPy int64 数组中：数量以千分之一为单位、金额以分为单位的整数存储，
+逐行金额、汇总和金额核对都是整列的向量运算，结果精确且没有浮点误差。
+只有读入（解析数量、金额文本）和输出（records）按行进行。
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+# 数量保留3位小数，金额精确到分
+QTY_SCALE = 1000
+MONEY_SCALE = 100
+
+# 缺失值占位（如单据未给出行金额）
+MISSING = -(2 ** 63)
+
+_QTY_EXP = Decimal(1).scaleb(-3)
+_MONEY_EXP = Decimal(1).scaleb(-2)
+
+
+def to_scaled(value, scale):
+    """
+    将数量或金额转换为按 scale 放大的整数，四舍五入。
+
+    Args:
+        value: int、float、str 或 Decimal。
+        scale (int): 放大倍数（QTY_SCALE 或 MONEY_SCALE）。
+
+    Returns:
+        int: 放大后的整数。
+    """
+    if type(value) is int:
+        return value * scale
+    return int((Decimal(str(value)) * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def _round_div(numerator, denominator):
+    """整列整数除法，四舍五入（远离零）"""
+    return np.sign(numerator) * ((np.abs(numerator) + denominator // 2) // denominator)
+
+
+def _column(values, count):
+    return np.fromiter(values, dtype=np.int64, count=count)
+
+
+class ItemColumns:
+    """
+    物料明细的列式容器。
+
+    文本字段保存为列表，数量、单价、行金额保存为 int64 数组。
+    """
+    __slots__ = ('names', 'specs', 'units', 'quantity', 'unit_price', 'declared_total')
+
+    def __init__(self):
+        self.names = []
+        self.specs = []
+        self.units = []
+        self.quantity = np.zeros(0, dtype=np.int64)        # 千分之一单位
+        self.unit_price = np.zeros(0, dtype=np.int64)      # 分
+        self.declared_total = np.zeros(0, dtype=np.int64)  # 分，单据上的行金额，缺失为 MISSING
+
+    @classmethod
+    def from_items(cls, items, price_key='unitPrice', total_key='totalPrice'):
+        """
+        从OCR物料条目列表构建列式容器。
+
+        Args:
+            items (list): 物料条目字典列表，至少包含 name、quantity、unit。
+            price_key (str): 单价字段名，缺失按 0 处理。
+            total_key (str): 行金额字段名，缺失记为 MISSING；为 None 时不读取行金额。
+
+        Returns:
+            ItemColumns: 填充好的容器。
+        """
+        count = len(items)
+        columns = cls()
+        columns.names = [item["name"] for item in items]
+        columns.specs = [item.get("specification", "") for item in items]
+        columns.units = [item["unit"] for item in items]
+        columns.quantity = _column((to_scaled(item["quantity"], QTY_SCALE) for item in items), count)
+        columns.unit_price = _column((to_scaled(item.get(price_key, 0), MONEY_SCALE) for item in items), count)
+        if total_key is None:
+            columns.declared_total = np.full(count, MISSING, dtype=np.int64)
+        else:
+            columns.declared_total = _column((
+                to_scaled(item[total_key], MONEY_SCALE) if item.get(total_key) is not None else MISSING
+                for item in items
+            ), count)
+        return columns
+
+    def __len__(self):
+        return len(self.names)
+
+    def line_totals(self):
+        """
+        计算每行金额（数量 × 单价），单位为分。
+
+        Returns:
+            ndarray: 与行一一对应的行金额数组。
+        """
+        return _round_div(self.quantity * self.unit_price, QTY_SCALE)
+
+    def declared_or_computed(self, line_totals=None):
+        """
+        输出用的行金额：单据给出行金额时使用单据金额，缺失时使用 数量 × 单价。
+
+        Args:
+            line_totals (ndarray): 已计算的行金额。
+        """
+        if line_totals is None:
+            line_totals = self.line_totals()
+        return np.where(self.declared_total != MISSING, self.declared_total, line_totals)
+
+    def total_quantity(self):
+        """总数量（Decimal）"""
+        return Decimal(int(self.quantity.sum())).scaleb(-3).quantize(_QTY_EXP)
+
+    def total_amount(self, line_totals=None):
+        """
+        总金额（Decimal，元）。
+
+        Args:
+            line_totals (ndarray): 参与汇总的行金额，默认为 数量 × 单价。
+        """
+        if line_totals is None:
+            line_totals = self.line_totals()
+        return Decimal(int(line_totals.sum())).scaleb(-2).quantize(_MONEY_EXP)
+
+    def amount_mismatches(self, line_totals=None, tolerance=0):
+        """
+        核对单据行金额与 数量 × 单价 是否一致。
+
+        Args:
+            line_totals (ndarray): 已计算的行金额。
+            tolerance (int): 允许的误差（分）。
+
+        Returns:
+            list: 不一致行的 (行下标, 计算金额, 单据金额) 列表，金额单位为分。
+        """
+        if line_totals is None:
+            line_totals = self.line_totals()
+        declared = self.declared_total
+        rows = np.flatnonzero((declared != MISSING) & (np.abs(line_totals - declared) > tolerance))
+        return list(zip(rows.tolist(), line_totals[rows].tolist(), declared[rows].tolist()))
+
+    def quantities(self):
+        """数量列转换为 float 列表，用于输出"""
+        return (self.quantity / QTY_SCALE).tolist()
+
+    @staticmethod
+    def money(values):
+        """金额列（分）转换为 float 列表，用于输出"""
+        return (np.asarray(values) / MONEY_SCALE).tolist()
@@ -0,0 +1,377 @@
+"""
+物料主数据索引
+
+将物料主数据（物料编码、物料名称、规格型号）预先构建成一个二进制索引文件，
+运行时通过 mmap 直接映射，打开索引不需要解析或加载全部数据。
+
+查找分两步:
+    1. 精确匹配：名称+规格标准化后做 64 位哈希，在开放寻址哈希表中查找，
+       命中后再比较记录中保存的标准化键，哈希碰撞时继续探查。
+    2. 模糊匹配：精确匹配失败时，按字符二元组（bigram）倒排表统计每条记录共有的二元组数，
+       过于常见的二元组（如所有物料共有的前缀）不读取倒排表，只计入打分上界；
+       按上界取出候选后用完整的 Dice 系数重新打分，容忍 OCR 识别产生的个别错字。
+
+用法:
+    python -m receiving.material_index build 物料主数据.csv material.idx
+    python -m receiving.material_index lookup material.idx 绝缘子 XWP-70
+"""
+
+import bisect
+import csv
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from collections import namedtuple
+from difflib import SequenceMatcher
+from functools import lru_cache
+from hashlib import blake2b
+
+import numpy as np
+
+MAGIC = b'MATIDX02'
+# 魔数, 记录数, 哈希表槽位数, 二元组数, 倒排项数, 文本区字节数
+_HEADER = struct.Struct('<8sQQQQQ')
+
+MatchResult = namedtuple('MatchResult', ['code', 'name', 'specification', 'score', 'exact'])
+
+# 模糊匹配召回共有二元组数不少于 最大值 - RECALL_SLACK 的记录（每个错字最多影响两个二元组）
+RECALL_SLACK = 2
+# Dice 系数与最高分相差不超过 RERANK_MARGIN 的候选按编辑相似度重新排序
+RERANK_MARGIN = 0.05
+
+_SEPARATORS = re.compile(r'[\s\-_—–－·/\\]+')
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n'}
+_UNESCAPE = re.compile(r'\\(.)')
+_UNESCAPES = {'t': '\t', 'n': '\n'}
+
+
+def normalize(name, spec=''):
+    """
+    标准化名称和规格：全角转半角、统一大写、去除空白和连接符。
+
+    Returns:
+        str: 用于哈希和分词的标准化键。
+    """
+    name = _SEPARATORS.sub('', unicodedata.normalize('NFKC', str(name or ''))).upper()
+    spec = _SEPARATORS.sub('', unicodedata.normalize('NFKC', str(spec or ''))).upper()
+    return f"{name}|{spec}"
+
+
+def key_hash(key):
+    """稳定的 64 位哈希（不受 PYTHONHASHSEED 影响），0 保留为空槽标记"""
+    return int.from_bytes(blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+def bigrams(key):
+    """键的字符二元组集合，首尾补边界符"""
+    padded = f"^{key}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _gram_hash(gram):
+    return int.from_bytes(blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _escape(field):
+    """记录中的字段以制表符分隔，字段内的反斜杠、制表符和换行转义"""
+    field = str(field or '')
+    if '\\' in field or '\t' in field or '\n' in field:
+        return ''.join(_ESCAPES.get(char, char) for char in field)
+    return field
+
+
+def _unescape(field):
+    if '\\' not in field:
+        return field
+    return _UNESCAPE.sub(lambda m: _UNESCAPES.get(m.group(1), m.group(1)), field)
+
+
+def _align(stream):
+    padding = -stream.tell() % 8
+    if padding:
+        stream.write(b'\0' * padding)
+
+
+def build_index(rows, path):
+    """
+    构建索引文件。
+
+    Args:
+        rows: 可迭代的 (物料编码, 物料名称, 规格型号) 元组。
+        path (str): 输出的索引文件路径。
+
+    Returns:
+        int: 写入的记录数（标准化键重复的记录只保留第一条）。
+    """
+    blob = bytearray()
+    offsets = array('I', [0])
+    hashes = []
+    gram_counts = array('H')
+    postings = {}
+    seen = set()
+
+    for code, name, spec in rows:
+        key = normalize(name, spec)
+        if key in seen:
+            continue
+        seen.add(key)
+        record_id = len(hashes)
+        hashes.append(key_hash(key))
+        grams = bigrams(key)
+        gram_counts.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            postings.setdefault(_gram_hash(gram), array('I')).append(record_id)
+        blob += '\t'.join(map(_escape, (code, name, spec, key))).encode('utf-8')
+        offsets.append(len(blob))
+
+    count = len(hashes)
+    table_size = 1
+    while table_size < count * 2:
+        table_size *= 2
+    slot_hashes = array('Q', [0]) * table_size
+    slot_ids = array('I', [0]) * table_size
+    mask = table_size - 1
+    for record_id, digest in enumerate(hashes):
+        slot = digest & mask
+        while slot_hashes[slot]:
+            slot = (slot + 1) & mask
+        slot_hashes[slot] = digest
+        slot_ids[slot] = record_id + 1
+
+    gram_keys = array('Q', sorted(postings))
+    gram_offsets = array('I', [0])
+    posting_data = array('I')
+    for gram in gram_keys:
+        posting_data.extend(postings[gram])
+        gram_offsets.append(len(posting_data))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, count, table_size, len(gram_keys), len(posting_data), len(blob)))
+        for section in (slot_hashes, gram_keys, slot_ids, offsets, gram_offsets, posting_data, gram_counts):
+            _align(f)
+            section.tofile(f)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_master(path, code_column='物料编码', name_column='物料名称', spec_column='规格型号'):
+    """
+    读取物料主数据文件（CSV 或 xlsx），产出 (编码, 名称, 规格) 元组。
+    """
+    if path.lower().endswith('.xlsx'):
+        import pandas as pd
+        df = pd.read_excel(path, dtype=str, usecols=[code_column, name_column, spec_column]).fillna('')
+        yield from zip(df[code_column], df[name_column], df[spec_column])
+        return
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row[code_column], row[name_column], row.get(spec_column, '')
+
+
+class MaterialIndex:
+    """
+    只读的物料索引，通过 mmap 映射索引文件，各数据区以 memoryview 直接访问。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, table_size, n_grams, n_postings, blob_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是物料索引文件: {path}")
+        self.count = count
+        self._mask = table_size - 1
+
+        view = memoryview(self._mm)
+        position = _HEADER.size
+
+        def section(fmt, length):
+            nonlocal position
+            position += -position % 8
+            size = struct.calcsize(fmt) * length
+            part = view[position:position + size].cast(fmt)
+            position += size
+            return part
+
+        self._slot_hashes = section('Q', table_size)
+        self._gram_keys = section('Q', n_grams)
+        self._slot_ids = section('I', table_size)
+        self._offsets = section('I', count + 1)
+        self._gram_offsets = section('I', n_grams + 1)
+        self._postings = section('I', n_postings)
+        self._gram_counts = section('H', count)
+        self._blob = view[position:position + blob_size]
+        # 模糊匹配用的向量视图（不复制数据）
+        self._posting_array = np.frombuffer(self._postings, dtype=np.uint32)
+        self._gram_count_array = np.frombuffer(self._gram_counts, dtype=np.uint16)
+
+    @classmethod
+    def from_env(cls, variable='MATERIAL_INDEX'):
+        """按环境变量中的路径打开索引，未配置时返回 None"""
+        path = os.environ.get(variable)
+        return cls(path) if path else None
+
+    def close(self):
+        self._posting_array = self._gram_count_array = None
+        for name in ('_slot_hashes', '_gram_keys', '_slot_ids', '_offsets',
+                     '_gram_offsets', '_postings', '_gram_counts', '_blob'):
+            getattr(self, name).release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _fields(self, record_id):
+        start = self._offsets[record_id]
+        end = self._offsets[record_id + 1]
+        return [_unescape(field) for field in bytes(self._blob[start:end]).decode('utf-8').split('\t')]
+
+    def record(self, record_id):
+        """读取一条记录，返回 (编码, 名称, 规格)"""
+        code, name, spec, _ = self._fields(record_id)
+        return code, name, spec
+
+    def _exact(self, key):
+        digest = key_hash(key)
+        slot = digest & self._mask
+        slot_hashes = self._slot_hashes
+        while True:
+            stored = slot_hashes[slot]
+            if stored == 0:
+                return None
+            if stored == digest:
+                record_id = self._slot_ids[slot] - 1
+                if self._fields(record_id)[3] == key:
+                    return record_id
+            slot = (slot + 1) & self._mask
+
+    def _fuzzy(self, key, threshold, max_postings, max_candidates, rerank):
+        grams = bigrams(key)
+        gram_keys = self._gram_keys
+        gram_offsets = self._gram_offsets
+        lists = []
+        for gram in grams:
+            digest = _gram_hash(gram)
+            pos = bisect.bisect_left(gram_keys, digest)
+            if pos < len(gram_keys) and gram_keys[pos] == digest:
+                lists.append((gram_offsets[pos], gram_offsets[pos + 1]))
+        if not lists:
+            return None
+        # 从最短的倒排表开始读取，总量超过 max_postings 后剩下的（最常见的）二元组不再读取，
+        # 假定每个候选都含有这些二元组，只用于计算打分上界
+        lists.sort(key=lambda span: span[1] - span[0])
+        counted, budget = [], max_postings
+        for start, end in lists:
+            if counted and end - start > budget:
+                break
+            counted.append(self._posting_array[start:end])
+            budget -= end - start
+        skipped = len(lists) - len(counted)
+        shared = np.bincount(np.concatenate(counted))
+        # 只召回共有二元组数接近最大值的记录：常见二元组很多时，只共有一两个二元组的记录数以万计，
+        # 逐个计算上界的开销远大于查找本身
+        candidates = np.flatnonzero(shared >= shared.max() - RECALL_SLACK)
+        upper = 2.0 * (shared[candidates] + skipped) / (len(grams) + self._gram_count_array[candidates])
+        keep = upper >= threshold
+        candidates, upper = candidates[keep], upper[keep]
+        if len(candidates) > max_candidates:
+            top = np.argpartition(-upper, max_candidates - 1)[:max_candidates]
+            candidates, upper = candidates[top], upper[top]
+        order = np.argsort(-upper, kind='stable')
+        # 按上界从高到低计算完整的 Dice 系数，保留得分最高的 rerank 个；
+        # 上界低于已保留的最低得分时后面的候选不可能进入，停止计算
+        pool = []
+        for record_id, bound in zip(candidates[order].tolist(), upper[order].tolist()):
+            if len(pool) == rerank and bound <= pool[0][0]:
+                break
+            candidate_key = self._fields(record_id)[3]
+            candidate = bigrams(candidate_key)
+            score = 2.0 * len(grams & candidate) / (len(grams) + len(candidate))
+            if score >= threshold:
+                entry = (score, record_id, candidate_key)
+                if len(pool) < rerank:
+                    heapq.heappush(pool, entry)
+                elif entry > pool[0]:
+                    heapq.heapreplace(pool, entry)
+        if not pool:
+            return None
+        # 二元组集合不区分顺序和重复（15455 与 15545 的二元组相同），
+        # Dice 系数接近最高分的候选再按编辑相似度排序
+        top = max(pool)[0]
+        best_id, best_score = None, -1.0
+        for dice, record_id, candidate_key in sorted(pool, reverse=True):
+            if dice < top - RERANK_MARGIN:
+                break
+            score = SequenceMatcher(None, key, candidate_key, autojunk=False).ratio()
+            if score > best_score:
+                best_id, best_score = record_id, score
+        return best_id, best_score
+
+    def lookup(self, name, spec='', threshold=0.6, max_postings=100000, max_candidates=50, rerank=8):
+        """
+        查找物料编码。
+
+        Args:
+            name (str): OCR识别的物料名称。
+            spec (str): 规格型号。
+            threshold (float): 模糊匹配候选的最低 Dice 系数。
+            max_postings (int): 一次模糊匹配最多读取的倒排项总数，超出部分的常见二元组不读取。
+            max_candidates (int): 按打分上界取出、计算完整 Dice 系数的候选数。
+            rerank (int): Dice 系数最高、再按编辑相似度排序的候选数；模糊匹配的 score 为编辑相似度。
+
+        Returns:
+            MatchResult or None: 匹配结果，未找到时返回 None。
+        """
+        key = normalize(name, spec)
+        record_id = self._exact(key)
+        if record_id is not None:
+            return MatchResult(*self.record(record_id), 1.0, True)
+        match = self._fuzzy(key, threshold, max_postings, max_candidates, rerank)
+        if match is None:
+            return None
+        record_id, score = match
+        return MatchResult(*self.record(record_id), score, False)
+
+
+@lru_cache(maxsize=1)
+def default_index():
+    """进程内共享的物料索引（路径取自环境变量 MATERIAL_INDEX），未配置时返回 None"""
+    return MaterialIndex.from_env()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == 'build':
+        count = build_index(read_master(argv[1]), argv[2])
+        print(f"[SUCCESS] 物料索引构建完成: {count} 条记录 -> {argv[2]}")
+        return 0
+    if len(argv) in (3, 4) and argv[0] == 'lookup':
+        with MaterialIndex(argv[1]) as index:
+            result = index.lookup(argv[2], argv[3] if len(argv) == 4 else '')
+        if result is None:
+            print("[WARNING] 未找到匹配的物料")
+            return 1
+        print(f"[SUCCESS] {result.code} {result.name} {result.specification} "
+              f"(相似度 {result.score:.2f}{'，精确匹配' if result.exact else ''})")
+        return 0
+    print(__doc__)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+分阶段流水线
+
+各阶段之间以有界队列相连，每个阶段可配置独立的并发数。下游阶段处理不过来时，
+上游向已满的队列放入数据会阻塞（背压），内存占用由队列长度限定。
+这样第 N+1 个单据的扫描和清理可以与第 N 个单据的填报同时进行。
+
+阶段在线程中运行：填报等待目标系统时不占用CPU，NumPy 等计算在执行期间释放GIL；
+纯 Python 的重计算可以在阶段函数内部再交给进程池。
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+StageError = namedtuple('StageError', ['stage', 'sequence', 'error'])
+
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线阶段。
+
+    Args:
+        name (str): 阶段名称。
+        func: 处理函数，接收上一阶段的输出，返回本阶段的输出。
+        workers (int): 并发线程数。
+        queue_size (int): 本阶段输入队列的容量。
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class StageMetrics:
+    """单个阶段的运行指标"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def sample_depth(self, depth):
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def record(self, busy, failed):
+        with self._lock:
+            self.busy_time += busy
+            if failed:
+                self.errors += 1
+            else:
+                self.processed += 1
+
+    def summary(self, elapsed):
+        """
+        Returns:
+            dict: 处理数、错误数、吞吐量（个/秒）、利用率和队列深度统计。
+        """
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "errors": self.errors,
+            "throughput": self.processed / elapsed if elapsed > 0 else 0.0,
+            "utilization": self.busy_time / (elapsed * self.workers) if elapsed > 0 else 0.0,
+            "avgQueueDepth": self._depth_total / self._depth_samples if self._depth_samples else 0.0,
+            "maxQueueDepth": self.max_depth,
+        }
+
+
+class Pipeline:
+    """
+    由多个 Stage 组成的流水线。
+
+    用法:
+        pipeline = Pipeline([Stage("扫描", scan), Stage("清理", clean), Stage("填报", fill, workers=2)])
+        results = pipeline.run(range(10))
+    """
+
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.metrics = [StageMetrics(stage.name, stage.workers) for stage in stages]
+        self.errors = []
+        self.elapsed = 0.0
+        self._fatal = None
+
+    def _put(self, index, queues, item):
+        queues[index].put(item)
+        self.metrics[index].sample_depth(queues[index].qsize())
+
+    def _worker(self, index, queues, finished, results, results_lock):
+        stage = self.stages[index]
+        metrics = self.metrics[index]
+        inbox = queues[index]
+        last = index == len(self.stages) - 1
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                if self._fatal is not None:
+                    # 流水线已中止：只排空队列，让上游不会阻塞在已满的队列上
+                    continue
+                sequence, payload = item
+                start = time.perf_counter()
+                try:
+                    output = stage.func(payload)
+                except Exception as e:
+                    metrics.record(time.perf_counter() - start, True)
+                    with results_lock:
+                        self.errors.append(StageError(stage.name, sequence, e))
+                    continue
+                metrics.record(time.perf_counter() - start, False)
+                if last:
+                    with results_lock:
+                        results[sequence] = output
+                else:
+                    self._put(index + 1, queues, (sequence, output))
+        except BaseException as e:
+            # KeyboardInterrupt、SystemExit 等：中止整个流水线，由 run 重新抛出
+            with results_lock:
+                if self._fatal is None:
+                    self._fatal = e
+            while inbox.get() is not _DONE:
+                pass
+        finally:
+            # 本阶段所有线程结束后，通知下一阶段的每个线程退出
+            with results_lock:
+                finished[index] += 1
+                stage_done = finished[index] == stage.workers
+            if stage_done and not last:
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_DONE)
+
+    def run(self, source):
+        """
+        运行流水线直到 source 耗尽且所有阶段处理完毕。
+
+        Args:
+            source: 可迭代的输入，逐个送入第一阶段。
+
+        Returns:
+            list: 成功通过所有阶段的结果，按输入顺序排列；失败的输入记录在 self.errors 中。
+
+        Raises:
+            BaseException: 阶段函数抛出的非 Exception 异常（如 KeyboardInterrupt），
+                所有阶段停止后重新抛出。
+        """
+        self._fatal = None
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        finished = [0] * len(self.stages)
+        results = {}
+        results_lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self._worker, args=(index, queues, finished, results, results_lock),
+                             name=f"{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for sequence, item in enumerate(source):
+                if self._fatal is not None:
+                    break
+                self._put(0, queues, (sequence, item))
+        finally:
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - start
+        if self._fatal is not None:
+            raise self._fatal
+
+        return [results[sequence] for sequence in sorted(results)]
+
+    def report(self):
+        """各阶段的指标摘要列表"""
+        return [metrics.summary(self.elapsed) for metrics in self.metrics]
@@ -0,0 +1,360 @@
+"""
+扫描图像预处理
+
+对扫描得到的灰度页面（uint8 的 NumPy 二维数组）执行:
+    1. 降噪：3x3 中值滤波（排序网络，全向量化）或可分离高斯滤波
+    2. 纠偏：投影轮廓法估计倾斜角，再按角度旋转
+    3. 二值化：基于积分图的局部自适应阈值（Bradley 方法）
+
+多页批次通过进程池并行处理，预处理后的页面交给可插拔的 OCR 后端识别。
+
+基准测试（合成的 300 DPI A4 页面）:
+    python -m receiving.preprocess --benchmark --pages 8 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 300 DPI 下 A4 纸的像素尺寸（宽 x 高）
+A4_300DPI = (2480, 3508)
+
+PageResult = namedtuple('PageResult', ['image', 'skew', 'ocr'])
+
+
+# --- 降噪 ---------------------------------------------------------------
+
+def _sort3(a, b, c):
+    lo = np.minimum(a, b)
+    hi = np.maximum(a, b)
+    return np.minimum(lo, c), np.maximum(lo, np.minimum(hi, c)), np.maximum(hi, c)
+
+
+def median3x3(page):
+    """
+    3x3 中值滤波。
+
+    先对每列相邻三个像素排序，再取 (最小值列的最大值, 中值列的中值, 最大值列的最小值)
+    三者的中值，结果与逐像素取 9 个数的中值完全一致。
+    """
+    padded = np.pad(page, 1, mode='edge')
+    lo, mid, hi = _sort3(padded[:-2], padded[1:-1], padded[2:])
+    max_lo = np.maximum(np.maximum(lo[:, :-2], lo[:, 1:-1]), lo[:, 2:])
+    med_mid = _sort3(mid[:, :-2], mid[:, 1:-1], mid[:, 2:])[1]
+    min_hi = np.minimum(np.minimum(hi[:, :-2], hi[:, 1:-1]), hi[:, 2:])
+    return _sort3(max_lo, med_mid, min_hi)[1]
+
+
+def gaussian(page, sigma=1.0):
+    """可分离高斯滤波，核半径取 3σ"""
+    radius = max(1, int(3 * sigma + 0.5))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-(offsets ** 2) / (2 * sigma ** 2)).astype(np.float32)
+    kernel /= kernel.sum()
+
+    result = page.astype(np.float32)
+    for axis in (0, 1):
+        padded = np.pad(result, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)], mode='edge')
+        length = result.shape[axis]
+        accumulated = np.zeros_like(result)
+        for weight, shift in zip(kernel, range(2 * radius + 1)):
+            accumulated += weight * (padded[shift:shift + length] if axis == 0 else padded[:, shift:shift + length])
+        result = accumulated
+    return np.clip(result + 0.5, 0, 255).astype(np.uint8)
+
+
+def denoise(page, method='median', sigma=1.0):
+    """
+    降噪。
+
+    Args:
+        page (np.ndarray): uint8 灰度页面。
+        method (str): 'median' 或 'gaussian'。
+        sigma (float): 高斯滤波的标准差。
+    """
+    if method == 'median':
+        return median3x3(page)
+    if method == 'gaussian':
+        return gaussian(page, sigma)
+    raise ValueError(f"不支持的降噪方法: {method}")
+
+
+# --- 二值化 -------------------------------------------------------------
+
+def adaptive_binarize(page, window=31, ratio=0.15):
+    """
+    局部自适应阈值二值化（Bradley 方法）。
+
+    像素灰度低于其 window x window 邻域均值的 (1 - ratio) 倍时判为黑色。
+    邻域和由两次方向累加和（即积分图）求得，与窗口大小无关。
+
+    Returns:
+        np.ndarray: uint8 二值图，0 为黑、255 为白。
+    """
+    height, width = page.shape
+    half = window // 2
+    rows = np.arange(height)
+    cols = np.arange(width)
+    top = np.clip(rows - half, 0, height)
+    bottom = np.clip(rows + half + 1, 0, height)
+    left = np.clip(cols - half, 0, width)
+    right = np.clip(cols + half + 1, 0, width)
+
+    # 先按列求窗口内的纵向和，再对其按行求窗口内的横向和；int32 足以容纳 A4 页面的累计值
+    vertical = np.zeros((height + 1, width), dtype=np.int32)
+    np.cumsum(page, axis=0, dtype=np.int32, out=vertical[1:])
+    column_sums = vertical[bottom] - vertical[top]
+    horizontal = np.zeros((height, width + 1), dtype=np.int32)
+    np.cumsum(column_sums, axis=1, out=horizontal[:, 1:])
+    total = horizontal[:, right] - horizontal[:, left]
+
+    area = ((bottom - top)[:, None] * (right - left)[None, :]).astype(np.float32)
+    dark = page * area < total * np.float32(1 - ratio)
+    return np.where(dark, 0, 255).astype(np.uint8)
+
+
+# --- 纠偏 ---------------------------------------------------------------
+
+def estimate_skew(binary, max_angle=5.0, step=0.1, sample=4):
+    """
+    投影轮廓法估计倾斜角。
+
+    对黑色像素坐标按候选角度投影到纵轴，行直方图越"尖锐"（平方和越大）说明文字行越水平。
+    先以 1° 粗搜索，再在最佳角度附近以 step 细搜索。
+
+    Args:
+        binary (np.ndarray): 二值图（0 为黑）。
+        max_angle (float): 搜索范围（度）。
+        step (float): 细搜索步长（度）。
+        sample (int): 下采样倍数，减少参与投影的像素数。
+
+    Returns:
+        float: 倾斜角（度），逆时针为正。
+    """
+    ys, xs = np.nonzero(binary[::sample, ::sample] == 0)
+    if len(ys) == 0:
+        return 0.0
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64)
+    offset = xs.max() * np.tan(np.radians(max_angle)) + 1
+
+    def score(angle):
+        projected = (ys + xs * np.tan(np.radians(angle)) + offset).astype(np.int64)
+        histogram = np.bincount(projected)
+        return float(np.dot(histogram, histogram))
+
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 1.0)
+    best = max(coarse, key=score)
+    fine = np.arange(best - 1.0, best + 1.0 + 1e-9, step)
+    fine = fine[np.abs(fine) <= max_angle]
+    return float(round(max(fine, key=score), 3))
+
+
+def rotate(page, angle, fill=255):
+    """
+    以页面中心旋转（最近邻插值），角度为正时逆时针旋转，边缘以 fill 填充。
+    """
+    if abs(angle) < 1e-3:
+        return page
+    height, width = page.shape
+    theta = np.radians(angle)
+    cos, sin = np.float32(np.cos(theta)), np.float32(np.sin(theta))
+    cy, cx = (height - 1) / 2.0, (width - 1) / 2.0
+    ys = (np.arange(height, dtype=np.float32) - cy)[:, None]
+    xs = (np.arange(width, dtype=np.float32) - cx)[None, :]
+    # 目标像素反向映射到源图像坐标
+    src_x = np.rint(cos * xs - sin * ys + cx).astype(np.int32)
+    src_y = np.rint(sin * xs + cos * ys + cy).astype(np.int32)
+    valid = (src_x >= 0) & (src_x < width) & (src_y >= 0) & (src_y < height)
+    result = np.full_like(page, fill)
+    result[valid] = page[src_y[valid], src_x[valid]]
+    return result
+
+
+def preprocess_page(page, denoise_method='median', window=31, max_angle=5.0):
+    """
+    单页预处理：降噪 -> 二值化 -> 纠偏。
+
+    Returns:
+        tuple: (二值图, 倾斜角)
+    """
+    if page.ndim == 3:
+        page = (page[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+    cleaned = denoise(page, denoise_method)
+    binary = adaptive_binarize(cleaned, window)
+    skew = estimate_skew(binary, max_angle)
+    return rotate(binary, -skew), skew
+
+
+# --- OCR 后端 -----------------------------------------------------------
+
+class OcrBackend:
+    """OCR 后端接口：recognize 接收预处理后的二值图，返回识别结果"""
+    name = 'base'
+
+    def recognize(self, image):
+        raise NotImplementedError
+
+
+class NullOcrBackend(OcrBackend):
+    """不做识别，只返回页面尺寸，用于基准测试和调试"""
+    name = 'none'
+
+    def recognize(self, image):
+        return {"text": "", "height": int(image.shape[0]), "width": int(image.shape[1])}
+
+
+class TesseractOcrBackend(OcrBackend):
+    """基于 pytesseract 的识别后端"""
+    name = 'tesseract'
+
+    def __init__(self, lang='chi_sim+eng'):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def recognize(self, image):
+        return {"text": self._pytesseract.image_to_string(image, lang=self.lang)}
+
+
+_BACKENDS = {
+    NullOcrBackend.name: NullOcrBackend,
+    TesseractOcrBackend.name: TesseractOcrBackend,
+}
+
+
+def register_backend(name, factory):
+    """
+    注册 OCR 后端。
+
+    Args:
+        name (str): 后端名称。
+        factory: 无参可调用对象，返回 OcrBackend 实例；需可被 pickle（模块级函数或类），
+                 以便在工作进程中创建。
+    """
+    _BACKENDS[name] = factory
+
+
+def get_backend(name):
+    if name not in _BACKENDS:
+        raise ValueError(f"未注册的 OCR 后端: {name}，可用: {', '.join(_BACKENDS)}")
+    return _BACKENDS[name]()
+
+
+_worker_backend = None
+
+
+def _init_worker(factory):
+    global _worker_backend
+    _worker_backend = factory() if factory else None
+
+
+def _process(page, options, keep_image=True):
+    image, skew = preprocess_page(page, **options)
+    ocr = _worker_backend.recognize(image) if _worker_backend else None
+    return PageResult(image if keep_image else None, skew, ocr)
+
+
+def preprocess_pages(pages, workers=None, backend=None, keep_images=True, **options):
+    """
+    多页并行预处理和识别。
+
+    Args:
+        pages: 可迭代的页面数组。
+        workers (int): 进程数，默认CPU核数；1 表示在当前进程内处理。
+        backend (str): OCR 后端名称，None 表示只做预处理。
+        keep_images (bool): 是否返回预处理后的图像；只需要识别结果时关闭，
+            工作进程不再把整页图像传回主进程。
+        **options: 传给 preprocess_page 的参数。
+
+    Returns:
+        list: 与输入顺序一致的 PageResult 列表。
+    """
+    factory = _BACKENDS.get(backend) if backend else None
+    if backend and factory is None:
+        raise ValueError(f"未注册的 OCR 后端: {backend}，可用: {', '.join(_BACKENDS)}")
+    if workers == 1:
+        _init_worker(factory)
+        return [_process(page, options, keep_images) for page in pages]
+    pages = list(pages)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(factory,)) as pool:
+        return list(pool.map(_process, pages, [options] * len(pages), [keep_images] * len(pages)))
+
+
+# --- 基准测试 -----------------------------------------------------------
+
+def synthetic_page(seed=0, size=A4_300DPI, skew=1.5, noise=12.0):
+    """
+    生成合成的扫描页：白底上排列深色"文字行"，叠加倾斜、高斯噪声和椒盐噪声。
+
+    Returns:
+        np.ndarray: uint8 灰度页面，形状为 (高, 宽)。
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    page = np.full((height, width), 235, dtype=np.uint8)
+    margin = width // 10
+    y = margin
+    while y < height - margin:
+        line_height = int(rng.integers(28, 40))
+        x = margin
+        while x < width - margin:
+            word = int(rng.integers(40, 220))
+            page[y:y + line_height, x:min(x + word, width - margin)] = 30
+            x += word + int(rng.integers(20, 40))
+        y += line_height + int(rng.integers(30, 60))
+    page = rotate(page, skew, fill=235)
+    noisy = page.astype(np.float32) + rng.normal(0, noise, page.shape).astype(np.float32)
+    salt = rng.random(page.shape, dtype=np.float32)
+    noisy[salt < 0.002] = 0
+    noisy[salt > 0.998] = 255
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def benchmark(pages=8, workers=None, backend=None, denoise_method='median'):
+    """
+    在合成的 300 DPI A4 页面上测量预处理吞吐量。
+
+    Returns:
+        dict: 页数、进程数、耗时、pages/sec 以及纠偏误差。
+    """
+    skews = [round(float(s), 2) for s in np.linspace(-3, 3, pages)]
+    batch = [synthetic_page(seed, skew=skew) for seed, skew in enumerate(skews)]
+    start = time.perf_counter()
+    results = preprocess_pages(batch, workers=workers, backend=backend, denoise_method=denoise_method)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": pages,
+        "workers": workers or os.cpu_count(),
+        "elapsed": elapsed,
+        "pagesPerSec": pages / elapsed,
+        "maxSkewError": max(abs(r.skew - s) for r, s in zip(results, skews)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扫描图像预处理")
+    parser.add_argument('--benchmark', action='store_true', help="在合成页面上运行基准测试")
+    parser.add_argument('--pages', type=int, default=8, help="基准测试页数")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认CPU核数")
+    parser.add_argument('--backend', default=None, help="OCR 后端名称")
+    parser.add_argument('--denoise', default='median', choices=['median', 'gaussian'])
+    args = parser.parse_args(argv)
+    if not args.benchmark:
+        parser.print_help()
+        return 2
+
+    stats = benchmark(args.pages, args.workers, args.backend, args.denoise)
+    print(f"[SUCCESS] 预处理 {stats['pages']} 页 (300 DPI A4)，进程数 {stats['workers']}，"
+          f"耗时 {stats['elapsed']:.2f} 秒，{stats['pagesPerSec']:.2f} pages/sec，"
+          f"纠偏最大误差 {stats['maxSkewError']:.2f}°")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+收货单业务规则校验
+
+规则以声明式的字典列表描述（可从JSON文件加载），首次使用时编译成校验函数并缓存，
+之后每个单据的校验只是依次调用这些函数，不再解析规则。
+
+规则字段:
+    id        规则标识
+    name      规则名称（用于日志）
+    check     规则类型: required / pattern / date / whitelist / range / amount
+    scope     作用范围: document（表头，默认）或 item（每个物料行）
+    severity  error（默认）或 warning
+    其余字段随规则类型不同，见 DEFAULT_RULES。
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+from receiving.items import MONEY_SCALE, to_scaled, ItemColumns
+
+Violation = namedtuple('Violation', ['rule', 'severity', 'field', 'line', 'message'])
+
+DEFAULT_RULES = [
+    {
+        "id": "required_header", "name": "检查必填字段", "check": "required",
+        "fields": ["documentType", "documentNumber", "date", "supplier", "items"]
+    },
+    {
+        "id": "required_item", "name": "检查必填字段", "check": "required", "scope": "item",
+        "fields": ["name", "quantity", "unit"]
+    },
+    {
+        "id": "document_number_format", "name": "验证数据格式", "check": "pattern",
+        "field": "documentNumber", "pattern": r"[A-Z]{2}\d{8,}"
+    },
+    {
+        "id": "date_format", "name": "验证数据格式", "check": "date",
+        "field": "date", "format": "%Y-%m-%d"
+    },
+    {
+        "id": "amount_reconciliation", "name": "核对金额计算", "check": "amount",
+        "priceField": "unitPrice", "lineTotalField": "totalPrice", "totalField": "totalAmount",
+        "tolerance": 0.01
+    },
+    {
+        "id": "material_code_format", "name": "检查物料编码", "check": "pattern", "scope": "item",
+        "field": "materialCode", "pattern": r"\d{6,18}|MAT\d{4}", "optional": True
+    },
+    {
+        "id": "quantity_positive", "name": "验证数量单位", "check": "range", "scope": "item",
+        "field": "quantity", "min": 0, "exclusive": True
+    },
+    {
+        "id": "unit_whitelist", "name": "验证数量单位", "check": "whitelist", "scope": "item",
+        "field": "unit", "values": ["套", "个", "台", "只", "组", "根", "块", "米", "千米", "吨", "千克", "PCS"]
+    },
+]
+
+
+def _required(rule):
+    fields = tuple(rule["fields"])
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(record, line):
+        return [
+            Violation(rule_id, severity, field, line, f"缺少必需字段: {field}")
+            for field in fields if record.get(field) in (None, "")
+        ]
+    return check
+
+
+def _pattern(rule):
+    field = rule["field"]
+    match = re.compile(rule["pattern"]).fullmatch
+    optional = rule.get("optional", False)
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(record, line):
+        value = record.get(field)
+        if value is None:
+            if optional:
+                return ()
+            return (Violation(rule_id, severity, field, line, f"缺少字段: {field}"),)
+        if match(str(value)) is None:
+            return (Violation(rule_id, severity, field, line, f"字段格式不正确: {field}={value}"),)
+        return ()
+    return check
+
+
+def _date(rule):
+    field = rule["field"]
+    fmt = rule["format"]
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(record, line):
+        value = record.get(field)
+        if value is None:
+            return ()
+        try:
+            datetime.strptime(str(value), fmt)
+        except ValueError:
+            return (Violation(rule_id, severity, field, line, f"日期格式不正确: {field}={value}"),)
+        return ()
+    return check
+
+
+def _whitelist(rule):
+    field = rule["field"]
+    allowed = frozenset(rule["values"])
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(record, line):
+        value = record.get(field)
+        if value is not None and value not in allowed:
+            return (Violation(rule_id, severity, field, line, f"不支持的取值: {field}={value}"),)
+        return ()
+    return check
+
+
+def _range(rule):
+    field = rule["field"]
+    low = rule.get("min")
+    high = rule.get("max")
+    exclusive = rule.get("exclusive", False)
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(record, line):
+        value = record.get(field)
+        if value is None:
+            return ()
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return (Violation(rule_id, severity, field, line, f"不是有效数值: {field}={value}"),)
+        if low is not None and (number <= low if exclusive else number < low):
+            return (Violation(rule_id, severity, field, line, f"数值过小: {field}={value}"),)
+        if high is not None and (number >= high if exclusive else number > high):
+            return (Violation(rule_id, severity, field, line, f"数值过大: {field}={value}"),)
+        return ()
+    return check
+
+
+def _amount(rule):
+    price_field = rule.get("priceField", "unitPrice")
+    line_total_field = rule.get("lineTotalField", "totalPrice")
+    total_field = rule.get("totalField", "totalAmount")
+    tolerance = to_scaled(rule.get("tolerance", 0), MONEY_SCALE)
+    rule_id = rule["id"]
+    severity = rule.get("severity", "error")
+
+    def check(document, line):
+        items = document.get("items")
+        if not items:
+            return ()
+        # 只核对同时给出单价和行金额的行
+        lines = [n for n, item in enumerate(items, 1)
+                 if isinstance(item, dict) and price_field in item and line_total_field in item]
+        if not lines:
+            return ()
+        try:
+            columns = ItemColumns.from_items([items[n - 1] for n in lines],
+                                             price_key=price_field, total_key=line_total_field)
+        except (KeyError, TypeError, ArithmeticError, ValueError):
+            # 字段缺失或数值无效由 required / range 规则报告
+            return ()
+        line_totals = columns.line_totals()
+        violations = [
+            Violation(rule_id, severity, line_total_field, lines[idx],
+                      f"行金额不一致: 数量×单价={computed / MONEY_SCALE:.2f}，单据金额={declared / MONEY_SCALE:.2f}")
+            for idx, computed, declared in columns.amount_mismatches(line_totals, tolerance)
+        ]
+        declared_total = document.get(total_field)
+        if declared_total is not None and len(lines) == len(items):
+            computed_total = int(line_totals.sum())
+            declared_total = to_scaled(declared_total, MONEY_SCALE)
+            if abs(computed_total - declared_total) > tolerance:
+                violations.append(Violation(
+                    rule_id, severity, total_field, None,
+                    f"总金额不一致: 明细合计={computed_total / MONEY_SCALE:.2f}，"
+                    f"单据金额={declared_total / MONEY_SCALE:.2f}"))
+        return violations
+    return check
+
+
+_COMPILERS = {
+    "required": _required,
+    "pattern": _pattern,
+    "date": _date,
+    "whitelist": _whitelist,
+    "range": _range,
+    "amount": _amount,
+}
+
+
+class Validator:
+    """
+    编译后的规则集。
+
+    调用实例即可校验单个单据，返回违规列表；validate_batch 批量校验。
+    """
+    __slots__ = ('names', 'rule_names', '_document_checks', '_item_checks')
+
+    def __init__(self, rules):
+        self.names = []
+        self.rule_names = {}
+        self._document_checks = []
+        self._item_checks = []
+        for rule in rules:
+            compiler = _COMPILERS.get(rule["check"])
+            if compiler is None:
+                raise ValueError(f"未知的规则类型: {rule['check']}（规则 {rule.get('id')}）")
+            target = self._item_checks if rule.get("scope", "document") == "item" else self._document_checks
+            target.append(compiler(rule))
+            name = rule.get("name", rule["id"])
+            self.rule_names[rule["id"]] = name
+            if name not in self.names:
+                self.names.append(name)
+
+    def __call__(self, document):
+        """
+        校验单个单据。
+
+        Returns:
+            list: Violation 列表，为空表示通过。
+        """
+        violations = []
+        for check in self._document_checks:
+            violations.extend(check(document, None))
+        items = document.get("items")
+        if self._item_checks and isinstance(items, list):
+            for line, item in enumerate(items, 1):
+                if not isinstance(item, dict):
+                    violations.append(Violation("item_type", "error", "items", line, "物料行必须是对象"))
+                    continue
+                for check in self._item_checks:
+                    violations.extend(check(item, line))
+        return violations
+
+    def validate_batch(self, documents):
+        """
+        批量校验。
+
+        Returns:
+            list: 每个单据对应的 Violation 列表，顺序与输入一致。
+        """
+        return [self(document) for document in documents]
+
+
+# 内置规则编译后的校验器，首次使用时创建
+_default_validator = None
+
+
+@lru_cache(maxsize=32)
+def _compile(rules_key):
+    return Validator(json.loads(rules_key))
+
+
+def compile_rules(rules=None):
+    """
+    编译规则集，相同内容的规则集只编译一次。
+
+    内置规则直接返回模块级的校验器；传入的规则集按内容缓存（需要序列化一次作为键），
+    调用方应保存返回的校验器，不要对每个单据重复调用。
+
+    Args:
+        rules (list): 规则字典列表，默认为 DEFAULT_RULES。
+
+    Returns:
+        Validator: 编译后的校验器。
+    """
+    global _default_validator
+    if rules is None:
+        if _default_validator is None:
+            _default_validator = Validator(DEFAULT_RULES)
+        return _default_validator
+    return _compile(json.dumps(rules, sort_keys=True, ensure_ascii=False))
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime):
+    with open(path, encoding='utf-8') as f:
+        return compile_rules(json.load(f))
+
+
+def load_rules(path=None):
+    """
+    从JSON文件加载并编译规则集；文件修改后自动重新编译。
+
+    每次调用都会检查一次规则文件的修改时间，批量处理时每批调用一次，
+    把返回的校验器用于该批的所有单据。
+
+    Args:
+        path (str): 规则文件路径，默认读取环境变量 RECEIVING_RULES，未设置时使用内置规则。
+
+    Returns:
+        Validator: 编译后的校验器。
+    """
+    path = path or os.environ.get("RECEIVING_RULES")
+    if not path:
+        return compile_rules()
+    return _load(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def errors(violations):
+    """筛选出严重级别为 error 的违规"""
+    return [v for v in violations if v.severity == "error"]
@@ -0,0 +1,239 @@
+"""
+收货系统本地模拟服务
+
+用于在没有目标系统的环境中测试 receiving.submitter 的并发、重试和幂等行为。
+只依赖标准库（asyncio），支持 HTTP/1.1 长连接。
+
+    POST /receiving   提交一张收货单（JSON: header / items / summary），返回收货单号
+                      Idempotency-Key 相同且内容相同（X-Content-Digest）时返回首次的收货单号
+                      （replayed=true），内容不同时返回 409
+    GET  /health      健康检查
+
+模拟的故障:
+    latency     每个请求的处理延迟（秒），在 ±jitter 比例内随机浮动
+    error_rate  返回 503 的比例
+    drop_rate   处理完成后不返回响应、直接断开连接的比例（模拟响应丢失）
+
+用法（在 examples/ 目录下）:
+    python -m receiving.stub_server --port 8808 --latency 0.05 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from datetime import datetime
+from hashlib import blake2b
+
+from common.log import get_logger
+
+log = get_logger('receiving_stub')
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict',
+           503: 'Service Unavailable'}
+
+
+class StubServer:
+    """
+    模拟收货系统。
+
+    Args:
+        host (str) / port (int): 监听地址，port 为 0 时自动分配。
+        latency (float): 处理延迟（秒）。
+        jitter (float): 延迟随机浮动比例。
+        error_rate (float): 返回 503 的比例。
+        drop_rate (float): 直接断开连接的比例。
+        seed (int): 随机种子。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.5, error_rate=0.0, drop_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self._receipts = {}
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self.stats = {"requests": 0, "connections": 0, "created": 0, "replayed": 0, "conflicts": 0,
+                      "errors": 0, "dropped": 0}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/receiving"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        log.info(f"模拟收货系统已启动: {self.url}", latency=self.latency,
+                 error_rate=self.error_rate, drop_rate=self.drop_rate)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        """在后台线程的事件循环中运行，供同步代码使用"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='receiving-stub', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """停止 start_in_thread 启动的服务"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length') or 0))
+                self.stats["requests"] += 1
+
+                if self.latency:
+                    await asyncio.sleep(self.latency * (1 + self.jitter * (2 * self._random.random() - 1)))
+                status, payload = self._respond(method, path, headers, body)
+                # 已处理但响应丢失，客户端重试时应得到同一个收货单号
+                if self._random.random() < self.drop_rate:
+                    self.stats["dropped"] += 1
+                    break
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, method, path, headers, body):
+        if method == 'GET' and path == '/health':
+            return 200, {"status": "ok", **self.stats}
+        if method != 'POST' or path.split('?')[0] != '/receiving':
+            return 404, {"error": "not found"}
+        if self._random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return 503, {"error": "service unavailable"}
+        try:
+            document = json.loads(body)
+            number = document["header"]["documentNumber"]
+            items = document["items"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "invalid document"}
+
+        key = headers.get('idempotency-key') or number
+        # 客户端提供的内容摘要不含创建时间等每次运行都会变化的字段，未提供时按请求体计算
+        digest = headers.get('x-content-digest') or blake2b(body, digest_size=16).hexdigest()
+        if key in self._receipts:
+            stored_digest, receipt = self._receipts[key]
+            if stored_digest != digest:
+                self.stats["conflicts"] += 1
+                return 409, {"error": "idempotency key reused with different content", "receiptNumber": receipt}
+            self.stats["replayed"] += 1
+            return 200, {"receiptNumber": receipt, "documentNumber": number, "itemsProcessed": len(items),
+                         "replayed": True}
+        self.stats["created"] += 1
+        receipt = f"GR{datetime.now().strftime('%Y%m%d')}{self.stats['created']:06d}"
+        self._receipts[key] = (digest, receipt)
+        return 201, {"receiptNumber": receipt, "documentNumber": number, "itemsProcessed": len(items),
+                     "replayed": False}
+
+
+def sample_documents(count, items=10, seed=0):
+    """
+    生成结构化收货单（shipping_receiving_demo 步骤2 的输出格式），用于压测。
+
+    Returns:
+        list: 结构化单据列表。
+    """
+    rng = random.Random(seed)
+    documents = []
+    for sequence in range(count):
+        lines = []
+        for line in range(1, items + 1):
+            quantity = rng.randint(1, 500)
+            price = round(rng.uniform(1, 500), 2)
+            lines.append({
+                "lineNumber": line, "materialCode": f"MAT{rng.randint(1, 9999):04d}",
+                "materialName": "测试物料", "specification": "", "quantity": quantity, "unit": "PCS",
+                "unitPrice": price, "totalPrice": round(price * quantity, 2),
+                "batchNumber": "BATCH00000000", "storageLocation": f"A-{line:02d}-01",
+            })
+        documents.append({
+            "header": {
+                "documentType": "GOODS_RECEIPT", "documentNumber": f"SH{30240000000 + sequence}",
+                "transactionDate": "2024-10-21", "supplierCode": f"SP{1000 + sequence % 20:06d}",
+                "supplierName": f"测试供应商{sequence % 20}", "warehouseCode": "WH001", "warehouseName": "主仓库",
+            },
+            "items": lines,
+            "summary": {"totalItems": len(lines), "totalQuantity": float(sum(l["quantity"] for l in lines)),
+                        "totalAmount": round(sum(l["totalPrice"] for l in lines), 2), "currency": "CNY"},
+        })
+    return documents
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="收货系统本地模拟服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--latency', type=float, default=0.05, help="处理延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.5, help="延迟随机浮动比例")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="直接断开连接的比例")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.drop_rate)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+收货单异步提交
+
+原来的步骤3 逐张单据、逐行填写，每个字段 sleep 一次。这里改为每张单据一个请求
+（表头和全部物料行一起提交），由 asyncio 并发提交:
+    - 连接池复用 HTTP/1.1 长连接，连接数即并发上限
+    - 请求带 Idempotency-Key（单据编号）和 X-Content-Digest（内容哈希），
+      超时、断线、5xx/429 按指数退避重试，目标系统对同一单据只生成一张收货单
+    - 提交前后查询和登记本地幂等索引（receiving.idempotency），已填报的单据不再提交
+    - 统计吞吐量、延迟分位数和重试次数
+
+只依赖标准库。可以对本地模拟服务（receiving.stub_server）压测:
+    python -m receiving.submitter --stub --sample 500 --concurrency 32
+    python -m receiving.submitter http://127.0.0.1:8808/receiving --sample 500 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from common.log import get_logger
+from receiving.idempotency import content_hash, DUPLICATE, CHANGED
+
+log = get_logger('receiving_submit')
+
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+# 可以重试的状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class ConnectionPool:
+    """
+    HTTP/1.1 长连接池。
+
+    Args:
+        url (str): 目标地址（http 或 https）。
+        size (int): 最大连接数，同时进行的请求不超过该数量。
+        timeout (float): 单个请求的超时（秒）。
+    """
+
+    def __init__(self, url, size=16, timeout=10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self.opened = 0
+        self.reused = 0
+
+    async def _open(self):
+        self.opened += 1
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+
+    @staticmethod
+    def _discard(connection):
+        connection[1].close()
+
+    async def _exchange(self, connection, method, body, headers):
+        reader, writer = connection
+        lines = [f"{method} {self.path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}",
+                 "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('utf-8') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("连接已被目标系统关闭")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b''.join(chunks)
+        else:
+            data = await reader.readexactly(int(response_headers.get('content-length') or 0))
+        return Response(status, response_headers, data)
+
+    async def request(self, method, body=b'', headers=None):
+        """
+        发送请求。空闲连接已被对方关闭时换新连接重发一次。
+
+        Returns:
+            Response: 状态码、响应头、响应体。
+        """
+        headers = headers or {}
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                connection = self._idle.pop() if reused else await self._open()
+                try:
+                    response = await asyncio.wait_for(self._exchange(connection, method, body, headers), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    self._discard(connection)
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    self._discard(connection)
+                    raise
+                if reused:
+                    self.reused += 1
+                if response.headers.get('connection', '').lower() == 'close':
+                    self._discard(connection)
+                else:
+                    self._idle.append(connection)
+                return response
+
+    async def close(self):
+        while self._idle:
+            self._discard(self._idle.pop())
+
+
+def build_payload(structured_data):
+    """一张单据一个请求：表头、全部物料行和汇总"""
+    return json.dumps({
+        "header": structured_data["header"],
+        "items": structured_data["items"],
+        "summary": structured_data["summary"],
+    }, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _report(structured_data, status, receipt_number=None, items_processed=0, remarks='', **extra):
+    """与步骤3 相同格式的执行报告"""
+    return {
+        "executionId": f"EXEC_{int(time.time())}",
+        "executionTime": datetime.now().isoformat(),
+        "sourceDocument": structured_data['header']['documentNumber'],
+        "supplierName": structured_data['header']['supplierName'],
+        "receiptNumber": receipt_number,
+        "itemsProcessed": items_processed,
+        "totalAmount": structured_data['summary']['totalAmount'],
+        "currency": "CNY",
+        "status": status,
+        "operator": "RPA_AUTO_SYSTEM",
+        "remarks": remarks,
+        **extra,
+    }
+
+
+def _percentile(values, percentile):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))]
+
+
+class Submitter:
+    """
+    收货单异步提交器。
+
+    Args:
+        url (str): 目标系统地址。
+        concurrency (int): 并发请求数（连接池大小）。
+        retries (int): 每张单据的最大重试次数。
+        backoff (float): 首次重试前的等待（秒），之后每次加倍并加随机抖动。
+        timeout (float): 单个请求的超时（秒）。
+        index (IdempotencyIndex): 本地幂等索引，为 None 时不查询。
+    """
+
+    def __init__(self, url, concurrency=16, retries=3, backoff=0.2, timeout=10.0, index=None):
+        self.url = url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.index = index
+        self.retried = 0
+        self.latencies = []
+        self._pool = None
+
+    async def submit(self, structured_data, decision=None):
+        """
+        提交一张单据。
+
+        Returns:
+            dict: 执行报告，status 为 SUCCESS / FAILED / SKIPPED_DUPLICATE / REVIEW_REQUIRED。
+        """
+        number = structured_data['header']['documentNumber']
+        if decision is None and self.index is not None:
+            decision = self.index.check(structured_data)
+        if decision is not None and decision.status == DUPLICATE:
+            return _report(structured_data, "SKIPPED_DUPLICATE", decision.receipt_number, remarks="单据已填报，跳过")
+        if decision is not None and decision.status == CHANGED:
+            return _report(structured_data, "REVIEW_REQUIRED", decision.receipt_number, remarks="单据内容变化，待人工复核")
+
+        digest = decision.content_hash if decision is not None else content_hash(structured_data)
+        body = build_payload(structured_data)
+        headers = {"Content-Type": "application/json; charset=utf-8", "Idempotency-Key": number,
+                   "X-Content-Digest": digest.hex()}
+        start = time.perf_counter()
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+            try:
+                response = await self._pool.request('POST', body, headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status in RETRY_STATUS:
+                error = f"HTTP {response.status}"
+                continue
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            try:
+                result = json.loads(response.body or b'{}')
+                if not isinstance(result, dict):
+                    raise ValueError(f"应为JSON对象，实际为 {type(result).__name__}")
+            except ValueError as e:
+                # 代理返回的 HTML 错误页等：只让这一张单据失败，不中断整批提交
+                return _report(structured_data, "FAILED",
+                               remarks=f"HTTP {response.status}: 响应不是有效的JSON ({type(e).__name__}: {e})",
+                               attempts=attempt + 1, durationMs=duration_ms)
+            if response.status == 409:
+                return _report(structured_data, "REVIEW_REQUIRED", result.get("receiptNumber"),
+                               remarks="目标系统已有该单据且内容不同，待人工复核", attempts=attempt + 1,
+                               durationMs=duration_ms)
+            if not 200 <= response.status < 300:
+                return _report(structured_data, "FAILED", remarks=f"HTTP {response.status}: {result.get('error', '')}",
+                               attempts=attempt + 1, durationMs=duration_ms)
+            receipt_number = result.get("receiptNumber")
+            if not receipt_number:
+                return _report(structured_data, "FAILED", remarks=f"HTTP {response.status}: 响应中没有收货单号",
+                               attempts=attempt + 1, durationMs=duration_ms)
+            self.latencies.append(duration_ms)
+            if self.index is not None:
+                self.index.record(decision, receipt_number)
+            return _report(structured_data, "SUCCESS", receipt_number, result.get("itemsProcessed", 0),
+                           "目标系统已有该单据，返回原收货单号" if result.get("replayed") else "自动化流程执行成功",
+                           attempts=attempt + 1, durationMs=duration_ms)
+        return _report(structured_data, "FAILED", remarks=f"重试 {self.retries} 次后仍失败: {error}",
+                       attempts=self.retries + 1, durationMs=int((time.perf_counter() - start) * 1000))
+
+    async def submit_all(self, documents):
+        """
+        并发提交多张单据。
+
+        Returns:
+            tuple: (与输入顺序一致的执行报告列表, 统计信息)。
+        """
+        self._pool = ConnectionPool(self.url, self.concurrency, self.timeout)
+        decisions = self.index.check_many(documents) if self.index is not None else [None] * len(documents)
+        start = time.perf_counter()
+        try:
+            reports = await asyncio.gather(*(self.submit(document, decision)
+                                             for document, decision in zip(documents, decisions)))
+        finally:
+            await self._pool.close()
+        elapsed = time.perf_counter() - start
+        statuses = {}
+        for report in reports:
+            statuses[report["status"]] = statuses.get(report["status"], 0) + 1
+        submitted = statuses.get("SUCCESS", 0)
+        stats = {
+            "documents": len(documents),
+            "statuses": statuses,
+            "elapsed": round(elapsed, 3),
+            "throughputPerMinute": round(submitted / elapsed * 60, 1) if elapsed else None,
+            "latencyP50Ms": _percentile(self.latencies, 0.5),
+            "latencyP95Ms": _percentile(self.latencies, 0.95),
+            "retries": self.retried,
+            "connectionsOpened": self._pool.opened,
+            "connectionsReused": self._pool.reused,
+        }
+        return list(reports), stats
+
+
+def submit_documents(url, documents, **kwargs):
+    """
+    同步调用入口：在新的事件循环中并发提交。参数见 Submitter。
+
+    Returns:
+        tuple: (执行报告列表, 统计信息)。
+    """
+    return asyncio.run(Submitter(url, **kwargs).submit_all(documents))
+
+
+def log_stats(stats):
+    """输出提交统计"""
+    statuses = '，'.join(f"{status} {count}" for status, count in stats['statuses'].items())
+    log.info(f"提交 {stats['documents']} 张单据（{statuses}），耗时 {stats['elapsed']:.2f} 秒，"
+             f"吞吐量 {stats['throughputPerMinute'] or 0:.1f} 张/分钟，"
+             f"延迟 P50 {stats['latencyP50Ms']} ms / P95 {stats['latencyP95Ms']} ms，"
+             f"重试 {stats['retries']} 次，连接 {stats['connectionsOpened']} 个", step='submit', **stats)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="并发提交收货单")
+    parser.add_argument('url', nargs='?', help="目标系统地址；使用 --stub 时省略")
+    parser.add_argument('--input', help="结构化单据文件（JSON 数组或每行一个 JSON）")
+    parser.add_argument('--sample', type=int, default=0, help="生成指定数量的测试单据")
+    parser.add_argument('--items', type=int, default=10, help="测试单据的物料行数")
+    parser.add_argument('--concurrency', type=int, default=16, help="并发请求数")
+    parser.add_argument('--retries', type=int, default=3, help="最大重试次数")
+    parser.add_argument('--timeout', type=float, default=10.0, help="单个请求超时（秒）")
+    parser.add_argument('--stub', action='store_true', help="启动本地模拟服务并向其提交")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务的处理延迟（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟服务返回 503 的比例")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="模拟服务断开连接的比例")
+    return parser.parse_args(argv)
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from receiving.stub_server import StubServer, sample_documents
+
+    documents = _load(args.input) if args.input else sample_documents(args.sample, args.items)
+    if not documents:
+        log.error("没有要提交的单据（--input 或 --sample）")
+        return 2
+    stub = None
+    url = args.url
+    if args.stub:
+        stub = StubServer(latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate).start_in_thread()
+        url = stub.url
+    if not url:
+        log.error("未指定目标系统地址")
+        return 2
+    try:
+        reports, stats = submit_documents(url, documents, concurrency=args.concurrency,
+                                          retries=args.retries, timeout=args.timeout)
+    finally:
+        if stub is not None:
+            stub.stop()
+    log_stats(stats)
+    for report in reports:
+        if report["status"] == "FAILED":
+            log.error(f"单据 {report['sourceDocument']} 提交失败: {report['remarks']}", step='submit')
+    return 0 if not stats["statuses"].get("FAILED") else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,36 +4,72 @@
 模拟完整的收发货流程：扫描 -> 数据处理 -> 填报
 """
 
-import json
+import argparse
+import os
 import time
 import sys
 from datetime import datetime
 
-def step1_scan_document():
-    """步骤1: 模拟文档扫描和OCR识别"""
-    print("=" * 60)
-    print("步骤1: 扫描纸张并进行OCR识别")
-    print("=" * 60)
-
-    print("[INFO] 正在初始化扫描器...")
+from receiving.items import ItemColumns, MONEY_SCALE
+from receiving.material_index import default_index
+from receiving.pipeline import Pipeline, Stage
+from receiving.idempotency import default_index as default_idempotency_index, DUPLICATE, CHANGED
+from receiving.aggregate import default_store as default_aggregate_store
+from receiving.rules import load_rules, errors
+from common.history import HistoryWriter, new_run_id, SUCCESS, FAILED
+from common.log import get_logger
+from common import handoff, profiling
+
+HISTORY_SOURCE = 'shipping_receiving'
+log = get_logger(HISTORY_SOURCE)
+# 未配置数据库路径时，状态数据库放在脚本所在目录
+STATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def step1_scan_document(pages=None, sequence=1):
+    """
+    步骤1: 模拟文档扫描和OCR识别
+
+    Args:
+        pages (list): 扫描得到的灰度页面（NumPy 数组）。提供时执行真实的图像预处理，
+                      否则只模拟扫描过程；设置了 RECEIVING_OCR（OCR 后端名称）时预处理后直接识别，
+                      识别结果保存在 ocrPages 中。
+        sequence (int): 当日单据流水号，用于生成模拟的单据编号。
+    """
+    log.set_step('scan')
+    log.text("=" * 60)
+    log.text("步骤1: 扫描纸张并进行OCR识别")
+    log.text("=" * 60)
+
+    log.info("正在初始化扫描器...")
     time.sleep(1)
 
-    print("[INFO] 检测到纸张文档，准备扫描...")
+    log.info("检测到纸张文档，准备扫描...")
     time.sleep(0.5)
 
-    print("[INFO] 正在扫描第 1 页 (分辨率: 300 DPI)...")
+    log.info("正在扫描第 1 页 (分辨率: 300 DPI)...")
     time.sleep(1.5)
 
-    print("[INFO] 正在预处理图像（降噪、纠偏、二值化）...")
-    time.sleep(1)
+    log.info("正在预处理图像（降噪、纠偏、二值化）...")
+    ocr_pages = None
+    if pages:
+        from receiving.preprocess import preprocess_pages
+        backend = os.environ.get('RECEIVING_OCR') or None
+        results = preprocess_pages(pages, backend=backend, keep_images=False)
+        for page_no, result in enumerate(results, start=1):
+            log.info(f"第 {page_no} 页预处理完成，倾斜角 {result.skew:.2f}°")
+        if backend:
+            ocr_pages = [result.ocr for result in results]
+    else:
+        time.sleep(1)
 
-    print("[INFO] 正在执行 OCR 识别 (引擎: Tesseract, 语言: chi_sim+eng)...")
-    time.sleep(2)
+    if ocr_pages is None:
+        log.info("正在执行 OCR 识别 (引擎: Tesseract, 语言: chi_sim+eng)...")
+        time.sleep(2)
 
     # 模拟OCR识别结果
     ocr_result = {
         "documentType": "收货单",
-        "documentNumber": "SH20241021001",
+        "documentNumber": f"SH20241021{sequence:03d}",
         "date": "2024-10-21",
         "supplier": "上海电力设备有限公司",
         "supplierCode": "SP001234",
@@ -69,51 +105,57 @@ def step1_scan_document():
         "operator": "张三",
         "remarks": "紧急入库"
     }
+    if ocr_pages is not None:
+        ocr_result["ocrPages"] = ocr_pages
 
-    print(f"[SUCCESS] OCR 识别完成！识别到 {len(ocr_result['items'])} 个物料条目")
-    print(f"[INFO] 文档类型: {ocr_result['documentType']}")
-    print(f"[INFO] 文档编号: {ocr_result['documentNumber']}")
-    print(f"[INFO] 供应商: {ocr_result['supplier']}")
-    print(f"[INFO] 总金额: ¥{ocr_result['totalAmount']:,.2f}")
+    log.success(f"OCR 识别完成！识别到 {len(ocr_result['items'])} 个物料条目")
+    log.info(f"文档类型: {ocr_result['documentType']}")
+    log.info(f"文档编号: {ocr_result['documentNumber']}")
+    log.info(f"供应商: {ocr_result['supplier']}")
+    log.info(f"总金额: ¥{ocr_result['totalAmount']:,.2f}")
 
-    print("\n[DEBUG] OCR 识别原始数据:")
-    print(json.dumps(ocr_result, ensure_ascii=False, indent=2))
+    log.text()
+    log.debug("OCR 识别原始数据:", data=ocr_result)
 
     return ocr_result
 
 
 def step2_clean_and_structure_data(raw_data):
     """步骤2: 数据清理和结构化"""
-    print("\n" + "=" * 60)
-    print("步骤2: 数据清理和结构化")
-    print("=" * 60)
+    log.set_step('clean')
+    log.text("\n" + "=" * 60)
+    log.text("步骤2: 数据清理和结构化")
+    log.text("=" * 60)
 
-    print("[INFO] 正在加载业务规则配置...")
-    time.sleep(0.8)
+    log.info("正在加载业务规则配置...")
+    validator = load_rules()
 
-    print("[INFO] 正在验证数据完整性...")
-    time.sleep(1)
+    log.info("正在验证数据完整性...")
+    violations = validator(raw_data)
 
-    # 数据验证
-    validation_checks = [
-        "检查必填字段",
-        "验证数据格式",
-        "核对金额计算",
-        "检查物料编码",
-        "验证数量单位"
-    ]
+    failed_checks = {}
+    for violation in violations:
+        failed_checks.setdefault(validator.rule_names.get(violation.rule, violation.rule), []).append(violation)
 
-    for check in validation_checks:
-        print(f"[INFO] {check}... ✓")
-        time.sleep(0.3)
+    for check in validator.names:
+        if check in failed_checks:
+            log.info(f"{check}... ✗")
+            for violation in failed_checks[check]:
+                location = f"第 {violation.line} 行 " if violation.line else ""
+                emit = log.error if violation.severity == 'error' else log.warning
+                emit(f"{location}{violation.message}", rule=violation.rule, field=violation.field,
+                     line=violation.line)
+        else:
+            log.info(f"{check}... ✓")
 
-    print("[SUCCESS] 数据验证通过")
+    if errors(violations):
+        raise ValueError(f"数据验证失败: {len(errors(violations))} 项错误")
 
-    print("[INFO] 正在执行数据标准化...")
-    time.sleep(1)
+    log.success("数据验证通过")
 
-    print("[INFO] 正在映射到目标系统字段...")
-    time.sleep(1.2)
+    log.info("正在执行数据标准化...")
+
+    log.info("正在映射到目标系统字段...")
 
     # 构建结构化数据
     structured_data = {
@@ -139,64 +181,128 @@ def step2_clean_and_structure_data(raw_data):
         }
     }
 
-    # 处理物料明细
-    print("[INFO] 正在处理物料明细数据...")
-    for idx, item in enumerate(raw_data["items"], start=1):
-        processed_item = {
+    # 处理物料明细：按列存储，数量和金额以整数精确计算
+    log.info("正在处理物料明细数据...")
+    items = ItemColumns.from_items(raw_data["items"])
+    line_totals = items.line_totals()
+
+    # 输出保留单据上的行金额，与 数量×单价 不一致的行单独报告
+    mismatches = items.amount_mismatches(line_totals)
+    for idx, computed, declared in mismatches:
+        log.warning(f"第 {idx + 1} 行金额不一致: 数量×单价=¥{computed / MONEY_SCALE:,.2f}，"
+                    f"单据金额=¥{declared / MONEY_SCALE:,.2f}", line=idx + 1)
+    item_totals = items.declared_or_computed(line_totals)
+
+    # 按名称+规格在物料主数据索引中查找物料编码
+    material_index = default_index()
+    if material_index is None:
+        log.warning("未配置物料索引 (MATERIAL_INDEX)，使用模拟物料编码")
+        material_codes = [f"MAT{idx:04d}" for idx in range(1, len(items) + 1)]
+    else:
+        material_codes = []
+        for name, spec in zip(items.names, items.specs):
+            match = material_index.lookup(name, spec)
+            if match is None:
+                log.warning(f"未找到物料编码: {name} {spec}")
+                material_codes.append("")
+            else:
+                if not match.exact:
+                    log.info(f"模糊匹配物料: {name} {spec} -> {match.code} {match.name} {match.specification} "
+                          f"(相似度 {match.score:.2f})")
+                material_codes.append(match.code)
+
+    batch_number = f"BATCH{datetime.now().strftime('%Y%m%d')}"
+    production_date = datetime.now().strftime('%Y-%m-%d')
+    units = [unit.upper() if unit in ["套", "个"] else "PCS" for unit in items.units]
+    structured_data["items"] = [
+        {
             "lineNumber": idx,
-            "materialCode": f"MAT{idx:04d}",  # 模拟物料编码
-            "materialName": item["name"],
-            "specification": item.get("specification", ""),
-            "quantity": float(item["quantity"]),
-            "unit": item["unit"].upper() if item["unit"] in ["套", "个"] else "PCS",
-            "unitPrice": float(item["unitPrice"]),
-            "totalPrice": float(item["totalPrice"]),
-            "batchNumber": f"BATCH{datetime.now().strftime('%Y%m%d')}",
-            "productionDate": datetime.now().strftime('%Y-%m-%d'),
+            "materialCode": material_code,
+            "materialName": name,
+            "specification": spec,
+            "quantity": quantity,
+            "unit": unit,
+            "unitPrice": unit_price,
+            "totalPrice": total_price,
+            "batchNumber": batch_number,
+            "productionDate": production_date,
             "expiryDate": "2026-12-31",
             "storageLocation": f"A-{idx:02d}-01"
         }
-        structured_data["items"].append(processed_item)
-        print(f"[INFO] 处理物料 {idx}/{len(raw_data['items'])}: {item['name']} - {item['quantity']}{item['unit']}")
-        time.sleep(0.4)
+        for idx, material_code, name, spec, quantity, unit, unit_price, total_price in zip(
+            range(1, len(items) + 1), material_codes, items.names, items.specs, items.quantities(), units,
+            ItemColumns.money(items.unit_price), ItemColumns.money(item_totals))
+    ]
 
     # 计算汇总信息
-    structured_data["summary"]["totalItems"] = len(structured_data["items"])
-    structured_data["summary"]["totalQuantity"] = sum(item["quantity"] for item in structured_data["items"])
-    structured_data["summary"]["totalAmount"] = sum(item["totalPrice"] for item in structured_data["items"])
+    structured_data["summary"]["totalItems"] = len(items)
+    structured_data["summary"]["totalQuantity"] = float(items.total_quantity())
+    structured_data["summary"]["totalAmount"] = float(items.total_amount(item_totals))
+    structured_data["summary"]["amountMismatches"] = len(mismatches)
 
-    print(f"[SUCCESS] 数据处理完成！")
-    print(f"[INFO] 处理了 {structured_data['summary']['totalItems']} 个物料条目")
-    print(f"[INFO] 总数量: {structured_data['summary']['totalQuantity']}")
-    print(f"[INFO] 总金额: ¥{structured_data['summary']['totalAmount']:,.2f}")
+    log.success(f"数据处理完成！")
+    log.info(f"处理了 {structured_data['summary']['totalItems']} 个物料条目")
+    log.info(f"总数量: {structured_data['summary']['totalQuantity']}")
+    log.info(f"总金额: ¥{structured_data['summary']['totalAmount']:,.2f}")
 
-    print("\n[DEBUG] 结构化数据:")
-    print(json.dumps(structured_data, ensure_ascii=False, indent=2))
+    log.text()
+    log.debug("结构化数据:", data=structured_data)
+    handoff.emit('structured', structured_data)
 
     return structured_data
 
 
+def build_skip_report(structured_data, receipt_number, status, remarks):
+    """未执行填报的单据（重复或待复核）的执行报告"""
+    return {
+        "executionId": f"EXEC_{int(time.time())}",
+        "executionTime": datetime.now().isoformat(),
+        "sourceDocument": structured_data['header']['documentNumber'],
+        "supplierName": structured_data['header']['supplierName'],
+        "receiptNumber": receipt_number,
+        "itemsProcessed": 0,
+        "totalAmount": structured_data['summary']['totalAmount'],
+        "currency": "CNY",
+        "status": status,
+        "operator": "RPA_AUTO_SYSTEM",
+        "remarks": remarks
+    }
+
+
 def step3_auto_fill_system(structured_data):
     """步骤3: 自动填报到系统"""
-    print("\n" + "=" * 60)
-    print("步骤3: 执行自动填报")
-    print("=" * 60)
+    log.set_step('fill')
+    log.text("\n" + "=" * 60)
+    log.text("步骤3: 执行自动填报")
+    log.text("=" * 60)
 
     system_url = "https://erp.company.com/receiving"
-
-    print(f"[INFO] 正在连接到目标系统: {system_url}")
+    document_number = structured_data['header']['documentNumber']
+
+    # 填报前查询幂等索引，已填报的单据不再重复填报
+    idempotency = default_idempotency_index()
+    decision = idempotency.check(structured_data)
+    if decision.status == DUPLICATE:
+        log.info(f"单据 {document_number} 已填报（收货单号: {decision.receipt_number}），跳过")
+        return build_skip_report(structured_data, decision.receipt_number, "SKIPPED_DUPLICATE", "单据已填报，跳过")
+    if decision.status == CHANGED:
+        log.warning(f"单据 {document_number} 已填报（收货单号: {decision.receipt_number}），"
+              f"但内容已变化，需要人工复核")
+        return build_skip_report(structured_data, decision.receipt_number, "REVIEW_REQUIRED", "单据内容变化，待人工复核")
+
+    log.info(f"正在连接到目标系统: {system_url}")
     time.sleep(1.5)
 
-    print("[INFO] 正在登录系统...")
-    print("[INFO] 用户名: auto_user")
+    log.info("正在登录系统...")
+    log.info("用户名: auto_user")
     time.sleep(1)
 
-    print("[SUCCESS] 系统登录成功")
+    log.success("系统登录成功")
 
-    print("[INFO] 正在打开收货单界面...")
+    log.info("正在打开收货单界面...")
     time.sleep(1)
 
-    print("[INFO] 正在填写表头信息...")
+    log.info("正在填写表头信息...")
     header_fields = [
         f"单据类型: {structured_data['header']['documentType']}",
         f"单据编号: {structured_data['header']['documentNumber']}",
@@ -206,27 +312,31 @@ def step3_auto_fill_system(structured_data):
     ]
 
     for field in header_fields:
-        print(f"[INFO] 填写字段: {field}")
+        log.info(f"填写字段: {field}")
         time.sleep(0.5)
 
-    print("[SUCCESS] 表头信息填写完成")
+    log.success("表头信息填写完成")
 
     # 填写物料明细
-    print(f"\n[INFO] 正在填写物料明细 ({len(structured_data['items'])} 行)...")
+    log.text()
+    log.info(f"正在填写物料明细 ({len(structured_data['items'])} 行)...")
+    total_lines = len(structured_data["items"])
     for item in structured_data["items"]:
-        print(f"[INFO] 第 {item['lineNumber']} 行:")
-        print(f"       - 物料: {item['materialCode']} - {item['materialName']}")
-        print(f"       - 数量: {item['quantity']} {item['unit']}")
-        print(f"       - 单价: ¥{item['unitPrice']:,.2f}")
-        print(f"       - 金额: ¥{item['totalPrice']:,.2f}")
-        print(f"       - 批号: {item['batchNumber']}")
-        print(f"       - 库位: {item['storageLocation']}")
+        log.info(f"第 {item['lineNumber']} 行:", progress=(item['lineNumber'], total_lines),
+                 materialCode=item['materialCode'], quantity=item['quantity'])
+        log.text(f"       - 物料: {item['materialCode']} - {item['materialName']}")
+        log.text(f"       - 数量: {item['quantity']} {item['unit']}")
+        log.text(f"       - 单价: ¥{item['unitPrice']:,.2f}")
+        log.text(f"       - 金额: ¥{item['totalPrice']:,.2f}")
+        log.text(f"       - 批号: {item['batchNumber']}")
+        log.text(f"       - 库位: {item['storageLocation']}")
         time.sleep(1)
 
-    print("[SUCCESS] 物料明细填写完成")
+    log.success("物料明细填写完成")
 
     # 数据验证
-    print("\n[INFO] 正在验证填报数据...")
+    log.text()
+    log.info("正在验证填报数据...")
     verification_checks = [
         "检查必填字段完整性",
         "验证数值计算准确性",
@@ -236,27 +346,31 @@ def step3_auto_fill_system(structured_data):
     ]
 
     for check in verification_checks:
-        print(f"[INFO] {check}...")
+        log.info(f"{check}...")
         time.sleep(0.4)
 
-    print("[SUCCESS] 数据验证通过")
+    log.success("数据验证通过")
 
     # 提交单据
-    print("\n[INFO] 正在提交收货单...")
+    log.text()
+    log.info("正在提交收货单...")
     time.sleep(1.5)
 
     receipt_number = f"GR{datetime.now().strftime('%Y%m%d')}00156"
-    print(f"[SUCCESS] 收货单提交成功！")
-    print(f"[SUCCESS] 系统单号: {receipt_number}")
+    idempotency.record(decision, receipt_number)
+    log.success(f"收货单提交成功！")
+    log.success(f"系统单号: {receipt_number}")
 
     # 生成执行报告
-    print("\n[INFO] 正在生成执行报告...")
+    log.text()
+    log.info("正在生成执行报告...")
     time.sleep(0.8)
 
     execution_report = {
         "executionId": f"EXEC_{int(time.time())}",
         "executionTime": datetime.now().isoformat(),
         "sourceDocument": structured_data['header']['documentNumber'],
+        "supplierName": structured_data['header']['supplierName'],
         "receiptNumber": receipt_number,
         "itemsProcessed": len(structured_data['items']),
         "totalAmount": structured_data['summary']['totalAmount'],
@@ -267,22 +381,139 @@ def step3_auto_fill_system(structured_data):
         "remarks": "自动化流程执行成功"
     }
 
-    print("\n" + "=" * 60)
-    print("执行报告")
-    print("=" * 60)
-    print(json.dumps(execution_report, ensure_ascii=False, indent=2))
+    log.text("\n" + "=" * 60)
+    log.result("执行报告\n" + "=" * 60, execution_report)
 
     return execution_report
 
 
+def record_report(history, run_id, report, duration_ms=None):
+    """把单据的执行报告写入执行历史"""
+    status = report['status']
+    history.record_outcome(
+        HISTORY_SOURCE, status, run_id=run_id, apply_no=report['sourceDocument'],
+        supplier=report.get('supplierName'), error_type=None if status == SUCCESS else status,
+        order_number=report['receiptNumber'], duration_ms=duration_ms)
+
+
+def run_pipeline(args):
+    """
+    批量处理多个单据：扫描、清理、填报三个阶段以有界队列相连并行执行，
+    第 N+1 个单据的扫描和清理与第 N 个单据的填报同时进行。
+    """
+    structured = []
+
+    def clean(raw_data):
+        structured_data = step2_clean_and_structure_data(raw_data)
+        structured.append(structured_data)
+        return structured_data
+
+    stages = [
+        Stage("扫描识别", lambda sequence: step1_scan_document(sequence=sequence),
+              workers=args.scan_workers, queue_size=args.queue_size),
+        Stage("清理结构化", clean, workers=args.clean_workers, queue_size=args.queue_size),
+    ]
+    submit_url = args.submit_url
+    # 配置了目标系统地址（或 --stub）时，清理完成的单据在流水线结束后一次并发提交
+    submit_async = bool(submit_url or args.stub)
+    if not submit_async:
+        stages.append(Stage("自动填报", step3_auto_fill_system,
+                            workers=args.fill_workers, queue_size=args.queue_size))
+    pipeline = Pipeline(stages)
+    run_id = new_run_id()
+    with HistoryWriter() as history:
+        try:
+            reports = pipeline.run(range(1, args.documents + 1))
+        finally:
+            # 清理完成的单据一个事务计入按日汇总，同一单据重复处理时不重复计数
+            default_aggregate_store().upsert_many(structured)
+        if submit_async:
+            reports = submit_structured(reports, submit_url, args)
+        for report in reports:
+            record_report(history, run_id, report)
+        for error in pipeline.errors:
+            history.record_outcome(HISTORY_SOURCE, FAILED, run_id=run_id, error_type=type(error.error).__name__)
+        history.record_run(run_id, HISTORY_SOURCE, SUCCESS if not pipeline.errors else FAILED,
+                           duration_ms=int(pipeline.elapsed * 1000),
+                           payload={"reports": reports, "stages": pipeline.report()})
+
+    log.set_step('summary')
+    log.text("\n" + "=" * 60)
+    log.text("流水线执行完成")
+    log.text("=" * 60)
+    log.info(f"总耗时: {pipeline.elapsed:.2f} 秒")
+    log.info(f"成功: {len(reports)} 个单据，失败: {len(pipeline.errors)} 个单据")
+    for stage in pipeline.report():
+        log.info(f"阶段 {stage['stage']} (并发 {stage['workers']}): "
+              f"完成 {stage['processed']}，失败 {stage['errors']}，"
+              f"吞吐量 {stage['throughput'] * 60:.1f} 个/分钟，利用率 {stage['utilization']:.0%}，"
+              f"队列深度 平均 {stage['avgQueueDepth']:.1f} / 最大 {stage['maxQueueDepth']}")
+    for error in pipeline.errors:
+        log.error(f"第 {error.sequence + 1} 个单据在阶段 {error.stage} 失败: {error.error}")
+
+    return 0 if not pipeline.errors else 1
+
+
+def submit_structured(documents, url, args):
+    """结构化单据一次并发提交到目标系统（--stub 时提交到本地模拟服务）"""
+    from receiving.submitter import submit_documents, log_stats
+
+    log.set_step('submit')
+    stub = None
+    if args.stub:
+        from receiving.stub_server import StubServer
+        stub = StubServer().start_in_thread()
+        url = stub.url
+    log.info(f"正在提交 {len(documents)} 张单据到 {url}（并发 {args.concurrency}）")
+    try:
+        reports, stats = submit_documents(url, documents, concurrency=args.concurrency,
+                                          index=default_idempotency_index())
+    finally:
+        if stub is not None:
+            stub.stop()
+    log_stats(stats)
+    return reports
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="收发货自动化流程演示")
+    parser.add_argument('--documents', type=int, default=1,
+                        help="处理的单据数，大于 1 时以流水线方式并行执行各阶段")
+    parser.add_argument('--scan-workers', type=int, default=1, help="扫描识别阶段并发数")
+    parser.add_argument('--clean-workers', type=int, default=1, help="清理结构化阶段并发数")
+    parser.add_argument('--fill-workers', type=int, default=1, help="自动填报阶段并发数")
+    parser.add_argument('--queue-size', type=int, default=2, help="阶段之间的队列容量")
+    parser.add_argument('--submit-url', default=os.environ.get('RECEIVING_URL'),
+                        help="目标系统地址（默认取 RECEIVING_URL），设置后清理完成的单据并发提交，代替逐字段填报")
+    parser.add_argument('--stub', action='store_true', help="提交到本地模拟服务（receiving.stub_server）")
+    parser.add_argument('--concurrency', type=int, default=16, help="提交的并发请求数")
+    return parser.parse_args(argv)
+
+
+def use_script_state_dir():
+    """
+    幂等索引、按日汇总（RECEIVING_DB）和执行历史（RPA_HISTORY_DB）未配置时，
+    数据库放在脚本所在目录，而不是宿主程序启动脚本时的当前目录。
+    """
+    os.environ.setdefault('RECEIVING_DB', os.path.join(STATE_DIR, 'receiving.db'))
+    os.environ.setdefault('RPA_HISTORY_DB', os.path.join(STATE_DIR, 'execution_history.db'))
+
+
 def main():
     """主函数：执行完整的收发货自动化流程"""
-    print("\n" + "#" * 60)
-    print("# 收发货自动化流程演示")
-    print("# 流程: 扫描纸张 -> 数据清理 -> 执行填报")
-    print("#" * 60 + "\n")
+    use_script_state_dir()
+    args = parse_args()
+    if args.documents > 1 or args.submit_url or args.stub:
+        return run_pipeline(args)
+
+    log.text("\n" + "#" * 60)
+    log.text("# 收发货自动化流程演示")
+    log.text("# 流程: 扫描纸张 -> 数据清理 -> 执行填报")
+    log.text("#" * 60 + "\n")
 
     start_time = time.time()
+    run_id = new_run_id()
+    history = HistoryWriter()
 
     try:
         # 步骤1: 扫描和OCR识别
@@ -290,30 +521,42 @@ def main():
 
         # 步骤2: 数据清理和结构化
         structured_data = step2_clean_and_structure_data(ocr_data)
+        # 计入按日汇总，同一单据重复处理时不重复计数
+        default_aggregate_store().upsert(structured_data)
 
         # 步骤3: 自动填报
         report = step3_auto_fill_system(structured_data)
 
         # 总结
         elapsed_time = time.time() - start_time
-
-        print("\n" + "=" * 60)
-        print("流程执行完成")
-        print("=" * 60)
-        print(f"[SUCCESS] 所有步骤执行成功！")
-        print(f"[INFO] 总耗时: {elapsed_time:.2f} 秒")
-        print(f"[INFO] 收货单号: {report['receiptNumber']}")
-        print(f"[INFO] 处理物料: {report['itemsProcessed']} 项")
-        print(f"[INFO] 金额总计: ¥{report['totalAmount']:,.2f}")
+        record_report(history, run_id, report, int(elapsed_time * 1000))
+        history.record_run(run_id, HISTORY_SOURCE, report['status'], int(elapsed_time * 1000), report)
+
+        log.set_step('summary')
+        log.text("\n" + "=" * 60)
+        log.text("流程执行完成")
+        log.text("=" * 60)
+        log.success(f"所有步骤执行成功！")
+        log.info(f"总耗时: {elapsed_time:.2f} 秒")
+        log.info(f"收货单号: {report['receiptNumber']}")
+        log.info(f"处理物料: {report['itemsProcessed']} 项")
+        log.info(f"金额总计: ¥{report['totalAmount']:,.2f}")
 
         return 0
 
     except Exception as e:
-        print(f"\n[ERROR] 流程执行失败: {str(e)}")
+        log.text()
+        log.error(f"流程执行失败: {str(e)}", error_type=type(e).__name__)
         import traceback
         traceback.print_exc()
+        duration_ms = int((time.time() - start_time) * 1000)
+        history.record_outcome(HISTORY_SOURCE, FAILED, run_id=run_id, error_type=type(e).__name__,
+                               duration_ms=duration_ms)
+        history.record_run(run_id, HISTORY_SOURCE, FAILED, duration_ms, {"error": str(e)})
         return 1
+    finally:
+        history.close()
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(profiling.run(HISTORY_SOURCE, main))
@@ -0,0 +1,18 @@
+"""
+examples/ 下 Python 模块的测试
+
+模块按脚本的方式导入（与各入口脚本一致）:
+    examples/           receiving、common、benchmarks
+    examples/desktop/   sap、excel、utils
+    test_scripts/       data_processor
+"""
+
+import os
+import sys
+
+EXAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (os.path.join(EXAMPLES, os.pardir, 'test_scripts'), os.path.join(EXAMPLES, 'desktop'), EXAMPLES):
+    path = os.path.normpath(path)
+    if path not in sys.path:
+        sys.path.insert(0, path)
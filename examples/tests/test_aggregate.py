@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from receiving.aggregate import AggregateStore, ADDED, UNCHANGED, REPLACED, contribution, load
+
+
+def _structured(number="SH20241021001", day="2024-10-21", supplier="上海电力设备有限公司", items=None):
+    return {
+        "header": {"documentNumber": number, "transactionDate": day, "supplierName": supplier},
+        "items": items if items is not None else [
+            {"materialCode": "MAT0001", "materialName": "变压器配件", "quantity": 5, "unitPrice": 12500.0,
+             "totalPrice": 62500.0},
+            {"materialName": "绝缘子", "quantity": 100, "unitPrice": 85.5, "totalPrice": 8550.0},
+        ],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AggregateStore(str(tmp_path / "receiving.db"))
+    yield store
+    store.close()
+
+
+def test_contribution_merges_lines_by_material():
+    item = contribution(_structured(items=[
+        {"materialName": "绝缘子", "quantity": 1.5, "unitPrice": 0.1},
+        {"materialName": "绝缘子", "quantity": 2, "unitPrice": 0.1, "totalPrice": 0.2},
+    ]))
+    assert (item.day, item.supplier) == ("2024-10-21", "上海电力设备有限公司")
+    # 没有 totalPrice 时按单价 × 数量计算（分）
+    assert item.lines == [["绝缘子", 2, 3500, 35]]
+
+
+def test_upsert_is_idempotent(store):
+    assert store.upsert(_structured()) == ADDED
+    assert store.upsert(_structured()) == UNCHANGED
+    assert store.upsert_many([_structured(), _structured()]) == [UNCHANGED, UNCHANGED]
+    assert len(store) == 1
+    assert store.report() == [{"supplier": "上海电力设备有限公司", "documents": 1, "lines": 2,
+                               "quantity": 105.0, "amount": 71050.0}]
+
+
+def test_replace_subtracts_previous_content(store):
+    store.upsert(_structured())
+    changed = _structured(day="2024-10-22", items=[{"materialName": "绝缘子", "quantity": 40, "totalPrice": 3420.0}])
+    assert store.upsert(changed) == REPLACED
+    # 原日期的汇总行减到零后删除
+    assert store.report(by="day") == [{"day": "2024-10-22", "documents": 1, "lines": 1,
+                                       "quantity": 40.0, "amount": 3420.0}]
+    assert store.report(by="material") == [{"material": "绝缘子", "documents": 1, "lines": 1,
+                                            "quantity": 40.0, "amount": 3420.0}]
+
+
+def test_same_document_twice_in_one_batch(store):
+    first = _structured()
+    second = _structured(items=[{"materialName": "绝缘子", "quantity": 1, "totalPrice": 85.5}])
+    assert store.upsert_many([first, second]) == [ADDED, REPLACED]
+    assert store.report()[0]["quantity"] == 1.0 and store.report()[0]["documents"] == 1
+
+
+def test_remove(store):
+    store.upsert(_structured())
+    assert store.remove("SH20241021001")
+    assert not store.remove("SH20241021001")
+    assert store.report() == [] and store.report(by="material") == [] and len(store) == 0
+
+
+def test_report_filters_and_ordering(store):
+    store.upsert_many([
+        _structured("A1", "2024-10-01", "甲"),
+        _structured("A2", "2024-10-05", "乙", [{"materialName": "绝缘子", "quantity": 300, "totalPrice": 1.0}]),
+        _structured("A3", "2024-11-01", "甲"),
+    ])
+    assert [row["supplier"] for row in store.report()] == ["乙", "甲"]
+    assert [row["day"] for row in store.report(by="day")] == ["2024-10-01", "2024-10-05", "2024-11-01"]
+    october = store.report(start="2024-10-01", end="2024-10-31", supplier="甲")
+    assert october == [{"supplier": "甲", "documents": 1, "lines": 2, "quantity": 105.0, "amount": 71050.0}]
+    # 指定物料时从物料明细表统计
+    assert store.report(material="绝缘子") == [
+        {"supplier": "乙", "documents": 1, "lines": 1, "quantity": 300.0, "amount": 1.0},
+        {"supplier": "甲", "documents": 2, "lines": 2, "quantity": 200.0, "amount": 17100.0},
+    ]
+    rows = store.report(by="supplier_material", supplier="甲")
+    assert [(row["supplier"], row["material"]) for row in rows] == [("甲", "绝缘子"), ("甲", "MAT0001")]
+
+
+def test_load_jsonl_and_persistence(tmp_path):
+    path = tmp_path / "processed.jsonl"
+    path.write_text("\n".join(json.dumps(_structured(f"B{n}"), ensure_ascii=False) for n in range(3)) + "\n",
+                    encoding="utf-8")
+    db = str(tmp_path / "receiving.db")
+    store = AggregateStore(db)
+    assert load(store, [str(path)], chunk_size=2) == {ADDED: 3, UNCHANGED: 0, REPLACED: 0}
+    store.close()
+    store = AggregateStore(db)
+    assert load(store, [str(path)]) == {ADDED: 0, UNCHANGED: 3, REPLACED: 0}
+    assert store.report()[0]["documents"] == 3
+    store.close()
+
+
+def test_line_total_change_is_replaced(store):
+    document = _structured(items=[{"materialName": "绝缘子", "quantity": 1, "unitPrice": 50.0, "totalPrice": 50.0}])
+    assert store.upsert(document) == ADDED
+    document["items"][0]["totalPrice"] = 55.0
+    assert store.upsert(document) == REPLACED
+    assert store.report()[0]["amount"] == 55.0
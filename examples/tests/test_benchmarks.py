@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks import generators
+from benchmarks.run import compare
+
+
+@pytest.mark.parametrize("text, rows", [("5000", 5000), ("1k", 1000), ("100K", 100000), ("1m", 1000000)])
+def test_parse_and_format_size(text, rows):
+    assert generators.parse_size(text) == rows
+    assert generators.parse_size(generators.format_size(rows)) == rows
+
+
+def test_generators_are_deterministic():
+    first = generators.purchase_requests(200)
+    second = generators.purchase_requests(200)
+    assert len(first) == 200
+    assert first.equals(second)
+    assert generators.ocr_documents(5) == generators.ocr_documents(5)
+
+
+def result(seconds, peak_mb):
+    return {"seconds": seconds, "peak_mb": peak_mb}
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"results": {"a[1k]": result(1.0, 10.0), "b[1k]": result(0.001, 0.1),
+                            "c[1k]": result(1.0, 10.0), "gone[1k]": result(1.0, 1.0)}}
+    current = {"results": {"a[1k]": result(1.5, 10.0), "b[1k]": result(0.003, 0.5),
+                           "c[1k]": result(1.1, 20.0), "new[1k]": result(1.0, 1.0)}}
+    rows = {row[0]: row[5] for row in compare(current, baseline)}
+    assert set(rows) == {"a[1k]", "b[1k]", "c[1k]"}
+    assert rows["a[1k]"] == ["耗时 +50%"]
+    assert rows["b[1k]"] == []
+    assert rows["c[1k]"] == ["内存 +100%"]
@@ -0,0 +1,60 @@
+import io
+import json
+
+import data_processor as dp
+
+
+def _document(number, items=None):
+    return {
+        "documentType": "收货单",
+        "documentNumber": number,
+        "date": "2024-10-31",
+        "supplier": "上海电力设备有限公司",
+        "items": items if items is not None else [
+            {"name": "绝缘子", "quantity": 100, "unit": "个", "price": 85.50},
+            {"name": "电缆终端头", "quantity": 20, "unit": "个", "price": 320.00},
+        ],
+    }
+
+
+def test_chunked_keeps_order_and_remainder():
+    assert list(dp.chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(dp.chunked([], 3)) == []
+
+
+def test_iter_documents_skips_blank_lines_and_keeps_line_numbers():
+    stream = io.StringIO('{"a": 1}\n\n  \n{"b": 2}\n')
+    assert list(dp.iter_documents(stream)) == [(1, '{"a": 1}'), (4, '{"b": 2}')]
+
+
+def test_run_batch_writes_records_in_order_and_rejects_malformed_lines():
+    lines = [json.dumps(_document(f"SH{20241031000 + i}"), ensure_ascii=False) for i in range(10)]
+    lines.insert(3, '{not json')
+    lines.insert(6, '[1, 2]')
+    lines.insert(8, json.dumps({"documentNumber": "X"}))
+    source = io.StringIO("\n".join(lines) + "\n")
+    sink, rejects = io.StringIO(), io.StringIO()
+
+    stats = dp.run_batch(source, sink, rejects, workers=1, chunk_size=4)
+
+    records = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert [r["header"]["documentNumber"] for r in records] == [f"SH{20241031000 + i}" for i in range(10)]
+    assert records[0]["summary"] == {"totalItems": 2, "totalQuantity": 120.0, "totalAmount": 14950.0}
+    rejected = [json.loads(line) for line in rejects.getvalue().splitlines()]
+    assert [r["line"] for r in rejected] == [4, 7, 9]
+    assert rejected[0]["raw"] == '{not json'
+    assert rejected[1]["error"].startswith("ValueError")
+    assert stats["documents"] == 13
+    assert stats["rejected"] == 3
+
+
+def test_run_batch_with_process_pool_matches_in_process_result():
+    text = "\n".join(json.dumps(_document(f"SH{20241031000 + i}"), ensure_ascii=False) for i in range(20)) + "\n"
+    results = []
+    for workers in (1, 2):
+        sink, rejects = io.StringIO(), io.StringIO()
+        dp.run_batch(io.StringIO(text), sink, rejects, workers=workers, chunk_size=3)
+        records = [json.loads(line) for line in sink.getvalue().splitlines()]
+        results.append([(r["header"]["documentNumber"], r["items"], r["summary"]) for r in records])
+        assert rejects.getvalue() == ""
+    assert results[0] == results[1]
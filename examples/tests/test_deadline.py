@@ -0,0 +1,138 @@
+import pytest
+
+from sap.table import Table
+from utils import deadline
+from utils.deadline import Budget, CircuitBreaker, DeadlineExceeded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_phases():
+    assert deadline.parse_phases(" query=30, save=60.5 ,") == {"query": 30.0, "save": 60.5}
+    assert deadline.parse_phases(None) == {}
+
+
+def test_total_and_phase_limits():
+    clock = Clock()
+    budget = Budget(total=10, phases={"query": 3}, clock=clock).start()
+    clock.now += 2
+    budget.enter("query")
+    assert budget.remaining() == 3
+    clock.now += 2.5
+    assert budget.clamp(5) == 0.5
+    clock.now += 1
+    with pytest.raises(DeadlineExceeded) as raised:
+        budget.check()
+    error = raised.value
+    assert (error.phase, error.limit, error.elapsed) == ("query", 3, 5.5)
+    assert error.timings == {"start": 2, "query": 3.5}
+
+    budget.enter("save")
+    assert budget.remaining() == pytest.approx(4.5)
+    clock.now += 5
+    with pytest.raises(DeadlineExceeded) as raised:
+        budget.check()
+    assert raised.value.limit == 10
+
+
+def test_unlimited_budget_never_raises():
+    clock = Clock()
+    budget = Budget(clock=clock).start()
+    clock.now += 1e6
+    budget.check()
+    assert budget.clamp(2.0) == 2.0 and budget.remaining() is None
+
+
+def test_module_helpers_follow_active_budget(monkeypatch):
+    assert deadline.current() is None
+    assert deadline.clamp(1.5) == 1.5
+    session = object()
+    assert deadline.guard(session) is session
+    clock = Clock()
+    with Budget(total=1, clock=clock).active() as budget:
+        assert deadline.current() is budget
+        guarded = deadline.guard(session)
+        assert isinstance(guarded, deadline.GuardedSession) and deadline.guard(guarded) is guarded
+        deadline.enter("save")
+        clock.now += 2
+        with pytest.raises(DeadlineExceeded):
+            deadline.sleep(5)
+    assert deadline.current() is None
+    assert budget.timings == {"start": 0, "save": 2}
+
+
+def test_deadline_is_not_swallowed_by_exception_handlers():
+    class Session:
+        def findById(self, element_id):
+            return "wnd"
+
+    clock = Clock()
+    with Budget(total=1, clock=clock).active():
+        session = deadline.guard(Session())
+        assert session.findById("wnd[0]") == "wnd"
+        clock.now += 1
+        with pytest.raises(DeadlineExceeded):
+            try:
+                session.findById("wnd[1]")
+            except Exception:
+                pytest.fail("DeadlineExceeded 被 except Exception 拦住")
+
+
+def test_table_fill_on_error_does_not_see_deadline():
+    class Control:
+        RowCount = 2
+        VisibleRowCount = 2
+
+        class verticalScrollbar:
+            position = 0
+
+        def GetCell(self, row, column):
+            deadline.check()
+            raise AssertionError("预算用完后不应再写单元格")
+
+    class Session:
+        def findById(self, element_id):
+            return Control()
+
+    clock = Clock()
+    seen = []
+    with Budget(total=1, clock=clock).active():
+        clock.now += 1
+        with pytest.raises(DeadlineExceeded):
+            Table(Session(), lambda: 'tbl').fill(11, {0: 'RMB'}, on_error=lambda row, e: seen.append(row))
+    assert seen == []
+
+
+def test_breaker_trips_pauses_and_half_opens():
+    pauses = []
+    breaker = CircuitBreaker(threshold=3, pause=60, sleep=pauses.append)
+    assert [breaker.record(ok) for ok in (False, False, True, False, False, False)] == [
+        False, False, False, False, False, True]
+    assert breaker.trips == 1 and not breaker.stops
+    breaker.cool_down()
+    assert pauses == [60]
+    assert breaker.record(False)
+    breaker.cool_down()
+    assert not breaker.record(True) and breaker.failures == 0
+
+
+def test_breaker_disabled_and_stopping(monkeypatch):
+    assert not any(CircuitBreaker(threshold=0).record(False) for _ in range(10))
+    monkeypatch.setenv('SAP_BREAKER_FAILURES', '2')
+    monkeypatch.setenv('SAP_BREAKER_PAUSE', '0')
+    breaker = CircuitBreaker.from_env()
+    assert breaker.stops
+    assert [breaker.record(False) for _ in range(2)] == [False, True]
+
+
+def test_budget_from_env(monkeypatch):
+    monkeypatch.setenv('SAP_ORDER_BUDGET', '0')
+    monkeypatch.setenv('SAP_PHASE_BUDGETS', 'save=60')
+    budget = Budget.from_env()
+    assert budget.total is None and budget.phases == {"save": 60.0}
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import shipping_receiving_demo as demo
+
+
+@pytest.fixture
+def raw_document():
+    return {
+        "documentType": "收货单", "documentNumber": "SH20241021001", "date": "2024-10-21",
+        "supplier": "上海电力设备有限公司", "supplierCode": "SP001234",
+        "items": [
+            {"name": "变压器配件", "specification": "110KV级", "quantity": 5, "unit": "套",
+             "unitPrice": 12500.00, "totalPrice": 62500.00},
+            {"name": "绝缘子", "specification": "XWP-70", "quantity": 100, "unit": "个",
+             "unitPrice": 85.50, "totalPrice": 8550.00},
+        ],
+        "totalAmount": 71050.00,
+    }
+
+
+def test_state_databases_default_to_script_directory(tmp_path, monkeypatch):
+    # 先 setenv 再 delenv，测试结束后 monkeypatch 会撤销 use_script_state_dir 设置的变量
+    for variable in ("RECEIVING_DB", "RPA_HISTORY_DB"):
+        monkeypatch.setenv(variable, str(tmp_path / "unused.db"))
+        monkeypatch.delenv(variable)
+    monkeypatch.setattr(demo, "STATE_DIR", str(tmp_path))
+    demo.use_script_state_dir()
+    assert os.environ["RECEIVING_DB"] == str(tmp_path / "receiving.db")
+    assert os.environ["RPA_HISTORY_DB"] == str(tmp_path / "execution_history.db")
+
+
+def test_configured_state_databases_are_kept(monkeypatch):
+    monkeypatch.setenv("RECEIVING_DB", "/data/receiving.db")
+    monkeypatch.setenv("RPA_HISTORY_DB", "/data/history.db")
+    demo.use_script_state_dir()
+    assert os.environ["RECEIVING_DB"] == "/data/receiving.db"
+    assert os.environ["RPA_HISTORY_DB"] == "/data/history.db"
+
+
+def test_step2_keeps_declared_line_totals(monkeypatch, raw_document):
+    # 步骤2只做转换，不计入按日汇总
+    monkeypatch.setattr(demo, "default_aggregate_store", lambda: pytest.fail("步骤2不应写入汇总库"))
+    monkeypatch.setattr(demo, "default_index", lambda: None)
+    monkeypatch.setenv("RECEIVING_RULES", "")
+    structured = demo.step2_clean_and_structure_data(raw_document)
+    assert [item["totalPrice"] for item in structured["items"]] == [62500.0, 8550.0]
+    assert structured["summary"]["totalQuantity"] == 105.0
+    assert structured["summary"]["totalAmount"] == 71050.0
+    assert structured["summary"]["amountMismatches"] == 0
@@ -0,0 +1,87 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from utils.framediff import TileDiff
+
+
+def test_reduce_strides_and_grays():
+    tiles = TileDiff(step=2)
+    image = np.zeros((4, 6, 4), dtype=np.uint8)
+    image[..., :3] = 255
+    image[..., 3] = 0
+    reduced = tiles.reduce(image)
+    assert reduced.shape == (2, 3) and reduced.dtype == np.int16 and (reduced == 255).all()
+    gray = np.arange(16, dtype=np.uint8).reshape(4, 4)
+    assert tiles.reduce(gray).tolist() == [[0, 2], [8, 10]]
+
+
+def test_changed_marks_tiles_over_threshold():
+    tiles = TileDiff(step=1, tile=4, threshold=10)
+    previous = np.zeros((8, 10), dtype=np.int16)
+    current = previous.copy()
+    current[1, 1] = 10      # 不超过阈值
+    current[5, 9] = 200     # 最后一列只有半块，补零后参与比较
+    assert tiles.changed(previous, current).tolist() == [[False, False, False], [False, False, True]]
+    assert tiles.changed(None, current).all()
+    assert tiles.changed(np.zeros((4, 4), dtype=np.int16), current).shape == (2, 3)
+
+
+def test_region_bounds_changed_tiles_in_screen_pixels():
+    tiles = TileDiff(step=2, tile=4)
+    mask = np.zeros((3, 4), dtype=bool)
+    assert tiles.region(mask, (5, 5), (64, 48)) is None
+    mask[1, 1] = mask[1, 2] = True
+    assert tiles.region(mask, (3, 2), (64, 48)) == (5, 6, 22, 12)
+    mask[2, 3] = True
+    # 外扩不超出截图范围
+    assert tiles.region(mask, (10, 10), (40, 30)) == (0, 0, 40, 30)
+
+
+class _Frame:
+    size = (64, 48)
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+
+    def __array__(self, dtype=None, copy=None):
+        return self.pixels
+
+
+@pytest.fixture
+def guiutils(monkeypatch):
+    """以桩模块替换 pyautogui 和 PIL 后导入 utils.guiutils"""
+    pyautogui = types.ModuleType('pyautogui')
+    pil = types.ModuleType('PIL')
+    pil.Image = types.SimpleNamespace(open=None)
+    monkeypatch.setitem(sys.modules, 'pyautogui', pyautogui)
+    monkeypatch.setitem(sys.modules, 'PIL', pil)
+    sys.modules.pop('utils.guiutils', None)
+    import utils.guiutils as module
+    yield module
+    sys.modules.pop('utils.guiutils', None)
+
+
+def test_missing_image_waits_and_returns_none(guiutils, monkeypatch):
+    def missing(path):
+        raise FileNotFoundError(path)
+
+    shots = []
+    monkeypatch.setattr(guiutils.Image, 'open', missing)
+    monkeypatch.setattr(guiutils.pyautogui, 'screenshot', lambda: shots.append(1), raising=False)
+    assert guiutils.wait_and_locate_image('missing.png', timeout=0.05, interval=0.01) is None
+    assert shots == []
+
+
+def test_idle_screen_searches_once(guiutils, monkeypatch):
+    needle = types.SimpleNamespace(size=(8, 8), load=lambda: None)
+    searches = []
+    monkeypatch.setattr(guiutils.Image, 'open', lambda path: needle)
+    monkeypatch.setattr(guiutils.pyautogui, 'screenshot',
+                        lambda: _Frame(np.zeros((48, 64, 3), dtype=np.uint8)), raising=False)
+    monkeypatch.setattr(guiutils.pyautogui, 'locate',
+                        lambda *args, **kwargs: searches.append(args[1]), raising=False)
+    assert guiutils.wait_and_locate_image('target.png', timeout=0.05, interval=0.01) is None
+    assert len(searches) == 1
@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+
+from common import handoff
+from common.handoff import FRAME_HEADER, MAGIC, Record, read_records
+
+PAYLOAD = {"header": {"documentNumber": "SH20241031001"}, "items": [{"name": "绝缘子", "quantity": 100}]}
+
+
+@pytest.mark.parametrize("format", ["frames", "jsonl"])
+def test_round_trip_and_auto_detect(format):
+    stream = io.BytesIO()
+    writer = handoff.open_writer(stream, format, spill=0)
+    assert writer.write('structured', PAYLOAD) == 1
+    assert writer.write_encoded('record', b'{"a":1}') == 2
+    assert stream.getvalue().startswith(MAGIC) == (format == 'frames')
+    stream.seek(0)
+    assert list(read_records(stream)) == [Record('structured', PAYLOAD), Record('record', {"a": 1})]
+
+
+def test_frame_layout():
+    stream = io.BytesIO()
+    handoff.FrameWriter(stream, spill=0).write('类型', [1])
+    data = stream.getvalue()[len(MAGIC):]
+    tag = '类型'.encode('utf-8')
+    assert FRAME_HEADER.unpack(data[:FRAME_HEADER.size]) == (len(b'[1]'), handoff.JSON_FRAME, len(tag))
+    assert data[FRAME_HEADER.size:] == tag + b'[1]'
+
+
+def test_large_payload_spills_to_file(tmp_path):
+    stream = io.BytesIO()
+    writer = handoff.FrameWriter(stream, spill=64, spill_dir=str(tmp_path))
+    big = {"items": ["绝缘子"] * 100}
+    writer.write('structured', big)
+    writer.write('small', {"ok": True})
+    assert len(list(tmp_path.iterdir())) == 1
+    stream.seek(0)
+    assert list(read_records(stream, cleanup=False)) == [Record('structured', big), Record('small', {"ok": True})]
+    stream.seek(0)
+    list(read_records(stream))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_plain_jsonl_records_have_no_kind(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"documentNumber":"SH1"}\n\n{"kind":"x","data":2}\n[3]\n')
+    assert list(read_records(str(path))) == [Record(None, {"documentNumber": "SH1"}), Record('x', 2), Record(None, [3])]
+
+
+def test_truncated_frame_raises():
+    stream = io.BytesIO()
+    handoff.FrameWriter(stream, spill=0).write('structured', PAYLOAD)
+    with pytest.raises(EOFError):
+        list(read_records(io.BytesIO(stream.getvalue()[:-3])))
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        handoff.open_writer(io.BytesIO(), 'xml')
+
+
+def test_configured_channel_and_log_result(tmp_path, monkeypatch):
+    from common import log
+    monkeypatch.delenv('RPA_HANDOFF_FORMAT', raising=False)
+    target = tmp_path / "handoff.jsonl"
+    handoff.configure(str(target))
+    log.configure(events=str(tmp_path / "events.jsonl"), human='off')
+    try:
+        assert handoff.enabled()
+        assert handoff.emit('report', {"n": 1}) == 1
+        log.get_logger('test_handoff').result("结果:", PAYLOAD, step='process')
+        log.get_logger('test_handoff').flush()
+    finally:
+        handoff.configure('')
+        log.configure(events='', human='stdout')
+    assert not handoff.enabled() and handoff.emit('report', {}) is None
+    assert list(read_records(str(target))) == [Record('report', {"n": 1}), Record('process', PAYLOAD)]
+    events = [line for line in (tmp_path / "events.jsonl").read_text(encoding='utf-8').splitlines()]
+    assert '"handoff":2' in events[0] and 'SH20241031001' not in events[0]
+    assert sorted(os.listdir(tmp_path)) == ["events.jsonl", "handoff.jsonl"]
@@ -0,0 +1,100 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from common.history import (
+    HistoryStore, HistoryWriter, SUCCESS, FAILED, bucket_upper_bound, duration_bucket, split_periods,
+)
+
+
+def test_split_periods_uses_whole_months():
+    assert split_periods("2024-01-15", "2024-01-20") == ([("2024-01-15", "2024-01-20")], None)
+    assert split_periods("2024-01-01", "2024-03-31") == ([], ("2024-01", "2024-03"))
+    assert split_periods("2024-01-15", "2024-04-10") == (
+        [("2024-01-15", "2024-01-31"), ("2024-04-01", "2024-04-10")], ("2024-02", "2024-03"))
+    assert split_periods("2024-12-31", "2025-01-01") == ([("2024-12-31", "2025-01-01")], None)
+
+
+@pytest.mark.parametrize("duration", [0, 1, 250, 1234, 60000, 3600000])
+def test_duration_bucket_upper_bound_within_five_percent(duration):
+    upper = bucket_upper_bound(duration_bucket(duration))
+    assert upper >= duration
+    assert upper <= max(duration * 1.06, duration + 1)
+
+
+@pytest.fixture
+def history(tmp_path):
+    path = str(tmp_path / "history.db")
+    start = datetime(2024, 1, 20, 9)
+    with HistoryWriter(path, batch_size=50, flush_interval=0.05) as writer:
+        for n in range(90):
+            day = start + timedelta(days=n // 3)
+            supplier = "甲" if n % 3 else "乙"
+            failed = n % 10 == 0
+            writer.record_outcome("sap", FAILED if failed else SUCCESS, run_id="RUN", apply_no=1000 + n,
+                                  supplier=supplier, error_type="供应商不存在" if failed else None,
+                                  duration_ms=100 * (n + 1), recorded_at=day)
+        writer.record_run("RUN", "sap", SUCCESS, 1234, {"orders": 90}, started_at=start)
+    store = HistoryStore(path)
+    yield store
+    store.close()
+
+
+def test_rollups_match_detail_rows_across_month_boundaries(history):
+    rates = {supplier: (total, success) for supplier, total, success, _ in
+             history.success_rate_by_supplier("2024-01-20", "2024-02-18")}
+    assert rates == {"甲": (60, 54), "乙": (30, 27)}
+    partial = history.success_rate_by_supplier("2024-01-25", "2024-02-02", source="sap")
+    assert sum(total for _, total, _, _ in partial) == 27
+    assert history.success_rate_by_supplier("2024-01-20", "2024-02-18", source="other") == []
+    assert history.error_counts_by_type("2024-01-01", "2024-12-31") == [("供应商不存在", 9)]
+    daily = history.daily_counts("2024-01-20", "2024-01-21")
+    assert daily == [("2024-01-20", 3, 2), ("2024-01-21", 3, 3)]
+
+
+def test_duration_percentiles(history):
+    exact = history.duration_percentile("2024-01-01", "2024-12-31", 0.5, exact=True)
+    assert exact == 4600
+    approx = history.duration_percentile("2024-01-01", "2024-12-31", 0.5)
+    assert exact <= approx <= exact * 1.06
+    assert history.duration_percentile("2023-01-01", "2023-12-31") is None
+    assert history.duration_percentile("2024-01-01", "2024-12-31", 1.0, supplier="乙") >= 8800
+
+
+def test_outcomes_for_apply_no(history):
+    rows = history.outcomes_for_apply_no(1010)
+    assert len(rows) == 1
+    assert rows[0][1:4] == ("甲", FAILED, "供应商不存在")
+
+
+def test_write_failure_is_raised_from_close(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.db")
+    writes = []
+
+    def write(self, conn, batch):
+        writes.append(len(batch))
+        if len(writes) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        original(self, conn, batch)
+
+    original = HistoryWriter._write
+    monkeypatch.setattr(HistoryWriter, "_write", write)
+    writer = HistoryWriter(path, batch_size=2, flush_interval=10)
+    for n in range(4):
+        writer.record_outcome("sap", SUCCESS, apply_no=n, recorded_at=datetime(2024, 1, 1))
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        writer.close()
+    # 失败的一批被丢弃，之后的批次照常写入
+    assert writer.dropped == 2 and writes == [2, 2]
+    store = HistoryStore(path)
+    assert store.success_rate_by_supplier("2024-01-01", "2024-01-01") == [("", 2, 2, 1.0)]
+    store.close()
+
+
+def test_unopenable_database_is_raised_from_close(tmp_path):
+    writer = HistoryWriter(str(tmp_path), batch_size=1, flush_interval=0.01)
+    writer.record_outcome("sap", SUCCESS)
+    with pytest.raises(sqlite3.Error):
+        writer.close()
+    assert writer.dropped == 1 and writer._queue.empty()
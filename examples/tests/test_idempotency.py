@@ -0,0 +1,62 @@
+import copy
+
+import pytest
+
+from receiving.idempotency import IdempotencyIndex, content_hash, NEW, DUPLICATE, CHANGED
+
+
+def _structured(number="SH20241021001", quantity=5.0):
+    return {
+        "header": {"documentNumber": number, "transactionDate": "2024-10-21", "supplierName": "上海电力设备有限公司",
+                   "createdAt": "2024-10-21T10:00:00"},
+        "items": [{"materialCode": "MAT0001", "materialName": "变压器配件", "quantity": quantity, "unit": "套",
+                   "unitPrice": 12500.0, "batchNumber": "BATCH20241021"}],
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = IdempotencyIndex(str(tmp_path / "receiving.db"))
+    yield index
+    index.close()
+
+
+def test_content_hash_ignores_run_specific_fields():
+    first = _structured()
+    second = copy.deepcopy(first)
+    second["header"]["createdAt"] = "2025-01-01T00:00:00"
+    second["items"][0]["batchNumber"] = "BATCH20250101"
+    assert content_hash(first) == content_hash(second)
+    assert content_hash(first) != content_hash(_structured(quantity=6.0))
+
+
+def test_new_duplicate_and_changed(index):
+    decision = index.check(_structured())
+    assert decision.status == NEW and decision.receipt_number is None
+    index.record(decision, "GR001")
+    assert index.check(_structured()).status == DUPLICATE
+    assert index.check(_structured()).receipt_number == "GR001"
+    changed = index.check(_structured(quantity=6.0))
+    assert (changed.status, changed.receipt_number) == (CHANGED, "GR001")
+    index.record(changed, "GR002")
+    assert index.check(_structured(quantity=6.0)).status == DUPLICATE
+
+
+def test_check_many_matches_check_across_chunks(index):
+    for n in range(0, 10, 2):
+        document = _structured(f"SH2024102100{n}")
+        index.record(index.check(document), f"GR{n}")
+    documents = [_structured(f"SH2024102100{n}", quantity=5.0 if n != 4 else 7.0) for n in range(10)]
+    decisions = index.check_many(documents, chunk_size=3)
+    assert [d.status for d in decisions] == [index.check(d).status for d in documents]
+    assert [d.status for d in decisions][:5] == [DUPLICATE, NEW, DUPLICATE, NEW, CHANGED]
+
+
+def test_index_persists_across_connections(tmp_path):
+    path = str(tmp_path / "receiving.db")
+    first = IdempotencyIndex(path)
+    first.record(first.check(_structured()), "GR001")
+    first.close()
+    second = IdempotencyIndex(path)
+    assert second.check(_structured()).status == DUPLICATE
+    second.close()
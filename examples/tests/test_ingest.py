@@ -0,0 +1,77 @@
+import pandas as pd
+
+from excel.ExcelProcessor import ExcelProcessor
+from excel.ingest import SeenRows, new_rows, row_hashes
+
+
+def frame(rows):
+    return pd.DataFrame({
+        "采购申请号": [1000 + i // 2 for i in range(rows)],
+        "采购申请号行号": [10 * (i % 2 + 1) for i in range(rows)],
+        "供应商": ['甲'] * rows,
+        "物料编码": [f"M{i:04d}" for i in range(rows)],
+    })
+
+
+def test_row_hashes_ignore_output_columns_and_order():
+    df = frame(4)
+    written = df.assign(信息=['4500000001'] * 4)[list(reversed(df.columns)) + ['信息']]
+    written.insert(0, 'Unnamed: 0', range(4))
+    assert (row_hashes(df) == row_hashes(written)).all()
+
+
+def test_row_hashes_stable_when_ints_become_floats():
+    df = frame(2)
+    appended = pd.concat([df, pd.DataFrame({"采购申请号": [float("nan")]})], ignore_index=True)
+    assert (row_hashes(df) == row_hashes(appended)[:2]).all()
+
+
+def test_only_appended_rows_are_new(tmp_path):
+    seen = SeenRows(str(tmp_path / "ingest.db"))
+    df = frame(6)
+    fresh, hashes = new_rows(df, seen)
+    assert len(fresh) == 6
+    seen.mark(hashes, 'a.xlsx', status='SUCCESS')
+    fresh, _ = new_rows(frame(8), seen)
+    assert list(fresh.index) == [6, 7]
+    seen.close()
+
+
+def test_failed_rows_are_retried_until_success(tmp_path):
+    path = str(tmp_path / "ingest.db")
+    seen = SeenRows(path)
+    df = frame(4)
+    hashes = row_hashes(df)
+    seen.mark(hashes[:2], 'a.xlsx', '1000', 'SUCCESS')
+    seen.mark(hashes[2:], 'a.xlsx', '1001', 'FAILED')
+    assert list(new_rows(df, seen)[0].index) == [2, 3]
+    seen.close()
+
+    # 重启后失败的行仍待处理，成功后不再返回
+    seen = SeenRows(path)
+    assert len(seen) == 2
+    assert list(new_rows(df, seen)[0].index) == [2, 3]
+    seen.mark(hashes[2:], 'a.xlsx', '1001', 'SUCCESS')
+    assert new_rows(df, seen)[0].empty
+    seen.close()
+    assert new_rows(df, SeenRows(path))[0].empty
+
+
+def test_change_data_writes_affected_rows_once(tmp_path):
+    path = str(tmp_path / "申请.csv")
+    frame(6).to_csv(path, index=False)
+    processor = ExcelProcessor(path)
+    processor.read_data()
+    groups = processor.group_by_column('采购申请号')
+    processor.changeData(1000, groups[1000], 4500000001, save=False)
+    processor.changeData(1002, groups[1002], '公司信息不正确', save=False)
+    assert processor.df['信息'].tolist()[:2] == [4500000001, 4500000001]
+    assert pd.isna(processor.df['信息'][2])
+    assert processor.df['信息'].tolist()[4:] == ['公司信息不正确'] * 2
+    assert 'Unnamed: 0' not in pd.read_csv(path).columns
+
+    assert processor.save()
+    assert not processor.save()
+    written = pd.read_csv(path)
+    assert written['信息'].tolist()[:2] == ['4500000001', '4500000001']
+    assert (row_hashes(written) == row_hashes(frame(6))).all()
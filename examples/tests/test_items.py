@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+import numpy as np
+
+from receiving.items import ItemColumns, MISSING, to_scaled, QTY_SCALE, MONEY_SCALE
+
+
+def _items():
+    return [
+        {"name": "变压器配件", "quantity": 5, "unit": "套", "unitPrice": 12500.00, "totalPrice": 62500.00},
+        {"name": "绝缘子", "quantity": "100", "unit": "个", "unitPrice": 85.50, "totalPrice": 8550.00},
+        {"name": "电缆", "quantity": 0.285, "unit": "米", "unitPrice": 0.1, "totalPrice": 99.99},
+        {"name": "垫片", "quantity": 3, "unit": "个", "unitPrice": 0.335},
+    ]
+
+
+def test_to_scaled_rounds_half_up_without_float_error():
+    assert to_scaled(3, QTY_SCALE) == 3000
+    assert to_scaled(0.285, MONEY_SCALE) == 29
+    assert to_scaled("85.505", MONEY_SCALE) == 8551
+    assert to_scaled(Decimal("-0.005"), MONEY_SCALE) == -1
+
+
+def test_columns_are_int64_and_line_totals_are_exact():
+    items = ItemColumns.from_items(_items())
+    assert len(items) == 4
+    assert items.quantity.dtype == np.int64
+    assert items.quantity.tolist() == [5000, 100000, 285, 3000]
+    assert items.declared_total.tolist() == [6250000, 855000, 9999, MISSING]
+    # 0.285 × 0.10 = 0.0285 -> 0.03；3 × 0.34 = 1.02
+    assert items.line_totals().tolist() == [6250000, 855000, 3, 102]
+    assert items.total_quantity() == Decimal("108.285")
+    assert items.total_amount() == Decimal("71051.05")
+
+
+def test_declared_totals_are_kept_and_mismatches_reported():
+    items = ItemColumns.from_items(_items())
+    line_totals = items.line_totals()
+    assert items.amount_mismatches(line_totals) == [(2, 3, 9999)]
+    assert items.amount_mismatches(line_totals, tolerance=10000) == []
+    totals = items.declared_or_computed(line_totals)
+    assert totals.tolist() == [6250000, 855000, 9999, 102]
+    assert ItemColumns.money(totals) == [62500.0, 8550.0, 99.99, 1.02]
+    assert items.total_amount(totals) == Decimal("71151.01")
+
+
+def test_negative_line_totals_round_away_from_zero():
+    items = ItemColumns.from_items([{"name": "退货", "quantity": -1.5, "unit": "个", "unitPrice": 0.01}],
+                                   total_key=None)
+    assert items.line_totals().tolist() == [-2]
+    assert items.quantities() == [-1.5]
+
+
+def test_empty_document():
+    items = ItemColumns.from_items([])
+    assert len(items) == 0
+    assert items.line_totals().tolist() == []
+    assert items.total_amount() == Decimal("0.00")
+    assert items.amount_mismatches() == []
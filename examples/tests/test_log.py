@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+from common import log
+
+
+@pytest.fixture
+def events(tmp_path):
+    path = tmp_path / "events.jsonl"
+    log.configure(events=str(path), human='off', flush_interval=60)
+    yield path
+    log.configure(events='', human='stdout')
+
+
+def read_events(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_event_channel_buffers_until_size():
+    stream = io.BytesIO()
+    channel = log.EventChannel(stream, buffer_size=200, flush_interval=60)
+    channel.write({"level": "INFO", "msg": "短"})
+    assert stream.getvalue() == b''
+    channel.write({"level": "INFO", "data": "x" * 200})
+    lines = stream.getvalue().decode('utf-8').splitlines()
+    assert [json.loads(line)["level"] for line in lines] == ["INFO", "INFO"]
+    channel.close()
+
+
+def test_event_channel_flushes_on_interval():
+    stream = io.BytesIO()
+    channel = log.EventChannel(stream, buffer_size=1 << 20, flush_interval=0.01)
+    channel.write({"level": "INFO"})
+    channel._closed.wait(0.2)
+    assert stream.getvalue().endswith(b'\n')
+    channel.close()
+
+
+def test_logger_event_fields(events):
+    logger = log.get_logger('test_log')
+    logger.set_step('scan')
+    logger.info("扫描第 1 页", progress=(1, 3), page=1)
+    logger.event('PROGRESS', step='fill', progress=0.5)
+    logger.flush()
+    first, second = read_events(events)
+    assert first["level"] == "INFO" and first["logger"] == "test_log"
+    assert first["step"] == "scan"
+    assert first["msg"] == "扫描第 1 页"
+    assert first["progress"] == {"done": 1, "total": 3}
+    assert first["data"] == {"page": 1}
+    assert second["step"] == "fill" and second["progress"] == 0.5 and "msg" not in second
+
+
+def test_result_without_handoff_carries_payload(events):
+    logger = log.get_logger('test_log')
+    logger.result("\n结果:", {"a": 1}, step='output')
+    logger.flush()
+    (event,) = read_events(events)
+    assert event["level"] == "RESULT"
+    assert event["msg"] == "结果:"
+    assert event["data"] == {"result": {"a": 1}}
+
+
+def test_text_channel_off_skips_formatting(events, capsys):
+    logger = log.get_logger('test_log')
+    logger.debug("原始数据:", data={"big": list(range(10))})
+    logger.flush()
+    assert capsys.readouterr().out == ''
+    assert log.events_target() == str(events)
+    assert read_events(events)[0]["data"] == {"data": {"big": list(range(10))}}
@@ -0,0 +1,69 @@
+import pytest
+
+from receiving import material_index
+from receiving.material_index import MaterialIndex, build_index, normalize
+
+
+@pytest.fixture
+def numbered_index(tmp_path):
+    path = str(tmp_path / "material.idx")
+    build_index(((f"{100000 + i}", f"物料{i}号", f"XWP-{i * 100}") for i in range(3000)), path)
+    with MaterialIndex(path) as index:
+        yield index
+
+
+def test_normalize_ignores_width_case_and_separators():
+    assert normalize("绝缘子", "xwp－70") == normalize("绝缘子 ", "XWP 70") == "绝缘子|XWP70"
+
+
+def test_exact_lookup(numbered_index):
+    match = numbered_index.lookup("物料12号", "XWP 1200")
+    assert (match.code, match.exact, match.score) == ("100012", True, 1.0)
+    assert len(numbered_index) == 3000
+
+
+def test_fuzzy_lookup_prefers_closest_record(numbered_index):
+    match = numbered_index.lookup("物料12呺", "XWP-1200")
+    assert (match.code, match.name, match.exact) == ("100012", "物料12号", False)
+    # 二元组集合相同（1545 / 1554），按编辑相似度区分
+    match = numbered_index.lookup("物料1545呺", "XWP-154500")
+    assert match.code == "101545"
+
+
+def test_fuzzy_lookup_respects_threshold(numbered_index):
+    assert numbered_index.lookup("完全无关的名称", "ABC") is None
+
+
+def test_hash_collision_checks_stored_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(material_index, "key_hash", lambda key: 42)
+    path = str(tmp_path / "collide.idx")
+    assert build_index([("A1", "绝缘子", "XWP-70"), ("B2", "避雷器", "YH5W"), ("C3", "熔断器", "")], path) == 3
+    with MaterialIndex(path) as index:
+        assert index.lookup("避雷器", "YH5W").code == "B2"
+        assert index.lookup("熔断器").code == "C3"
+        assert index.lookup("绝缘子", "XWP-70").code == "A1"
+        match = index.lookup("变压器", "S11")
+        assert match is None or not match.exact
+
+
+def test_fields_with_tabs_and_backslashes_round_trip(tmp_path):
+    path = str(tmp_path / "escaped.idx")
+    build_index([("A\t1", "名称\t带制表符", "C:\\规格\\n"), ("B2", "普通", "")], path)
+    with MaterialIndex(path) as index:
+        assert index.record(0) == ("A\t1", "名称\t带制表符", "C:\\规格\\n")
+        assert index.lookup("名称\t带制表符", "C:\\规格\\n").code == "A\t1"
+        assert index.record(1) == ("B2", "普通", "")
+
+
+def test_duplicate_keys_keep_first_record(tmp_path):
+    path = str(tmp_path / "dup.idx")
+    assert build_index([("A1", "绝缘子", "XWP-70"), ("A2", "绝缘子 ", "xwp70")], path) == 1
+    with MaterialIndex(path) as index:
+        assert index.lookup("绝缘子", "XWP70").code == "A1"
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        MaterialIndex(str(path))
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from excel import multi
+from excel.multi import MultiWorkbook, load_workbooks
+
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def requests(apply_no, rows, supplier='甲'):
+    return pd.DataFrame({
+        "采购申请号": [apply_no] * rows,
+        "采购申请号行号": [10 * (i + 1) for i in range(rows)],
+        "供应商": [supplier] * rows,
+        "单体工程名称": ['工程'] * rows,
+        "类别": ['A'] * rows,
+        "物料编码": [f"M{i}" for i in range(rows)],
+        "含税单价": [1.13] * rows,
+        "不含税单价": [1.0] * rows,
+    })
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    xlsx = str(tmp_path / "a.xlsx")
+    with pd.ExcelWriter(xlsx) as writer:
+        pd.DataFrame({"说明": ["封面"]}).to_excel(writer, sheet_name='封面', index=False)
+        requests(1000, 2).to_excel(writer, sheet_name='一部', index=False)
+        requests(1001, 3, '乙').to_excel(writer, sheet_name='二部', index=False)
+    csv = str(tmp_path / "b.csv")
+    requests(1000, 1, '丙').to_csv(csv, index=False)
+    bad = str(tmp_path / "c.csv")
+    requests(1002, 2).assign(采购申请号=['1002', '第1002号']).to_csv(bad, index=False)
+    return xlsx, csv, bad
+
+
+def test_load_merges_sources_and_rejects_bad_sheets(workbooks):
+    xlsx, csv, bad = workbooks
+    result = load_workbooks([xlsx, csv, bad], workers=1)
+    assert result.sheets == 3
+    frame = result.frame
+    assert list(zip(frame[multi.SHEET_COLUMN], frame[multi.ROW_COLUMN]))[:3] == [('一部', 0), ('一部', 1), ('二部', 0)]
+    assert sorted(multi.group_work(frame)) == [1000, 1001]
+    assert len(multi.group_work(frame)[1000]) == 3
+    problems = {(path, sheet): message for path, sheet, message in result.errors}
+    assert problems[(xlsx, '封面')].startswith("缺少列")
+    assert problems[(bad, None)] == "列中有非数值内容: 采购申请号"
+
+
+def test_parallel_load_matches_serial(workbooks):
+    paths = list(workbooks[:2])
+    assert load_workbooks(paths, workers=2).frame.equals(load_workbooks(paths, workers=1).frame)
+
+
+def test_results_are_written_back_to_each_source(workbooks):
+    xlsx, csv, _ = workbooks
+    processor = MultiWorkbook([xlsx, csv], workers=1)
+    processor.read_data()
+    groups = processor.group_by_column('采购申请号')
+    for supplier, data in processor.group_data_by_column(groups[1000], '供应商').items():
+        processor.changeData(1000, data, 4500000001 if supplier == '甲' else '公司信息不正确', save=False)
+    processor.changeData(1001, groups[1001].iloc[1:2], 4500000002, save=False)
+    assert processor.save()
+    assert not processor.save()
+
+    sheets = pd.read_excel(xlsx, sheet_name=None)
+    assert list(sheets) == ['封面', '一部', '二部']
+    assert '信息' not in sheets['封面'].columns
+    assert sheets['一部']['信息'].tolist() == [4500000001, 4500000001]
+    assert sheets['二部']['信息'].isna().tolist() == [True, False, True]
+    assert sheets['二部']['信息'][1] == 4500000002
+    written = pd.read_csv(csv)
+    assert written['信息'].tolist() == ['公司信息不正确']
+    assert list(written.columns[:-1]) == list(requests(1000, 1).columns)
+
+
+def test_write_back_rejects_shrunken_sheet(workbooks):
+    _, csv, _ = workbooks
+    with pytest.raises(ValueError):
+        multi.write_back(csv, {None: {5: 4500000001}})
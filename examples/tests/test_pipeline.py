@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from receiving.pipeline import Pipeline, Stage
+
+
+def _run_with_timeout(pipeline, source, timeout=5.0):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = pipeline.run(source)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "流水线没有结束"
+    return outcome
+
+
+def test_results_keep_input_order_across_workers():
+    def slow_double(x):
+        time.sleep(0.001 * (x % 3))
+        return x * 2
+
+    pipeline = Pipeline([Stage("a", lambda x: x + 1), Stage("b", slow_double, workers=3), Stage("c", str)])
+    assert pipeline.run(range(20)) == [str((x + 1) * 2) for x in range(20)]
+    report = pipeline.report()
+    assert [r["processed"] for r in report] == [20, 20, 20]
+    assert all(r["maxQueueDepth"] <= 2 for r in report)
+
+
+def test_stage_errors_are_recorded_and_skipped():
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    pipeline = Pipeline([Stage("check", fail_on_odd), Stage("out", lambda x: x)])
+    assert pipeline.run(range(6)) == [0, 2, 4]
+    assert [(e.stage, e.sequence) for e in pipeline.errors] == [("check", 1), ("check", 3), ("check", 5)]
+    assert pipeline.report()[0]["errors"] == 3
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_base_exception_stops_pipeline_without_hanging(workers):
+    def interrupt(x):
+        if x == 3:
+            raise KeyboardInterrupt
+        return x
+
+    pipeline = Pipeline([Stage("scan", lambda x: x), Stage("clean", interrupt, workers=workers, queue_size=1),
+                         Stage("fill", lambda x: x)])
+    outcome = _run_with_timeout(pipeline, range(100))
+    assert isinstance(outcome.get("error"), KeyboardInterrupt)
+
+
+def test_empty_pipeline_rejected():
+    with pytest.raises(ValueError):
+        Pipeline([])
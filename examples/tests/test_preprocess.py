@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from receiving import preprocess
+from receiving.preprocess import (
+    adaptive_binarize, estimate_skew, median3x3, preprocess_pages, synthetic_page,
+)
+
+
+def test_median3x3_matches_brute_force():
+    rng = np.random.default_rng(0)
+    page = rng.integers(0, 256, (23, 31), dtype=np.uint8)
+    padded = np.pad(page, 1, mode='edge')
+    windows = np.stack([padded[y:y + 23, x:x + 31] for y in range(3) for x in range(3)])
+    assert np.array_equal(median3x3(page), np.median(windows, axis=0).astype(np.uint8))
+
+
+def test_binarize_separates_text_from_background():
+    page = np.full((120, 160), 235, dtype=np.uint8)
+    page[40:60, 30:130] = 30
+    binary = adaptive_binarize(page)
+    assert binary.dtype == np.uint8
+    assert (binary[45:55, 40:120] == 0).all()
+    assert (binary[:20] == 255).all()
+
+
+@pytest.mark.parametrize("skew", [-2.0, 0.0, 1.5])
+def test_estimate_skew_on_synthetic_page(skew):
+    page = synthetic_page(seed=1, size=(620, 877), skew=skew)
+    assert abs(estimate_skew(adaptive_binarize(median3x3(page))) - skew) < 0.3
+
+
+def test_preprocess_pages_runs_backend_and_can_drop_images():
+    pages = [synthetic_page(seed, size=(320, 440), skew=1.0) for seed in range(2)]
+    results = preprocess_pages(pages, workers=1, backend='none', keep_images=False)
+    assert [r.image for r in results] == [None, None]
+    assert results[0].ocr == {"text": "", "height": 440, "width": 320}
+    kept = preprocess_pages(pages[:1], workers=1)
+    assert kept[0].image.shape == (440, 320) and kept[0].ocr is None
+
+
+def test_unknown_backend_raises_value_error():
+    with pytest.raises(ValueError, match="bogus"):
+        preprocess_pages([], workers=1, backend='bogus')
+    with pytest.raises(ValueError):
+        preprocess.get_backend('bogus')
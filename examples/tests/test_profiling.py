@@ -0,0 +1,38 @@
+import pytest
+
+from common import profiling
+
+
+def test_enabled_modes():
+    assert profiling.enabled_modes('') == ()
+    assert profiling.enabled_modes('off') == ()
+    assert profiling.enabled_modes(' CProfile , sample') == ('cprofile', 'sample')
+    with pytest.raises(ValueError):
+        profiling.enabled_modes('cprofile,gpu')
+
+
+def test_run_without_profiling_calls_through(monkeypatch, tmp_path):
+    monkeypatch.delenv('RPA_PROFILE', raising=False)
+    monkeypatch.setenv('RPA_PROFILE_DIR', str(tmp_path))
+    assert profiling.run('t', lambda x: x + 1, 1) == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_session_writes_requested_outputs(monkeypatch, tmp_path):
+    monkeypatch.setenv('RPA_PROFILE', 'cprofile,sample,memory')
+    monkeypatch.setenv('RPA_PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('RPA_PROFILE_INTERVAL', '0.001')
+    assert profiling.run('job', lambda: sum(range(200000))) == sum(range(200000))
+    suffixes = sorted(path.name.split('.', 1)[1] for path in tmp_path.iterdir())
+    assert suffixes == ['folded', 'prof', 'summary.txt']
+    summary = next(tmp_path.glob('*.summary.txt')).read_text(encoding='utf-8')
+    assert summary.startswith("运行: job")
+    assert "内存分配" in summary
+
+
+def test_session_stop_is_idempotent(monkeypatch, tmp_path):
+    monkeypatch.setenv('RPA_PROFILE_DIR', str(tmp_path))
+    session = profiling.Session('once', ('cprofile',)).start()
+    files = session.stop()
+    assert session.stop() is files
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,76 @@
+from common.progress import Progress, RateLimiter, format_duration
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.calls = []
+
+    def event(self, level, message=None, step=None, progress=None, **data):
+        self.calls.append((level, message, step, progress, data))
+
+    def text(self, message=''):
+        self.calls.append(('TEXT', message, None, None, {}))
+
+    def error(self, message, step=None, progress=None, **data):
+        self.calls.append(('ERROR', message, step, progress, data))
+
+    def success(self, message, step=None, progress=None, **data):
+        self.calls.append(('SUCCESS', message, step, progress, data))
+
+    def levels(self):
+        return [call[0] for call in self.calls]
+
+
+def test_rate_limiter_burst_then_blocks():
+    limiter = RateLimiter(rate=0.001, burst=2)
+    assert [limiter.allow() for _ in range(3)] == [True, True, False]
+    assert RateLimiter(rate=0).allow()
+
+
+def test_format_duration():
+    assert format_duration(12) == "12秒"
+    assert format_duration(185) == "3分05秒"
+    assert format_duration(3720) == "1小时02分"
+
+
+def test_advance_is_rate_limited():
+    logger = RecordingLogger()
+    progress = Progress(logger, total=100, step='order', text_interval=0,
+                        limiter=RateLimiter(rate=0.001, burst=1))
+    for _ in range(100):
+        progress.advance()
+    assert logger.levels() == ['PROGRESS']
+    assert progress.snapshot()["done"] == 100
+
+
+def test_error_counts_failure_and_accepts_group_override():
+    logger = RecordingLogger()
+    progress = Progress(logger, total=3, step='order', group='甲', limiter=RateLimiter(0))
+    progress.error("订单 1 失败", group='乙', code=7)
+    level, message, step, done, data = logger.calls[-1]
+    assert (level, step, done) == ('ERROR', 'order', (0, 3))
+    assert data == {"group": '乙', "code": 7}
+    assert progress.failed == 1
+
+
+def test_finish_merges_snapshot_with_caller_fields():
+    logger = RecordingLogger()
+    progress = Progress(logger, total=2, step='order', text_interval=0, limiter=RateLimiter(0))
+    progress.advance(2, group='甲')
+    progress.finish("全部完成", done=5, group='合计', extra=1)
+    level, message, step, _, data = logger.calls[-1]
+    assert (level, message, step) == ('SUCCESS', "全部完成", 'order')
+    assert data["done"] == 5 and data["group"] == '合计' and data["extra"] == 1
+    assert data["total"] == 2
+
+
+def test_finish_forces_event_and_text():
+    logger = RecordingLogger()
+    progress = Progress(logger, total=None, step='batch', text_interval=60,
+                        limiter=RateLimiter(rate=0.001, burst=0))
+    progress.advance(3)
+    assert logger.levels() == []
+    with progress:
+        pass
+    assert logger.levels() == ['PROGRESS', 'TEXT']
+    assert logger.calls[0][3] == (3, None)
@@ -0,0 +1,75 @@
+import json
+
+import pandas as pd
+
+from receiving import reconcile
+from receiving.reconcile import OK, OVER_RECEIPT, PRICE_MISMATCH, UNKNOWN, OpenLines
+
+
+def open_lines():
+    return OpenLines(pd.DataFrame({
+        "采购申请号": [1000, 1000, 1001, 1002],
+        "供应商": ['上海电力设备有限公司', '上海电力设备有限公司', '上海电力设备有限公司 ', '湖南高阳电瓷电器有限公司'],
+        "物料编码": [500001.0, 500002.0, 500001.0, None],
+        "物料描述": ['变压器配件', '绝缘子', '变压器配件', '电缆终端头'],
+        "数量": [5, 100, 3, 20],
+        "含税单价": [12500.0, 85.5, 12600.0, 320.0],
+    }))
+
+
+def document(number, supplier, items):
+    return {"header": {"documentNumber": number, "supplierName": supplier},
+            "items": [dict(item, lineNumber=line) for line, item in enumerate(items, 1)]}
+
+
+DOCUMENTS = [
+    document("SH20241031001", '上海电力设备有限公司', [
+        {"materialCode": "500001", "materialName": "变压器配件", "quantity": 6, "unitPrice": 12550.0},
+        {"materialCode": "500002", "materialName": "绝缘子", "quantity": 100, "unitPrice": 90.0},
+        {"materialCode": "500009", "materialName": "未知物料", "quantity": 1, "unitPrice": 1.0},
+    ]),
+    document("SH20241031002", '上海电力设备有限公司', [
+        {"materialCode": "500001", "materialName": "变压器配件", "quantity": 4, "unitPrice": 12500.0},
+    ]),
+    document("SH20241031003", '湖南高阳电瓷电器有限公司', [
+        {"materialName": "电缆终端头", "quantity": 20, "unitPrice": 320.0},
+    ]),
+]
+
+
+def test_open_lines_aggregate_by_supplier_and_material():
+    index = open_lines()
+    assert index.lines == 4
+    row = index.by_code.loc[reconcile._normalized(['上海电力设备有限公司'])[0] + '\x1f500001']
+    assert (row.openQuantity, row.poPriceMin, row.poPriceMax, row.applyNo, row.poLines) == (8, 12500.0, 12600.0, 1000, 2)
+
+
+def test_reconcile_statuses_in_receipt_order():
+    result = reconcile.reconcile(open_lines(), DOCUMENTS)
+    assert list(result.columns) == reconcile.RESULT_COLUMNS
+    assert result['status'].tolist() == [OK, PRICE_MISMATCH, UNKNOWN, OVER_RECEIPT, OK]
+    assert result['overQuantity'].tolist() == [0, 0, 0, 2, 0]
+    assert result['documentNumber'].tolist()[3] == "SH20241031002"
+    assert reconcile.summarize(result) == {"lines": 5, "documents": 3, "flaggedDocuments": 2,
+                                           OK: 2, PRICE_MISMATCH: 1, UNKNOWN: 1, OVER_RECEIPT: 1}
+
+
+def test_price_tolerance():
+    documents = [document("SH20241031004", '湖南高阳电瓷电器有限公司',
+                          [{"materialName": "电缆终端头", "quantity": 1, "unitPrice": 323.0}])]
+    assert reconcile.reconcile(open_lines(), documents)['status'].tolist() == [OK]
+    assert reconcile.reconcile(open_lines(), documents, price_tolerance=0.0)['status'].tolist() == [PRICE_MISMATCH]
+
+
+def test_empty_receipts():
+    result = reconcile.reconcile(open_lines(), [])
+    assert result.empty and list(result.columns) == reconcile.RESULT_COLUMNS
+
+
+def test_load_documents_array_and_jsonl(tmp_path):
+    array = tmp_path / "receipts.json"
+    array.write_text(json.dumps(DOCUMENTS, ensure_ascii=False), encoding='utf-8')
+    lines = tmp_path / "receipts.jsonl"
+    lines.write_text("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in DOCUMENTS), encoding='utf-8')
+    assert reconcile._load_documents(str(array)) == DOCUMENTS
+    assert reconcile._load_documents(str(lines)) == DOCUMENTS
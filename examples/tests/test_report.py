@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+from excel.report import DETAIL_HEADER, ERROR_HEADER, SUPPLIER_HEADER, ResultReport
+
+
+def sheet_rows(path, name):
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [tuple(row) for row in workbook[name].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+def test_report_streams_details_and_summarises(tmp_path):
+    path = str(tmp_path / "结果.xlsx")
+    with ResultReport(path) as report:
+        report.add(1000, '甲', True, 4500000001, None, 1500, 3)
+        report.add(1001, '乙', False, None, '公司信息不正确', 500, 1)
+        report.add(1002, '甲', False, None, None, 1000, 2)
+        assert not os.path.exists(path)
+    assert report.rows == 3
+    assert os.listdir(tmp_path) == ["结果.xlsx"]
+
+    details = sheet_rows(path, '明细')
+    assert details[0] == DETAIL_HEADER
+    assert [row[:7] for row in details[1:]] == [
+        ('1000', '甲', '成功', 4500000001, None, 1.5, 3),
+        ('1001', '乙', '失败', None, '公司信息不正确', 0.5, 1),
+        ('1002', '甲', '失败', None, None, 1, 2),
+    ]
+
+    summary = sheet_rows(path, '汇总')
+    assert summary[0] == SUPPLIER_HEADER
+    assert summary[1] == ('甲', 2, 1, 1, 0.5, 2.5, 1.25)
+    assert summary[2] == ('乙', 1, 0, 1, 0, 0.5, 0.5)
+    assert summary[3] == ('合计', 3, 1, 2, 0.3333, 3, 1)
+    assert summary[5] == ERROR_HEADER
+    assert sorted(summary[6:]) == [('公司信息不正确', 1), ('未分类', 1)]
+
+
+def test_report_without_summary_and_double_close(tmp_path):
+    path = str(tmp_path / "r.xlsx")
+    report = ResultReport(path, summary=False)
+    report.add(1, '甲', True)
+    report.close()
+    report.close()
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['明细']
+    workbook.close()
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+import data_processor as dp
+from receiving import rules
+from receiving.rules import compile_rules, load_rules, errors
+
+
+def _document(**overrides):
+    document = {
+        "documentType": "收货单",
+        "documentNumber": "SH20241021001",
+        "date": "2024-10-21",
+        "supplier": "上海电力设备有限公司",
+        "items": [
+            {"name": "变压器配件", "quantity": 5, "unit": "套", "unitPrice": 12500.00, "totalPrice": 62500.00},
+            {"name": "绝缘子", "quantity": 100, "unit": "个", "unitPrice": 85.50, "totalPrice": 8550.00},
+        ],
+        "totalAmount": 71050.00,
+    }
+    document.update(overrides)
+    return document
+
+
+def test_default_rules_compile_once():
+    assert compile_rules() is compile_rules()
+    assert load_rules() is compile_rules()
+
+
+def test_valid_document_passes():
+    assert compile_rules()(_document()) == []
+
+
+def test_violations_are_structured():
+    document = _document(documentNumber="X1", date="2024/10/21", totalAmount=1.0)
+    document["items"][0]["unit"] = "箱"
+    document["items"][1]["quantity"] = 0
+    document["items"][1]["totalPrice"] = 1.0
+    violations = compile_rules()(document)
+    found = {(v.rule, v.field, v.line) for v in violations}
+    assert ("document_number_format", "documentNumber", None) in found
+    assert ("date_format", "date", None) in found
+    assert ("unit_whitelist", "unit", 1) in found
+    assert ("quantity_positive", "quantity", 2) in found
+    assert ("amount_reconciliation", "totalPrice", 2) in found
+    assert len(errors(violations)) == len(violations)
+
+
+def test_missing_fields_and_non_object_items():
+    violations = compile_rules()({"documentNumber": "SH20241021001", "items": [{"name": "a"}, "oops"]})
+    fields = {(v.field, v.line) for v in violations}
+    assert ("supplier", None) in fields
+    assert ("quantity", 1) in fields
+    assert ("items", 2) in fields
+
+
+def test_custom_rules_cached_by_content_and_severity():
+    custom = [{"id": "qty", "name": "数量", "check": "range", "scope": "item", "field": "quantity",
+               "max": 10, "severity": "warning"}]
+    validator = compile_rules(custom)
+    assert compile_rules(json.loads(json.dumps(custom))) is validator
+    violations = validator(_document())
+    assert [v.line for v in violations] == [2]
+    assert errors(violations) == []
+
+
+def test_rules_file_recompiled_when_modified(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"id": "a", "check": "required", "fields": ["supplier"]}]), encoding="utf-8")
+    monkeypatch.setenv("RECEIVING_RULES", str(path))
+    first = load_rules()
+    assert load_rules() is first
+    assert first({"items": []})[0].field == "supplier"
+
+    path.write_text(json.dumps([{"id": "b", "check": "required", "fields": ["date"]}]), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = load_rules()
+    assert second is not first
+    assert second({"items": []})[0].field == "date"
+
+
+def test_process_chunk_fetches_validator_once(monkeypatch):
+    calls = []
+    original = dp.load_rules
+
+    def counting():
+        calls.append(1)
+        return original()
+
+    monkeypatch.setattr(dp, "load_rules", counting)
+    document = {"documentType": "收货单", "documentNumber": "SH20241031001", "date": "2024-10-31",
+                "supplier": "s", "items": [{"name": "n", "quantity": 1, "unit": "个", "price": 2}]}
+    records, rejects, _ = dp.process_chunk([(n, json.dumps(document)) for n in range(50)])
+    assert len(records) == 50 and rejects == []
+    assert len(calls) == 1
+
+
+def test_unknown_check_type_rejected():
+    with pytest.raises(ValueError, match="bogus"):
+        rules.Validator([{"id": "x", "check": "bogus"}])
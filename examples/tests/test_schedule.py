@@ -0,0 +1,64 @@
+import pandas as pd
+
+from sap import schedule
+from sap.schedule import SessionState, WorkItem
+
+
+def item(apply_no, supplier, category):
+    return WorkItem(apply_no, supplier, category, None)
+
+
+ITEMS = [item(1, '甲', 'A'), item(2, '乙', 'B'), item(3, '甲', 'B'), item(4, '乙', 'B'), item(5, '甲', 'A')]
+
+
+def test_schedule_groups_supplier_then_category_stably():
+    plan = schedule.schedule(ITEMS)
+    assert [i.apply_no for i in plan] == [1, 5, 3, 2, 4]
+
+
+def test_count_transitions_and_report():
+    plan = schedule.schedule(ITEMS)
+    assert schedule.count_transitions(ITEMS) == {"supplier": 4, "category": 2}
+    assert schedule.count_transitions(plan) == {"supplier": 1, "category": 1}
+    state = SessionState()
+    state.skip('connect')
+    state.skip('connect')
+    summary = schedule.report(ITEMS, plan, state)
+    assert summary["tasks"] == 5
+    assert summary["saved"] == {"supplier": 3, "category": 1}
+    assert summary["skipped"] == {"connect": 2}
+
+
+class FakeProcessor:
+    def group_data_by_column(self, frame, column):
+        return {key: group for key, group in frame.groupby(column, sort=False)}
+
+
+def test_build_work_items_splits_by_supplier():
+    frame = pd.DataFrame({"供应商": ['乙', '甲', '乙'], "类别": ['B', 'A', 'B'], "行": [1, 2, 3]})
+    items = schedule.build_work_items(FakeProcessor(), {100: frame})
+    assert [(i.apply_no, i.supplier, i.category, len(i.data)) for i in items] == [(100, '乙', 'B', 2), (100, '甲', 'A', 1)]
+
+
+class FakeSession:
+    def __init__(self, busy=False, broken=False):
+        self.busy = busy
+        self.broken = broken
+
+    @property
+    def Busy(self):
+        if self.broken:
+            raise RuntimeError("会话已断开")
+        return self.busy
+
+
+def test_session_state_alive():
+    state = SessionState()
+    assert not state.alive()
+    state.attach(object(), FakeSession())
+    assert state.alive()
+    state.session.busy = True
+    assert not state.alive()
+    state.attach(object(), FakeSession(broken=True))
+    assert not state.alive()
+    assert state.session is None and state.application is None
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from sap import screen as sap_screen
+
+
+class Children(list):
+    @property
+    def Count(self):
+        return len(self)
+
+    def __call__(self, index):
+        return self[index]
+
+
+class Element:
+    def __init__(self, element_id, text='', children=(), **attributes):
+        self.Id = f"/app/con[0]/ses[0]/{element_id}"
+        self.Text = text
+        self.Children = Children(children)
+        self.ContainerType = bool(children)
+        self.__dict__.update(attributes)
+
+
+class FakeSession:
+    """只实现 probe 用到的属性；changes 为 [(探测次数, 修改函数)]，模拟异步出现的弹窗或状态栏"""
+
+    def __init__(self, title='创建采购订单', status=('', ''), popup=None):
+        self.Busy = False
+        self.title = title
+        self.status = status
+        self.popup = popup
+        self.probes = 0
+        self.changes = []
+
+    @property
+    def Children(self):
+        for after, change in list(self.changes):
+            if self.probes >= after:
+                change(self)
+                self.changes.remove((after, change))
+        self.probes += 1
+        windows = [Element('wnd[0]')]
+        if self.popup is not None:
+            windows.append(Element('wnd[1]'))
+        return Children(windows)
+
+    def findById(self, element_id):
+        if element_id == 'wnd[0]':
+            return Element(element_id, self.title)
+        if element_id == 'wnd[0]/sbar':
+            return Element(element_id, self.status[1], MessageType=self.status[0])
+        if element_id == 'wnd[1]':
+            return Element(element_id, '信息')
+        if element_id == 'wnd[1]/usr':
+            return Element(element_id, children=[Element(f'wnd[1]/usr/{key}', text)
+                                                 for key, text in self.popup.items()])
+        raise KeyError(element_id)
+
+
+@pytest.mark.parametrize("popup, status, kind, message", [
+    (None, ('', ''), sap_screen.NO_POPUP, None),
+    ({'lbl[1,1]': '没有满足选择标准的数据存在'}, ('', ''), sap_screen.NO_DATA, '没有满足选择标准的数据存在'),
+    ({'lbl[7,5]': '超出预算 100 元'}, ('', ''), sap_screen.BUDGET, '超预算'),
+    ({'lbl[7,5]': ' 价格不能为零 '}, ('', ''), sap_screen.ERROR, '价格不能为零'),
+    ({'txtSPOP-TEXTLINE1': '凭证仍有错，是否保存'}, ('', ''), sap_screen.ERROR, '凭证仍有错'),
+    ({'txtSPOP-TEXTLINE1': '系统消息已发出'}, ('', ''), sap_screen.CONFIRM, '系统消息已发出'),
+    ({'lbl[2,2]': '其他提示'}, ('', ''), sap_screen.POPUP, None),
+    (None, ('E', '供应商 123 不存在主记录'), sap_screen.ERROR, '公司信息不正确'),
+])
+def test_probe_classifies_known_screens(popup, status, kind, message):
+    state = sap_screen.probe(FakeSession(status=status, popup=popup))
+    assert (state.kind, state.message) == (kind, message)
+    assert state.windows == (['wnd[0]', 'wnd[1]'] if popup else ['wnd[0]'])
+
+
+def test_wait_returns_when_popup_appears():
+    session = FakeSession()
+    session.changes.append((3, lambda s: setattr(s, 'popup', {'lbl[7,5]': '超出预算'})))
+    start = time.monotonic()
+    state = sap_screen.wait(session, timeout=5.0, interval=0.001)
+    assert state.kind == sap_screen.BUDGET
+    assert time.monotonic() - start < 1.0
+
+
+def test_wait_until_status_changes_returns_early():
+    session = FakeSession(status=('S', '旧消息'))
+    before = sap_screen.probe(session)
+    session.changes.append((session.probes + 2, lambda s: setattr(s, 'status', ('S', '凭证已保存'))))
+    start = time.monotonic()
+    state = sap_screen.wait(session, timeout=5.0, interval=0.001,
+                            until=lambda state: state.status != before.status or state.title != before.title)
+    assert state.status == ('S', '凭证已保存') and state.popup is None
+    assert time.monotonic() - start < 1.0
+
+
+def test_wait_times_out_with_last_state():
+    session = FakeSession()
+    state = sap_screen.wait(session, timeout=0.05, interval=0.01)
+    assert state.kind == sap_screen.NO_POPUP
+    assert session.probes >= 2
+
+
+def test_dismiss_presses_registered_button():
+    pressed = []
+
+    class Session(FakeSession):
+        def findById(self, element_id):
+            if element_id == 'wnd[1]/tbar[0]/btn[0]':
+                return Element(element_id, press=lambda: pressed.append(element_id))
+            return super().findById(element_id)
+
+    session = Session(popup={'lbl[7,5]': '超出预算'})
+    sap_screen.dismiss(session, sap_screen.probe(session))
+    sap_screen.dismiss(session, sap_screen.probe(FakeSession(status=('E', '供应商不存在主记录'))))
+    assert pressed == ['wnd[1]/tbar[0]/btn[0]']
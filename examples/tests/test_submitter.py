@@ -0,0 +1,94 @@
+import copy
+
+import pytest
+
+from receiving.idempotency import IdempotencyIndex
+from receiving.stub_server import StubServer, sample_documents
+from receiving.submitter import ConnectionPool, Response, submit_documents
+
+
+@pytest.fixture
+def server():
+    server = StubServer(latency=0.001, seed=1).start_in_thread()
+    yield server
+    server.stop()
+
+
+def statuses(reports):
+    return [report["status"] for report in reports]
+
+
+def test_submits_each_document_once_over_pooled_connections(server):
+    documents = sample_documents(20, items=3)
+    reports, stats = submit_documents(server.url, documents, concurrency=4)
+    assert statuses(reports) == ["SUCCESS"] * 20
+    assert [r["sourceDocument"] for r in reports] == [d["header"]["documentNumber"] for d in documents]
+    assert len({r["receiptNumber"] for r in reports}) == 20
+    assert all(r["itemsProcessed"] == 3 for r in reports)
+    assert stats["connectionsOpened"] <= 4
+    assert stats["connectionsOpened"] + stats["connectionsReused"] == 20
+    assert server.stats["created"] == 20
+
+
+def test_resubmission_replays_and_changed_content_needs_review(server):
+    documents = sample_documents(3, items=2)
+    first, _ = submit_documents(server.url, documents)
+    changed = copy.deepcopy(documents[2])
+    changed["items"][0]["quantity"] += 1
+    second, _ = submit_documents(server.url, documents[:2] + [changed])
+    assert statuses(second) == ["SUCCESS", "SUCCESS", "REVIEW_REQUIRED"]
+    assert [r["receiptNumber"] for r in second] == [r["receiptNumber"] for r in first]
+    assert second[0]["remarks"] == "目标系统已有该单据，返回原收货单号"
+    assert server.stats["created"] == 3
+
+
+def test_retries_errors_and_dropped_responses_without_duplicates():
+    server = StubServer(latency=0.001, error_rate=0.2, drop_rate=0.2, seed=7).start_in_thread()
+    try:
+        reports, stats = submit_documents(server.url, sample_documents(30, items=1), concurrency=8,
+                                          retries=12, backoff=0.001)
+    finally:
+        server.stop()
+    assert statuses(reports) == ["SUCCESS"] * 30
+    assert stats["retries"] > 0
+    assert server.stats["created"] == 30
+    assert len({r["receiptNumber"] for r in reports}) == 30
+
+
+def test_gives_up_after_retries():
+    server = StubServer(latency=0, error_rate=1.0, seed=0).start_in_thread()
+    try:
+        reports, stats = submit_documents(server.url, sample_documents(2, items=1), retries=2, backoff=0.001)
+    finally:
+        server.stop()
+    assert statuses(reports) == ["FAILED", "FAILED"]
+    assert reports[0]["attempts"] == 3
+    assert stats["retries"] == 4
+
+
+def test_local_index_skips_filed_documents(server, tmp_path):
+    index = IdempotencyIndex(str(tmp_path / "receiving.db"))
+    documents = sample_documents(4, items=2)
+    first, _ = submit_documents(server.url, documents[:2], index=index)
+    reports, _ = submit_documents(server.url, documents, index=index)
+    index.close()
+    assert statuses(reports) == ["SKIPPED_DUPLICATE", "SKIPPED_DUPLICATE", "SUCCESS", "SUCCESS"]
+    assert [r["receiptNumber"] for r in reports[:2]] == [r["receiptNumber"] for r in first]
+    assert server.stats["requests"] == 4
+
+
+@pytest.mark.parametrize("status", [200, 403])
+def test_non_json_body_fails_only_that_document(server, monkeypatch, status):
+    documents = sample_documents(3, items=1)
+    proxied = documents[1]["header"]["documentNumber"]
+    request = ConnectionPool.request
+
+    async def through_proxy(self, method, body=b'', headers=None):
+        if headers["Idempotency-Key"] == proxied:
+            return Response(status, {}, b"<html>Forbidden</html>")
+        return await request(self, method, body, headers)
+
+    monkeypatch.setattr(ConnectionPool, "request", through_proxy)
+    reports, _ = submit_documents(server.url, documents)
+    assert statuses(reports) == ["SUCCESS", "FAILED", "SUCCESS"]
+    assert "响应不是有效的JSON" in reports[1]["remarks"]
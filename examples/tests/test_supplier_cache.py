@@ -0,0 +1,71 @@
+import pytest
+
+from sap import supplier_cache
+from sap.supplier_cache import DAY, FOUND, MISSING, SupplierCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(supplier_cache.time, 'time', clock)
+    return clock
+
+
+def test_found_and_missing_entries(tmp_path, clock):
+    cache = SupplierCache(str(tmp_path / "s.db"))
+    cache.found(' 甲公司 ', 1000001)
+    cache.missing('乙公司')
+    assert cache.lookup('甲公司') == (FOUND, '1000001', clock.now)
+    assert cache.lookup('乙公司').status == MISSING
+    assert cache.lookup('丙公司') is None
+    cache.invalidate('甲公司')
+    assert cache.lookup('甲公司') is None
+    cache.close()
+
+
+def test_entries_expire_by_status(tmp_path, clock):
+    path = str(tmp_path / "s.db")
+    cache = SupplierCache(path, found_ttl=30 * DAY, missing_ttl=DAY)
+    cache.found('甲', '1')
+    cache.missing('乙')
+    clock.now += DAY + 1
+    assert cache.lookup('乙') is None
+    assert cache.lookup('甲') is not None
+    clock.now += 30 * DAY
+    assert len(cache) == 1
+    assert cache.purge_expired() == 1
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = SupplierCache(str(tmp_path / "s.db"), max_entries=2)
+    cache.found('甲', '1')
+    clock.now += 1
+    cache.found('乙', '2')
+    clock.now += 1
+    cache.lookup('甲')
+    clock.now += 1
+    cache.found('丙', '3')
+    assert len(cache) == 2
+    assert cache.lookup('乙') is None
+    assert cache.lookup('甲') is not None and cache.lookup('丙') is not None
+    cache.close()
+
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('SUPPLIER_CACHE_DB', str(tmp_path / "env.db"))
+    monkeypatch.setenv('SUPPLIER_CACHE_TTL_DAYS', '2')
+    monkeypatch.setenv('SUPPLIER_CACHE_MISSING_TTL_HOURS', '6')
+    cache = SupplierCache.from_env()
+    assert cache.path == str(tmp_path / "env.db")
+    assert cache.ttl == {FOUND: 2 * DAY, MISSING: 6 * 3600}
+    cache.close()
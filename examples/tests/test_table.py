@@ -0,0 +1,110 @@
+import pytest
+
+from sap.table import Table
+
+
+class Scrollbar:
+    def __init__(self, control):
+        self._control = control
+
+    @property
+    def position(self):
+        return self._control.position
+
+    @position.setter
+    def position(self, value):
+        # SAP 不会滚动到最后一页之后
+        self._control.position = max(0, min(value, self._control.RowCount - self._control.VisibleRowCount))
+
+
+class Cell:
+    def __init__(self, control, row, column):
+        self._control, self._key = control, (row, column)
+
+    @property
+    def Text(self):
+        return self._control.cells.get(self._key, '')
+
+    @property
+    def text(self):
+        return self.Text
+
+    @text.setter
+    def text(self, value):
+        if self._key[1] in self._control.readonly:
+            raise RuntimeError("单元格不可写")
+        self._control.cells[self._key] = value
+
+    def setFocus(self):
+        pass
+
+
+class FakeTable:
+    def __init__(self, rows, visible=4, readonly=()):
+        self.RowCount = rows
+        self.VisibleRowCount = visible
+        self.position = 0
+        self.cells = {}
+        self.readonly = set(readonly)
+        self.verticalScrollbar = Scrollbar(self)
+
+    def GetCell(self, visible_row, column):
+        row = self.position + visible_row
+        assert 0 <= visible_row < self.VisibleRowCount and row < self.RowCount
+        return Cell(self, row, column)
+
+
+class FakeSession:
+    def __init__(self, table):
+        self.table = table
+        self.lookups = 0
+
+    def findById(self, element_id):
+        self.lookups += 1
+        return self.table
+
+
+def make_table(rows, values, visible=4, readonly=()):
+    control = FakeTable(rows, visible, readonly)
+    for row, text in enumerate(values):
+        control.cells[(row, 4)] = text
+    return control, Table(FakeSession(control), lambda: 'wnd[0]/usr/tbl')
+
+
+def test_column_reads_across_pages():
+    control, table = make_table(10, [f"M{i}" for i in range(10)])
+    assert table.column(4) == [f"M{i}" for i in range(10)]
+    assert table.scrolls == 2
+    assert table.column(4, start=5, stop=7) == ["M5", "M6"]
+
+
+def test_column_stops_at_first_empty_cell():
+    _, table = make_table(10, ["M0", "M1", "M2", "M3", "M4", " "])
+    assert table.column(4, until_empty=True) == ["M0", "M1", "M2", "M3", "M4"]
+
+
+def test_find_and_cell():
+    control, table = make_table(12, [f"M{i}" for i in range(12)])
+    assert table.find(4, "M9") == 9
+    assert table.find(4, "M9", limit=5) is None
+    assert table.cell(9, 4).Text == "M9"
+    assert control.position <= 9 < control.position + control.VisibleRowCount
+
+
+def test_fill_confirms_once_per_page():
+    control, table = make_table(10, [])
+    confirms = []
+    written = table.fill(10, {row: f"{row}.00" for row in (9, 0, 1, 5, 6)}, lambda: confirms.append(control.position))
+    assert written == 5
+    assert confirms == [0, 5, 6]
+    assert {row: control.cells[(row, 10)] for row in (0, 1, 5, 6, 9)} == {
+        0: "0.00", 1: "1.00", 5: "5.00", 6: "6.00", 9: "9.00"}
+
+
+def test_fill_errors():
+    control, table = make_table(6, [], readonly={11})
+    with pytest.raises(RuntimeError):
+        table.fill(11, {0: 'RMB'})
+    failed = []
+    assert table.fill(11, {0: 'RMB', 5: 'RMB'}, on_error=lambda row, e: failed.append(row)) == 0
+    assert failed == [0, 5]
@@ -5,23 +5,56 @@
 用于演示收发货流程中的数据清理和结构化功能
 """
 
+import argparse
 import json
+import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
 
-def process_ocr_data(raw_data):
+# 共享的收货处理模块位于 examples/ 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'examples'))
+
+from receiving.aggregate import AggregateStore, contribution
+from receiving.items import ItemColumns
+from receiving.rules import load_rules, errors
+from common.log import configure, get_logger
+from common.progress import Progress
+from common import handoff, profiling
+
+log = get_logger('data_processor')
+
+def process_ocr_data(raw_data, verbose=True, validator=None):
     """
     处理OCR原始数据，进行清理和结构化
+
+    Args:
+        raw_data (dict): OCR识别的原始单据数据。
+        verbose (bool): 是否打印处理过程，批量模式下关闭。
+        validator (Validator): 编译好的规则集，批量模式下每块只获取一次；默认调用 load_rules。
     """
-    print("开始处理OCR数据...")
+    if verbose:
+        log.text("开始处理OCR数据...")
+
+    # 数据验证：规则集只编译一次，之后每个文档只执行编译好的校验函数
+    if validator is None:
+        validator = load_rules()
+    violations = errors(validator(raw_data))
+    if violations:
+        raise ValueError("; ".join(
+            f"第 {v.line} 行 {v.message}" if v.line else v.message for v in violations))
 
-    # 数据验证
-    required_fields = ['documentType', 'documentNumber', 'date', 'supplier', 'items']
-    for field in required_fields:
-        if field not in raw_data:
-            raise ValueError(f"缺少必需字段: {field}")
+    if verbose:
+        log.text(f"✓ 数据验证通过")
 
-    print(f"✓ 数据验证通过，包含所有必需字段")
+    # 物料明细按列存储，数量和金额以整数精确计算
+    items = ItemColumns.from_items(raw_data["items"], price_key="price", total_key=None)
+    line_totals = items.line_totals()
+    total_quantity = items.total_quantity()
+    total_amount = items.total_amount(line_totals)
 
     # 构建结构化数据
     processed_data = {
@@ -32,44 +65,224 @@ def process_ocr_data(raw_data):
             "supplierName": raw_data["supplier"],
             "processedAt": datetime.now().isoformat()
         },
-        "items": [],
+        "items": [
+            {
+                "lineNumber": idx,
+                "materialName": name,
+                "quantity": quantity,
+                "unit": unit,
+                "unitPrice": unit_price,
+                "totalPrice": total_price
+            }
+            for idx, name, quantity, unit, unit_price, total_price in zip(
+                range(1, len(items) + 1), items.names, items.quantities(), items.units,
+                ItemColumns.money(items.unit_price), ItemColumns.money(line_totals))
+        ],
         "summary": {
-            "totalItems": len(raw_data["items"]),
-            "totalQuantity": 0,
-            "totalAmount": 0.0
+            "totalItems": len(items),
+            "totalQuantity": float(total_quantity),
+            "totalAmount": float(total_amount)
         }
     }
 
-    # 处理每个条目
-    print(f"\n处理 {len(raw_data['items'])} 个物料条目:")
-    for idx, item in enumerate(raw_data["items"], 1):
-        # 数据标准化
-        standardized_item = {
-            "lineNumber": idx,
-            "materialName": item["name"],
-            "quantity": float(item["quantity"]),
-            "unit": item["unit"],
-            "unitPrice": float(item.get("price", 0)),
-            "totalPrice": float(item["quantity"]) * float(item.get("price", 0))
-        }
+    if verbose:
+        log.text(f"\n处理 {len(items)} 个物料条目:")
+        for idx, item in enumerate(raw_data["items"], 1):
+            log.text(f"  {idx}. {item['name']} - 数量: {item['quantity']} {item['unit']}")
 
-        processed_data["items"].append(standardized_item)
-        processed_data["summary"]["totalQuantity"] += standardized_item["quantity"]
-        processed_data["summary"]["totalAmount"] += standardized_item["totalPrice"]
+        log.text(f"\n✓ 数据处理完成")
+        log.text(f"  总条目数: {len(items)}")
+        log.text(f"  总数量: {float(total_quantity)}")
+        log.text(f"  总金额: ¥{total_amount:.2f}")
+        log.event('INFO', "数据处理完成", step='process', totalItems=len(items),
+                  totalQuantity=float(total_quantity), totalAmount=float(total_amount))
 
-        print(f"  {idx}. {item['name']} - 数量: {item['quantity']} {item['unit']}")
+    return processed_data
 
-    print(f"\n✓ 数据处理完成")
-    print(f"  总条目数: {processed_data['summary']['totalItems']}")
-    print(f"  总数量: {processed_data['summary']['totalQuantity']}")
-    print(f"  总金额: ¥{processed_data['summary']['totalAmount']:.2f}")
+def iter_documents(stream):
+    """
+    逐行读取JSONL输入，产出 (行号, 原始行)，空行跳过。
+    JSON解析放到工作进程中完成，主进程只负责读取。
+    """
+    for lineno, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield lineno, line
 
-    return processed_data
+def chunked(iterable, size):
+    """将迭代器按固定大小切块，最后一块可能不足 size"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def process_chunk(chunk, aggregate=False):
+    """
+    工作进程入口：处理一块文档。
+
+    Args:
+        aggregate (bool): 同时计算每个结果计入按日汇总的内容（receiving.aggregate.contribution）。
+
+    Returns:
+        tuple: (结果行列表, 拒绝行列表, 汇总内容列表)，结果和拒绝行均为已序列化的单行JSON。
+    """
+    records = []
+    rejects = []
+    contributions = []
+    validator = load_rules()
+    for lineno, line in chunk:
+        try:
+            document = json.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError("文档必须是JSON对象")
+            processed = process_ocr_data(document, verbose=False, validator=validator)
+            records.append(json.dumps(processed, ensure_ascii=False, separators=(',', ':')))
+            if aggregate:
+                contributions.append(contribution(processed))
+        except Exception as e:
+            rejects.append(json.dumps({
+                "line": lineno,
+                "error": f"{type(e).__name__}: {e}",
+                "raw": line
+            }, ensure_ascii=False, separators=(',', ':')))
+    return records, rejects, contributions
+
+def run_batch(source, sink, reject_sink, workers=None, chunk_size=256, report_every=5.0, aggregate=None):
+    """
+    批量处理JSONL文档流。
+
+    文档按块分发到进程池，同时在途的块数不超过 workers * 2，
+    因此内存占用与输入规模无关；结果按输入顺序写出。
+    畸形文档写入拒绝流，不中断整个批次。
+
+    Args:
+        source: 输入文本流，每行一个OCR文档。
+        sink: 结果输出流，每行一个结构化记录；也可以是 common.handoff 的写入器，
+            每个记录一帧（类型 record），已序列化的记录直接写出，不再重复序列化。
+        reject_sink: 拒绝记录输出流。
+        workers (int): 工作进程数，1 表示在当前进程内处理。
+        chunk_size (int): 每块文档数。
+        report_every (float): 进度文本的最小间隔（秒），进度事件按 RPA_PROGRESS_RATE 限流。
+        aggregate (AggregateStore): 提供时每块结果计入按日汇总（一个事务），按单据编号幂等。
+
+    Returns:
+        dict: 处理统计（文档数、拒绝数、耗时、吞吐量）。
+    """
+    stats = {"documents": 0, "rejected": 0}
+    start = time.perf_counter()
+    progress = Progress(log, step='batch', text_interval=report_every)
+
+    if hasattr(sink, 'write_encoded'):
+        def write_record(record):
+            sink.write_encoded('record', record.encode('utf-8'))
+    else:
+        def write_record(record):
+            sink.write(record + "\n")
+
+    def write(result):
+        records, rejects, contributions = result
+        if aggregate is not None:
+            aggregate.apply_many(contributions)
+        for record in records:
+            write_record(record)
+        for reject in rejects:
+            reject_sink.write(reject + "\n")
+        stats["documents"] += len(records) + len(rejects)
+        stats["rejected"] += len(rejects)
+        progress.advance(len(records) + len(rejects), failed=len(rejects))
+
+    chunks = chunked(iter_documents(source), chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            write(process_chunk(chunk, aggregate is not None))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            max_in_flight = workers * 2
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(process_chunk, chunk, aggregate is not None))
+                if len(pending) >= max_in_flight:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+
+    sink.flush()
+    reject_sink.flush()
+    progress.finish()
+    elapsed = time.perf_counter() - start
+    stats["elapsed"] = elapsed
+    stats["docsPerSec"] = stats["documents"] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+def batch_main(args):
+    """批量模式入口，结果写到输出文件或标准输出，统计信息写到标准错误"""
+    if args.output in (None, '-') and not os.environ.get('RPA_HUMAN'):
+        # 结果记录占用标准输出，日志文本改写到标准错误
+        configure(human='stderr')
+    opened = []
+
+    def open_stream(path, mode, default):
+        if path is None or path == '-':
+            return default
+        if 'b' in mode:
+            stream = open(path, mode)
+        else:
+            stream = open(path, mode, encoding='utf-8', newline='\n')
+        opened.append(stream)
+        return stream
+
+    try:
+        source = open_stream(args.batch, 'r', sys.stdin)
+        if args.format == 'frames':
+            sink = handoff.open_writer(open_stream(args.output, 'wb', sys.stdout.buffer), 'frames', spill=0)
+        else:
+            sink = open_stream(args.output, 'w', sys.stdout)
+        reject_sink = open_stream(args.rejects, 'w', sys.stderr)
+        if args.aggregate:
+            aggregate = AggregateStore(args.aggregate)
+            opened.append(aggregate)
+        else:
+            aggregate = None
+        stats = run_batch(source, sink, reject_sink, workers=args.workers, chunk_size=args.chunk_size,
+                          aggregate=aggregate)
+    finally:
+        for stream in opened:
+            stream.close()
+
+    log.success(f"批量处理完成: {stats['documents']} 个文档，"
+                f"拒绝 {stats['rejected']} 个，耗时 {stats['elapsed']:.2f} 秒，"
+                f"{stats['docsPerSec']:.0f} docs/sec", step='batch', **stats)
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="收发货数据清理和结构化")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="批量模式：从JSONL文件读取OCR文档，'-' 表示标准输入")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="批量结果输出文件（JSONL），默认标准输出")
+    parser.add_argument('--format', choices=('jsonl', 'frames'), default='jsonl',
+                        help="批量结果格式：jsonl 每行一个记录，frames 为 common.handoff 的二进制帧流")
+    parser.add_argument('--rejects', metavar='FILE',
+                        help="畸形文档输出文件（JSONL），默认标准错误")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="工作进程数，默认等于CPU核数")
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help="每个任务块包含的文档数")
+    parser.add_argument('--aggregate', metavar='DB',
+                        help="同时计入按日汇总库（receiving.aggregate，SQLite），重复处理的单据不重复计数")
+    return parser.parse_args(argv)
 
 def main():
-    print("=" * 60)
-    print("数据处理脚本 - 收发货数据清理和结构化")
-    print("=" * 60)
+    args = parse_args()
+    if args.batch:
+        return batch_main(args)
+
+    log.text("=" * 60)
+    log.text("数据处理脚本 - 收发货数据清理和结构化")
+    log.text("=" * 60)
 
     # 模拟OCR识别的原始数据
     raw_data = {
@@ -85,26 +298,24 @@ def main():
         ]
     }
 
-    print(f"\n原始OCR数据:")
-    print(json.dumps(raw_data, ensure_ascii=False, indent=2))
+    log.result(f"\n原始OCR数据:", raw_data, step='input')
 
     try:
         # 处理数据
         processed_data = process_ocr_data(raw_data)
 
         # 输出结果
-        print("\n" + "=" * 60)
-        print("处理后的结构化数据:")
-        print("=" * 60)
-        print(json.dumps(processed_data, ensure_ascii=False, indent=2))
+        log.text("\n" + "=" * 60)
+        log.result("处理后的结构化数据:\n" + "=" * 60, processed_data, step='process')
 
-        print("\n✅ 脚本执行成功！")
+        log.text("\n✅ 脚本执行成功！")
         return 0
 
     except Exception as e:
-        print(f"\n❌ 错误: {e}")
+        log.text(f"\n❌ 错误: {e}")
+        log.event('ERROR', str(e), step='process')
         return 1
 
 if __name__ == "__main__":
-    exit_code = main()
+    exit_code = profiling.run('data_processor', main)
     sys.exit(exit_code)
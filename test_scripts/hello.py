@@ -4,25 +4,32 @@
 测试脚本 - Python Hello World
 """
 
+import os
 import sys
-import json
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'examples'))
+
+from common.log import get_logger
+from common import profiling
+
+log = get_logger('hello')
+
 def main():
-    print("=" * 50)
-    print("Python 脚本执行测试")
-    print("=" * 50)
+    log.text("=" * 50)
+    log.text("Python 脚本执行测试")
+    log.text("=" * 50)
 
     # 打印基本信息
-    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Python 版本: {sys.version}")
-    print(f"命令行参数: {sys.argv[1:]}")
+    log.text(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.text(f"Python 版本: {sys.version}")
+    log.text(f"命令行参数: {sys.argv[1:]}")
 
     # 处理命令行参数
     if len(sys.argv) > 1:
-        print(f"\n收到 {len(sys.argv) - 1} 个参数:")
+        log.text(f"\n收到 {len(sys.argv) - 1} 个参数:")
         for i, arg in enumerate(sys.argv[1:], 1):
-            print(f"  参数 {i}: {arg}")
+            log.text(f"  参数 {i}: {arg}")
 
     # 生成示例输出
     result = {
@@ -32,10 +39,9 @@ def main():
         "args": sys.argv[1:] if len(sys.argv) > 1 else []
     }
 
-    print("\n执行结果:")
-    print(json.dumps(result, ensure_ascii=False, indent=2))
+    log.result("\n执行结果:", result)
 
-    print("\n脚本执行完成！")
+    log.text("\n脚本执行完成！")
 
 if __name__ == "__main__":
-    main()
+    profiling.run('hello', main)